@@ -0,0 +1,117 @@
+# bench_event_sources.py
+#
+# Время полного опроса источников: EventAggregator (все источники
+# одновременно, общий пул соединений) против последовательного цикла на
+# requests, как в old/events.py, на поддельных серверах KudaGo, TimePad и
+# Eventbrite:
+#     python bench_event_sources.py [страниц на источник] [мс на страницу] [таймаут, с]
+#
+# Поддельный сервер отдаёт страницы в форматах API с задержкой на каждую;
+# Eventbrite зависает (как недоступный источник) и обрывается по своему
+# таймауту (третий аргумент), у остальных источников таймаут с запасом.
+# Последовательный цикл идёт по тем же страницам с теми же таймаутами и
+# разбирает ответы функциями из old/events.py; он блокирующий, поэтому
+# работает в отдельном потоке, пока сервер отвечает в цикле событий.
+
+import asyncio
+import os
+import sys
+import time
+
+import requests
+from aiohttp import web
+
+from event_sources import EventAggregator, EventbriteSource, KudaGoSource, TimePadSource
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "old"))
+from events import parse_eventbrite_event, parse_kudago_event, parse_timepad_event
+
+HOST, PORT = "127.0.0.1", 8098
+BASE = f"http://{HOST}:{PORT}"
+PAGE_SIZE = 100
+HANG = 3600
+# Таймаут источников, которые отвечают
+TIMEOUT = 30.0
+
+
+def make_app(pages: int, delay: float) -> web.Application:
+    async def kudago(request: web.Request) -> web.Response:
+        await asyncio.sleep(delay)
+        page = int(request.query.get("page", 1))
+        results = [{"id": page * PAGE_SIZE + i, "title": f"Концерт {page}-{i}", "dates": [{"start": 1900000000}],
+                    "place": {"title": "Клуб"}, "site_url": ""} for i in range(PAGE_SIZE)]
+        following = f"{BASE}/kudago/?page={page + 1}" if page < pages else None
+        return web.json_response({"results": results, "next": following})
+
+    async def timepad(request: web.Request) -> web.Response:
+        await asyncio.sleep(delay)
+        skip = int(request.query.get("skip", 0))
+        values = [{"id": skip + i, "name": f"Лекция {skip + i}", "starts_at": "2030-03-10T19:00:00+05:00",
+                   "url": "", "location": {"address": "ул. Ленина, 1"}} for i in range(PAGE_SIZE)]
+        return web.json_response({"values": values, "total": pages * PAGE_SIZE})
+
+    async def eventbrite(request: web.Request) -> web.Response:
+        await asyncio.sleep(HANG)
+        return web.json_response({"events": []})
+
+    app = web.Application()
+    app.router.add_get("/kudago/", kudago)
+    app.router.add_get("/timepad", timepad)
+    app.router.add_get("/eventbrite", eventbrite)
+    return app
+
+
+def sequential(timeout: float) -> int:
+    """Источники по очереди, страница за страницей (блокирующий requests)."""
+    events = []
+    url = f"{BASE}/kudago/"
+    while url:
+        data = requests.get(url, timeout=TIMEOUT).json()
+        events.extend(parse_kudago_event(item) for item in data["results"])
+        url = data["next"]
+    skip, total = 0, 1
+    while skip < total:
+        data = requests.get(f"{BASE}/timepad", params={"skip": skip, "limit": PAGE_SIZE}, timeout=TIMEOUT).json()
+        events.extend(parse_timepad_event(item) for item in data["values"])
+        skip, total = skip + PAGE_SIZE, data["total"]
+    try:
+        data = requests.get(f"{BASE}/eventbrite", timeout=timeout).json()
+        events.extend(parse_eventbrite_event(item) for item in data["events"])
+    except requests.Timeout:
+        pass
+    return len(events)
+
+
+async def aggregated(pages: int, timeout: float) -> tuple:
+    sources = [KudaGoSource(f"{BASE}/kudago/", page_size=PAGE_SIZE, max_pages=pages),
+               TimePadSource(f"{BASE}/timepad", page_size=PAGE_SIZE, max_pages=pages),
+               EventbriteSource(f"{BASE}/eventbrite", token="bench")]
+    async with EventAggregator(sources, timeouts={"eventbrite": timeout}, default_timeout=TIMEOUT) as aggregator:
+        events = await aggregator.fetch_all({"kudago": "ekb", "timepad": "Екатеринбург",
+                                             "eventbrite": "Ekaterinburg"})
+        return len(events), aggregator.last_run
+
+
+async def main(pages: int, delay_ms: float, timeout: float) -> None:
+    # Зависший обработчик Eventbrite не ждём при остановке сервера
+    runner = web.AppRunner(make_app(pages, delay_ms / 1000), shutdown_timeout=0.1)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+    print(f"{pages} страниц KudaGo и TimePad по {delay_ms:g} мс, Eventbrite зависает, таймаут {timeout:g} с")
+    try:
+        started = time.perf_counter()
+        count = await asyncio.to_thread(sequential, timeout)
+        print(f"последовательно (requests): {time.perf_counter() - started:.2f} с, событий {count}")
+        started = time.perf_counter()
+        count, runs = await aggregated(pages, timeout)
+        print(f"EventAggregator: {time.perf_counter() - started:.2f} с, событий {count}")
+        for name, run in runs.items():
+            print(f"    {name}: {run}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 3,
+                     float(sys.argv[2]) if len(sys.argv) > 2 else 200.0,
+                     float(sys.argv[3]) if len(sys.argv) > 3 else 0.5))
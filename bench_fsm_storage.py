@@ -0,0 +1,61 @@
+# bench_fsm_storage.py
+#
+# Задержка get/set SQLiteStorage против MemoryStorage:
+#     python bench_fsm_storage.py [операций] [ключей]
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from fsm_storage import SQLiteStorage
+from states import Registration
+
+
+async def measure(storage, ops: int, keys: int) -> tuple:
+    """Микросекунд на операцию: (set_state + update_data, get_state + get_data)."""
+    storage_keys = [StorageKey(bot_id=1, chat_id=i, user_id=i) for i in range(keys)]
+    started = time.perf_counter()
+    for i in range(ops):
+        key = storage_keys[i % keys]
+        await storage.set_state(key, Registration.city)
+        await storage.update_data(key, {"login": f"user{i}", "step": i})
+    write = (time.perf_counter() - started) / ops * 1e6
+    started = time.perf_counter()
+    for i in range(ops):
+        key = storage_keys[i % keys]
+        await storage.get_state(key)
+        await storage.get_data(key)
+    read = (time.perf_counter() - started) / ops * 1e6
+    return write, read
+
+
+async def main(ops: int, keys: int) -> None:
+    write, read = await measure(MemoryStorage(), ops, keys)
+    print(f"MemoryStorage: set+update {write:.1f} us/op, get+get_data {read:.1f} us/op")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "fsm.db")
+        storage = SQLiteStorage(path)
+        write, read = await measure(storage, ops, keys)
+        started = time.perf_counter()
+        await storage.close()
+        flush = (time.perf_counter() - started) * 1000
+        print(f"SQLiteStorage: set+update {write:.1f} us/op, get+get_data {read:.1f} us/op, "
+              f"итоговый flush {flush:.1f} ms")
+
+        # После перезапуска первое чтение ключа идёт в базу
+        storage = SQLiteStorage(path)
+        write, read = await measure(storage, keys, keys)
+        await storage.close()
+        print(f"SQLiteStorage после перезапуска ({keys} ключей): set+update {write:.1f} us/op, "
+              f"get+get_data {read:.1f} us/op")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 2000))
@@ -0,0 +1,84 @@
+# bench_keyboards.py
+#
+# Сборка клавиатур на каждый вызов обработчика (как было в bot.py) против
+# готовых объектов из keyboards.py: время и память на один вызов.
+#     python bench_keyboards.py [повторов]
+
+import sys
+import time
+import tracemalloc
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from keyboards import DAY_KB, LANGUAGE_KB, UNIVERSITY_KB, final_menu
+from localization import get_msg
+from schedule import DAYS
+
+
+def build_language() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="Русский", callback_data="lang_ru"),
+         InlineKeyboardButton(text="English", callback_data="lang_en")],
+        [InlineKeyboardButton(text="Беларускі", callback_data="lang_be"),
+         InlineKeyboardButton(text="Қазақша", callback_data="lang_kk")],
+        [InlineKeyboardButton(text="中文", callback_data="lang_zh"),
+         InlineKeyboardButton(text="한국어", callback_data="lang_ko")]
+    ])
+
+
+def build_university() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="ЦУ", callback_data="uni_cu"),
+         InlineKeyboardButton(text="Бауманка", callback_data="uni_bauman")],
+        [InlineKeyboardButton(text="ВШЭ", callback_data="uni_hse")]
+    ])
+
+
+def build_days() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text=day, callback_data=f"day_{day}")] for day in DAYS])
+
+
+def build_final(lang: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=get_msg(lang, "event_search"), callback_data="search_events")],
+        [InlineKeyboardButton(text=get_msg(lang, "update_info"), callback_data="update_info")],
+        [InlineKeyboardButton(text=get_msg(lang, "edit_schedule"), callback_data="edit_schedule")],
+        [InlineKeyboardButton(text=get_msg(lang, "view_schedule"), callback_data="view_schedule")]
+    ])
+
+
+CASES = [
+    ("язык", build_language, lambda: LANGUAGE_KB),
+    ("вуз", build_university, lambda: UNIVERSITY_KB),
+    ("день недели", build_days, lambda: DAY_KB),
+    ("финальное меню", lambda: build_final("ru"), lambda: final_menu("ru", has_profile=False))
+]
+
+
+def per_call_us(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def allocated_bytes(func) -> int:
+    """Сколько памяти выделяет один вызов (пик tracemalloc)."""
+    func()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main(repeat: int) -> None:
+    print(f"{'клавиатура':16} {'сборка, us':>11} {'готовая, us':>12} {'сборка, байт':>13} {'готовая, байт':>14}")
+    for name, build, cached in CASES:
+        print(f"{name:16} {per_call_us(build, repeat):11.1f} {per_call_us(cached, repeat):12.2f} "
+              f"{allocated_bytes(build):13} {allocated_bytes(cached):14}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,107 @@
+# bench_recommender.py
+#
+# Пакетный пересчёт рекомендаций (Recommender.refresh) на синтетических данных:
+#     python bench_recommender.py [пользователей] [событий] [доля с расписанием] [размер словаря]
+#
+# Словарь по умолчанию (3000 слов) близок к реальным интересам: признаки
+# пользователя пересекаются с небольшой частью событий, работает разреженный
+# путь. Маленький словарь (например, 30) даёт плотный худший случай.
+#
+# Пользователи, события и расписания лежат во временных базах тех же
+# хранилищ, что использует бот; пересчёт запускается дважды (второй раз —
+# с уже разобранным свободным временем), затем измеряются поиск по кэшу и
+# ранжирование по требованию.
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from cities import CityIndex, CityResolver
+from event_store import EventStore
+from recommender import Recommender
+from schedule import DAYS, DaySchedule, Event
+from schedule_store import ScheduleStore
+from users import USER_FIELDS, UserRepository
+
+LETTERS = "абвгдежзиклмнопрстуфхцчшэюя"
+CITIES = ["Екатеринбург", "Москва", "Санкт-Петербург", "Казань"]
+
+
+def make_vocabulary(size: int) -> list:
+    """Случайные слова: при большом словаре у пользователя мало общих признаков с событиями."""
+    return ["".join(random.choice(LETTERS) for _ in range(random.randint(4, 9))) for _ in range(size)]
+
+
+def make_events(count: int, vocabulary: list) -> list:
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    return [{
+        "source": "bench", "event_id": str(i),
+        "title": " ".join(random.sample(vocabulary, 4)), "short_desc": " ".join(random.sample(vocabulary, 8)),
+        "venue": "Клуб", "link": "",
+        "date": (start + timedelta(hours=random.randrange(24 * 28))).strftime("%Y-%m-%d %H:%M"),
+        "city": random.choice(["ekb", "msk", "spb"])
+    } for i in range(count)]
+
+
+def make_profile(vocabulary: list) -> tuple:
+    return ("ru", random.choice(CITIES), "ЦУ", str(random.randint(1, 5)), str(random.randint(1, 5)),
+            " ".join(random.sample(vocabulary, 4)))
+
+
+def make_schedule() -> dict:
+    days = {}
+    for day in DAYS[:5]:
+        starts = sorted(random.sample([510, 610, 710, 820, 920, 1020], 3))
+        days[day] = DaySchedule("", [Event(start, start + 90, "Пара", source="university") for start in starts])
+    return days
+
+
+async def main(user_count: int, event_count: int, schedule_share: float, vocabulary_size: int) -> None:
+    random.seed(1)
+    vocabulary = make_vocabulary(vocabulary_size)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        event_store = EventStore(path)
+        event_store.upsert(make_events(event_count, vocabulary))
+        users = UserRepository(path)
+        users.conn.execute("BEGIN")
+        users.conn.executemany(
+            f"INSERT INTO users (user_id, {', '.join(USER_FIELDS)}, registered_at) VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+            [(user_id, *make_profile(vocabulary)) for user_id in range(user_count)])
+        users.conn.execute("COMMIT")
+        schedules = ScheduleStore(path)
+        for user_id in random.sample(range(user_count), int(user_count * schedule_share)):
+            schedules.put_user(str(user_id), make_schedule())
+
+        recommender = Recommender(CityIndex(CityResolver(), event_store, users), users, schedules)
+        print(f"{user_count} пользователей x {event_count} событий, с расписанием {schedule_share:.0%}, "
+              f"словарь {vocabulary_size} слов")
+        for run in ("первый пересчёт", "повторный пересчёт"):
+            await recommender.refresh()
+            print(f"{run}: {recommender.last_batch['seconds']:.1f} с", recommender.last_batch)
+
+        user_id = random.randrange(user_count)
+        repeat = 10000
+        started = time.perf_counter()
+        for _ in range(repeat):
+            await recommender.recommend(user_id)
+        print(f"поиск по кэшу: {(time.perf_counter() - started) / repeat * 1e6:.1f} us")
+
+        misses = random.sample(range(user_count), 100)
+        for missed in misses:
+            recommender.forget(missed)
+        started = time.perf_counter()
+        for missed in misses:
+            await recommender.recommend(missed)
+        print(f"ранжирование по требованию: {(time.perf_counter() - started) / len(misses) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 10000,
+                     float(sys.argv[3]) if len(sys.argv) > 3 else 0.0,
+                     int(sys.argv[4]) if len(sys.argv) > 4 else 3000))
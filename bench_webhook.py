@@ -0,0 +1,148 @@
+# bench_webhook.py
+#
+# Пропускная способность (апдейтов в секунду) в режиме вебхука и в режиме
+# long polling на поддельном Telegram:
+#     python bench_webhook.py [апдейтов] [мс на обработчик] [мс на запрос getUpdates]
+#
+# Вебхук: синтетические апдейты отправляются POST-запросами в create_app,
+# как это делает Telegram (одновременно не больше max_connections запросов).
+# Polling: поддельная сессия отдаёт апдейты на getUpdates пачками по 100
+# (предел Bot API), обработчики те же. Третий аргумент — задержка ответа
+# getUpdates (сеть до api.telegram.org); при 0 polling не платит за сеть вовсе.
+
+import asyncio
+import sys
+import time
+
+from aiogram import Bot, Dispatcher, types
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, GetUpdates
+from aiogram.types import Update, User
+from aiohttp import ClientSession, web
+
+from webhook import create_app
+
+HOST, PORT, PATH = "127.0.0.1", 8099, "/webhook"
+TOKEN = "123:abc"
+
+
+def make_update(update_id: int) -> dict:
+    # 1000 разных пользователей, как при обычной нагрузке
+    user_id = update_id % 1000 + 1
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": "hi",
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "a"}
+        }
+    }
+
+
+def make_dispatcher(handled: list, handler_ms: float) -> Dispatcher:
+    dp = Dispatcher()
+
+    @dp.message()
+    async def handler(message: types.Message) -> None:
+        # Имитация обработчика: запрос к базе или к API
+        await asyncio.sleep(handler_ms / 1000)
+        handled.append(time.perf_counter())
+
+    return dp
+
+
+class FakeTelegram(BaseSession):
+    """Поддельный Bot API для polling: getUpdates отдаёт заготовленные апдейты, как сервер Telegram."""
+
+    def __init__(self, total: int, rtt: float) -> None:
+        super().__init__()
+        self.total = total
+        self.rtt = rtt
+        self.next_id = 0
+        self.calls = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, GetMe):
+            return User(id=1, is_bot=True, first_name="bot")
+        if isinstance(method, GetUpdates):
+            self.calls += 1
+            await asyncio.sleep(self.rtt)
+            # offset подтверждает уже полученные апдейты
+            self.next_id = max(self.next_id, method.offset or 0)
+            batch = range(self.next_id, min(self.next_id + (method.limit or 100), self.total))
+            if not batch:
+                await asyncio.sleep(0.01)
+            return [Update.model_validate(make_update(i)) for i in batch]
+        return True
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+
+async def bench_webhook(total: int, handler_ms: float, connections: int = 40, concurrency: int = 64) -> dict:
+    handled = []
+    dp = make_dispatcher(handled, handler_ms)
+    bot = Bot(TOKEN)
+    app = create_app(dp, bot, PATH, concurrency=concurrency, max_pending=1000)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+    codes = {}
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    async def poster(session: ClientSession) -> None:
+        # Telegram повторяет доставку после 503, поэтому повторяем и мы
+        while not queue.empty():
+            update_id = queue.get_nowait()
+            async with session.post(f"http://{HOST}:{PORT}{PATH}", json=make_update(update_id)) as response:
+                codes[response.status] = codes.get(response.status, 0) + 1
+                if response.status != 200:
+                    queue.put_nowait(update_id)
+                    await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    async with ClientSession() as session:
+        await asyncio.gather(*(poster(session) for _ in range(connections)))
+    while len(handled) < total:
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    await runner.cleanup()
+    await bot.session.close()
+    return {"updates_per_sec": total / elapsed, "seconds": elapsed, "responses": codes,
+            "handler": app["webhook_handler"].stats()}
+
+
+async def bench_polling(total: int, handler_ms: float, rtt_ms: float) -> dict:
+    handled = []
+    dp = make_dispatcher(handled, handler_ms)
+    session = FakeTelegram(total, rtt_ms / 1000)
+    bot = Bot(TOKEN, session=session)
+    started = time.perf_counter()
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, close_bot_session=False))
+    while len(handled) < total:
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    await dp.stop_polling()
+    await polling
+    return {"updates_per_sec": total / elapsed, "seconds": elapsed, "get_updates_calls": session.calls}
+
+
+async def main(total: int, handler_ms: float, rtt_ms: float) -> None:
+    print(f"{total} апдейтов, обработчик {handler_ms:g} мс, getUpdates {rtt_ms:g} мс")
+    result = await bench_polling(total, handler_ms, rtt_ms)
+    print(f"polling: {result['updates_per_sec']:.0f} апдейтов/с за {result['seconds']:.2f} с, "
+          f"вызовов getUpdates: {result['get_updates_calls']}")
+    result = await bench_webhook(total, handler_ms)
+    print(f"webhook: {result['updates_per_sec']:.0f} апдейтов/с за {result['seconds']:.2f} с, "
+          f"ответы {result['responses']}, {result['handler']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+                     float(sys.argv[2]) if len(sys.argv) > 2 else 10.0,
+                     float(sys.argv[3]) if len(sys.argv) > 3 else 0.0))
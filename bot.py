@@ -1,8 +1,8 @@
 import logging
 import os
 import asyncio
+import html
 import re
-import json
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,303 +14,392 @@ from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.context import FSMContext
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 from localization import get_msg, LANG_MAP
 from states import Registration, AdditionalInfo, EditingSchedule
+from schedule import Event, DaySchedule, check_event, format_minutes, get_date_for_day, parse_day, to_minutes
+from schedule_store import ScheduleStore
+from fsm_storage import SQLiteStorage
+from users import UserRepository
+from jobs import JobQueue
+from outbox import Outbox
+from reminders import ReminderScheduler
+from webhook import run_webhook
+from middlewares import LocaleMiddleware, SendLimiter, ThrottlingMiddleware
+from event_sources import EventAggregator
+from event_store import EventStore
+from event_refresher import EventRefresher
+from cities import CityIndex, CityResolver
+from recommender import Recommender
+from keyboards import DAY_KB, LANGUAGE_KB, RATING_KB, UNIVERSITIES, UNIVERSITY_KB, final_menu
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-bot = Bot(token=BOT_TOKEN)
-storage = MemoryStorage()
-dp = Dispatcher(storage=storage)
-
-# Файл для хранения расписаний
+# База данных бота и старый файл расписаний (используется только для миграции)
+DATABASE_PATH = os.getenv("DATABASE_PATH", "bot.db")
 SCHEDULES_FILE = "schedules.json"
+# Хранилище FSM: "sqlite" (по умолчанию, переживает перезапуск) или "memory"
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+
+# Период фонового обновления каталога событий, секунды
+EVENTS_REFRESH_INTERVAL = float(os.getenv("EVENTS_REFRESH_INTERVAL", "900"))
+
+# Ограничение частоты: входящие апдейты на пользователя в секунду и предельное ожидание
+# в очереди, исходящие сообщения в секунду на всех (лимит Telegram — 30)
+THROTTLE_USER_RATE = float(os.getenv("THROTTLE_USER_RATE", "2"))
+THROTTLE_MAX_DELAY = float(os.getenv("THROTTLE_MAX_DELAY", "10"))
+SEND_RATE = float(os.getenv("SEND_RATE", "30"))
+# Число воркеров очереди исходящих сообщений
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+# За сколько минут до начала пары напоминать о ней
+REMINDER_LEAD = int(os.getenv("REMINDER_LEAD", "15"))
+
+# Режим получения апдейтов: "polling" (по умолчанию) или "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", "64"))
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+if BOT_MODE == "webhook" and not WEBHOOK_URL:
+    raise ValueError("Для BOT_MODE=webhook необходимо указать WEBHOOK_URL в файле .env")
 
+bot = Bot(token=BOT_TOKEN)
+# Сообщения сверх лимита Telegram ждут своей очереди, а не получают 429
+send_limiter = SendLimiter(rate=SEND_RATE)
+bot.session.middleware(send_limiter)
+if FSM_STORAGE == "memory":
+    storage = MemoryStorage()
+else:
+    storage = SQLiteStorage(DATABASE_PATH)
+dp = Dispatcher(storage=storage)
 
-def load_schedules():
-    if os.path.exists(SCHEDULES_FILE):
-        with open(SCHEDULES_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
-
-
-def save_schedules(schedules):
-    with open(SCHEDULES_FILE, "w", encoding="utf-8") as f:
-        json.dump(schedules, f, ensure_ascii=False, indent=4)
-
-
-user_schedules = load_schedules()
-
-# Глобовые словари для хранения данных
-registered_users = set()
-user_profiles = {}  # Дополнительная информация
+schedule_store = ScheduleStore(DATABASE_PATH)
+if schedule_store.is_empty():
+    imported = schedule_store.import_json(SCHEDULES_FILE)
+    logger.info(f"Импортировано расписаний из {SCHEDULES_FILE}: {imported}")
+
+# Зарегистрированные пользователи и дополнительная информация о них
+users = UserRepository(DATABASE_PATH)
+
+# Серия апдейтов от одного пользователя или чата обрабатывается не чаще лимита: лишние ждут
+throttling = ThrottlingMiddleware(user_rate=THROTTLE_USER_RATE, max_delay=THROTTLE_MAX_DELAY)
+dp.update.outer_middleware(throttling)
+
+# Язык пользователя определяется один раз на апдейт и передаётся в обработчики как lang
+locale_middleware = LocaleMiddleware(users)
+dp.update.outer_middleware(locale_middleware)
+
+# Ответы пользователям идут через очередь: подряд идущие тексты в чат склеиваются,
+# RetryAfter выдерживается, рассылки не задерживают интерактивные ответы
+outbox = Outbox(bot, workers=OUTBOX_WORKERS)
+dp.startup.register(outbox.start)
+
+# Фоновая очередь привязки вуза и импорта расписания
+onboarding = JobQueue(workers=4)
+dp.startup.register(onboarding.start)
+dp.shutdown.register(onboarding.stop)
+
+# Каталог событий обновляется в фоне; обработчики читают только event_store
+event_store = EventStore(DATABASE_PATH)
+# Город из профиля (свободный ввод) приводится к коду каталога; события и пользователи
+# разложены по городам в памяти, шарды событий сбрасываются после обновления каталога,
+# пользователи переносятся между городами при каждом сохранении профиля (add_user)
+city_resolver = CityResolver()
+city_index = CityIndex(city_resolver, event_store, users)
+event_refresher = EventRefresher(EventAggregator(), event_store, city_resolver.locations(),
+                                 interval=EVENTS_REFRESH_INTERVAL)
+event_refresher.listeners.append(city_index.invalidate_events)
+dp.startup.register(event_refresher.start)
+dp.shutdown.register(event_refresher.stop)
+
+# Рекомендации пересчитываются для всех пользователей после каждого обновления каталога
+# по событиям их города, события вне свободного времени по расписанию отбрасываются
+recommender = Recommender(city_index, users, schedule_store)
+event_refresher.listeners.append(recommender.refresh)
+# Первый пересчёт идёт в фоне и не задерживает старт; до него работает ранжирование по запросу
+dp.startup.register(recommender.start)
+dp.shutdown.register(recommender.stop)
+
+# Напоминания о начале пар и событий из расписаний уходят рассылкой через outbox
+reminders = ReminderScheduler(schedule_store, city_index.profile, outbox, lead=REMINDER_LEAD)
+dp.startup.register(reminders.start)
+dp.shutdown.register(reminders.stop)
+
+# Обработчики shutdown вызываются по порядку регистрации: outbox останавливается
+# последним, когда напоминания, онбординг и обновление каталога уже ничего не отправят
+dp.shutdown.register(outbox.stop)
+
+
+async def log_stats() -> None:
+    # После остановки outbox: в его счётчиках уже учтены сообщения, отправленные при остановке
+    logger.info(f"Ограничение частоты: входящие {throttling.stats()}, исходящие {send_limiter.stats()}")
+    logger.info(f"Определение языка: {locale_middleware.stats()}")
+    logger.info(f"Очередь отправки: {outbox.stats()}")
+    logger.info(f"Кэш пользователей: {users.stats()}")
+
+
+dp.shutdown.register(log_stats)
+
+# Сколько событий показывать в ответ на поиск
+EVENTS_PER_SEARCH = 5
+
+# Время имитации авторизации в учётной записи вуза, секунды
+UNIVERSITY_AUTH_DELAY = 3
+
+# Псевдо расписание, которое выдаётся после привязки вуза
+DEFAULT_SCHEDULE = {
+    "ПН": "03.02.2025\n09:00-10:30: Лекция по математике\n10:45-12:15: Семинар по физике\n13:00-14:30: Практическое занятие по программированию",
+    "ВТ": "04.02.2025\n09:00-10:30: Лекция по информатике\n10:45-12:15: Практикум по алгоритмам\n13:00-14:30: Лабораторная по сетям",
+    "СР": "05.02.2025\n09:00-10:30: Лекция по истории\n10:45-12:15: Семинар по обществознанию\n13:00-14:30: Практическое занятие по праву",
+    "ЧТ": "06.02.2025\n09:00-10:30: Лекция по литературе\n10:45-12:15: Практикум по русскому языку\n13:00-14:30: Кафедральная практика",
+    "ПТ": "07.02.2025\n09:00-10:30: Лабораторная по химии\n10:45-12:15: Семинар по биологии\n13:00-14:30: Практическое занятие по экологии",
+    "СБ": "08.02.2025\n10:00-12:00: Практическая работа в лаборатории\n13:00-14:30: Семинар по спорту\n15:00-16:30: Внеучебная деятельность",
+    "ВС": "09.02.2025\nВыходной"
+}
 
 
 # --- Регистрационный поток ---
 
 @dp.message(Command("start"))
-async def start_command(message: types.Message, state: FSMContext) -> None:
+async def start_command(message: types.Message, state: FSMContext, lang: str) -> None:
     user_id = message.from_user.id
-    if user_id in registered_users:
-        await message.answer(get_msg("en", "already_registered"), parse_mode="HTML")
+    if users.is_registered(user_id):
+        outbox.post(message.chat.id, get_msg(lang, "already_registered"), parse_mode="HTML")
         return
-    await message.answer(get_msg("en", "greeting"), parse_mode="HTML")
-    lang_kb = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="Русский", callback_data="lang_ru"),
-         InlineKeyboardButton(text="English", callback_data="lang_en")],
-        [InlineKeyboardButton(text="Беларускі", callback_data="lang_be"),
-         InlineKeyboardButton(text="Қазақша", callback_data="lang_kk")],
-        [InlineKeyboardButton(text="中文", callback_data="lang_zh"),
-         InlineKeyboardButton(text="한국어", callback_data="lang_ko")]
-    ])
-    await message.answer("Please choose your language:", reply_markup=lang_kb)
+    outbox.post(message.chat.id, get_msg(lang, "greeting"), parse_mode="HTML")
+    outbox.post(message.chat.id, get_msg(lang, "choose_language"), reply_markup=LANGUAGE_KB, parse_mode="HTML")
     await state.set_state(Registration.language)
 
 
 @dp.callback_query(lambda callback: callback.data in LANG_MAP, StateFilter(Registration.language))
 async def language_chosen(callback: types.CallbackQuery, state: FSMContext) -> None:
     lang_code = LANG_MAP[callback.data]
-    await state.update_data(language=lang_code)
+    # Язык сохраняется сразу, дальше его подставляет LocaleMiddleware
+    city_index.add_user(callback.from_user.id, users.save(callback.from_user.id, language=lang_code))
     logger.info(f"User {callback.from_user.id} выбрал язык: {lang_code}")
     await callback.answer()
-    await callback.message.answer(get_msg(lang_code, "enter_login"), parse_mode="HTML")
+    outbox.post(callback.message.chat.id, get_msg(lang_code, "enter_login"), parse_mode="HTML")
     await state.set_state(Registration.account_login)
 
 
 @dp.message(StateFilter(Registration.account_login))
-async def process_login(message: types.Message, state: FSMContext) -> None:
+async def process_login(message: types.Message, state: FSMContext, lang: str) -> None:
     login = message.text.strip()
-    data = await state.get_data()
-    lang = data.get("language", "en")
     if not re.fullmatch(r'^[A-Za-z0-9_]+$', login):
-        await message.answer(get_msg(lang, "invalid_login"), parse_mode="HTML")
+        outbox.post(message.chat.id, get_msg(lang, "invalid_login"), parse_mode="HTML")
         return
     await state.update_data(login=login)
     logger.info(f"User {message.from_user.id} ввёл логин: {login}")
-    await message.answer(get_msg(lang, "enter_password"), parse_mode="HTML")
+    outbox.post(message.chat.id, get_msg(lang, "enter_password"), parse_mode="HTML")
     await state.set_state(Registration.account_password)
 
 
 @dp.message(StateFilter(Registration.account_password))
-async def process_password(message: types.Message, state: FSMContext) -> None:
+async def process_password(message: types.Message, state: FSMContext, lang: str) -> None:
     password = message.text.strip()
     await state.update_data(password=password)
-    data = await state.get_data()
-    lang = data.get("language", "en")
     logger.info(f"User {message.from_user.id} ввёл пароль.")
-    await message.answer(get_msg(lang, "enter_city"), parse_mode="HTML")
+    outbox.post(message.chat.id, get_msg(lang, "enter_city"), parse_mode="HTML")
     await state.set_state(Registration.city)
 
 
 @dp.message(StateFilter(Registration.city))
-async def process_city(message: types.Message, state: FSMContext) -> None:
+async def process_city(message: types.Message, state: FSMContext, lang: str) -> None:
     city = message.text.strip()
     await state.update_data(city=city)
-    data = await state.get_data()
-    lang = data.get("language", "en")
-    logger.info(f"User {message.from_user.id} ввёл город: {city}")
+    logger.info(f"User {message.from_user.id} ввёл город: {city} (код каталога: {city_resolver.resolve(city)})")
     # Переходим к выбору вуза
-    uni_kb = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="ЦУ", callback_data="uni_cu"),
-         InlineKeyboardButton(text="Бауманка", callback_data="uni_bauman")],
-        [InlineKeyboardButton(text="ВШЭ", callback_data="uni_hse")]
-    ])
-    await message.answer(get_msg(lang, "choose_university"), reply_markup=uni_kb, parse_mode="HTML")
+    outbox.post(message.chat.id, get_msg(lang, "choose_university"), reply_markup=UNIVERSITY_KB, parse_mode="HTML")
     await state.set_state(Registration.university)
 
 
-@dp.callback_query(lambda callback: callback.data in ["uni_cu", "uni_bauman", "uni_hse"],
-                   StateFilter(Registration.university))
-async def process_university(callback: types.CallbackQuery, state: FSMContext) -> None:
-    global registered_users
-    uni_map = {
-        "uni_cu": "ЦУ",
-        "uni_bauman": "Бауманка",
-        "uni_hse": "ВШЭ"
-    }
-    university = uni_map.get(callback.data, "")
+@dp.callback_query(lambda callback: callback.data in UNIVERSITIES, StateFilter(Registration.university))
+async def process_university(callback: types.CallbackQuery, state: FSMContext, lang: str) -> None:
+    university = UNIVERSITIES[callback.data]
     await state.update_data(university=university)
     data = await state.get_data()
-    lang = data.get("language", "en")
     logger.info(f"User {callback.from_user.id} выбрал вуз: {university}")
     await callback.answer()
 
     # Отправляем сообщение с псевдоссылкой для авторизации в вузе
-    await callback.message.answer(get_msg(lang, "university_auth"), parse_mode="HTML")
-    await asyncio.sleep(3)
+    outbox.post(callback.message.chat.id, get_msg(lang, "university_auth"), parse_mode="HTML")
 
-    # Создаем псевдо расписание с красивым форматированием, если его ещё нет
+    # Привязка вуза и импорт расписания идут в фоне, пользователь получит меню по завершении
     user_id = callback.from_user.id
-    if str(user_id) not in user_schedules:
-        user_schedules[str(user_id)] = {
-            "ПН": "03.02.2025\n09:00-10:30: Лекция по математике\n10:45-12:15: Семинар по физике\n13:00-14:30: Практическое занятие по программированию",
-            "ВТ": "04.02.2025\n09:00-10:30: Лекция по информатике\n10:45-12:15: Практикум по алгоритмам\n13:00-14:30: Лабораторная по сетям",
-            "СР": "05.02.2025\n09:00-10:30: Лекция по истории\n10:45-12:15: Семинар по обществознанию\n13:00-14:30: Практическое занятие по праву",
-            "ЧТ": "06.02.2025\n09:00-10:30: Лекция по литературе\n10:45-12:15: Практикум по русскому языку\n13:00-14:30: Кафедральная практика",
-            "ПТ": "07.02.2025\n09:00-10:30: Лабораторная по химии\n10:45-12:15: Семинар по биологии\n13:00-14:30: Практическое занятие по экологии",
-            "СБ": "08.02.2025\n10:00-12:00: Практическая работа в лаборатории\n13:00-14:30: Семинар по спорту\n15:00-16:30: Внеучебная деятельность",
-            "ВС": "09.02.2025\nВыходной"
-        }
-        save_schedules(user_schedules)
-    else:
-        user_schedules.update(load_schedules())
-
-    # Формируем финальное меню: если дополнительная информация ещё не заполнена – 4 кнопки, иначе – 3
-    if str(user_id) not in user_profiles:
-        final_kb = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=get_msg(lang, "event_search"), callback_data="search_events")],
-            [InlineKeyboardButton(text=get_msg(lang, "update_info"), callback_data="update_info")],
-            [InlineKeyboardButton(text=get_msg(lang, "edit_schedule"), callback_data="edit_schedule")],
-            [InlineKeyboardButton(text=get_msg(lang, "view_schedule"), callback_data="view_schedule")]
-        ])
-    else:
-        final_kb = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=get_msg(lang, "view_schedule"), callback_data="view_schedule")],
-            [InlineKeyboardButton(text=get_msg(lang, "edit_schedule"), callback_data="edit_schedule")],
-            [InlineKeyboardButton(text=get_msg(lang, "event_search"), callback_data="search_events")]
-        ])
-    await callback.message.answer(get_msg(lang, "registration_finished"), reply_markup=final_kb, parse_mode="HTML")
-
-    registered_users.add(user_id)
+    chat_id = callback.message.chat.id
+    city_index.add_user(user_id, users.save(user_id, language=lang, city=data.get("city"), university=university))
     await state.clear()
+    await onboarding.submit(f"onboarding:{user_id}", import_university_schedule, chat_id, user_id, lang,
+                            on_failure=lambda exc: outbox.post(
+                                chat_id, get_msg(lang, "import_failed"), parse_mode="HTML"))
+
+
+async def import_university_schedule(chat_id: int, user_id: int, lang: str) -> None:
+    # Имитация авторизации в учётной записи вуза
+    await asyncio.sleep(UNIVERSITY_AUTH_DELAY)
+
+    # Создаем псевдо расписание с красивым форматированием, если его ещё нет
+    if not schedule_store.has_user(str(user_id)):
+        schedule_store.put_user(str(user_id), {day: parse_day(text, source="university")
+                                               for day, text in DEFAULT_SCHEDULE.items()})
+        recommender.forget(user_id)
+        reminders.reschedule(str(user_id))
+
+    # Финальное меню: если дополнительная информация ещё не заполнена – 4 кнопки, иначе – 3
+    outbox.post(chat_id, get_msg(lang, "registration_finished"),
+                reply_markup=final_menu(lang, users.has_profile(user_id)), parse_mode="HTML")
+    logger.info(f"User {user_id}: расписание импортировано, очередь: {onboarding.stats()}")
 
 
 # --- Обработка финальных кнопок ---
 
+def render_events(lang: str, events: list) -> str:
+    lines = [get_msg(lang, "events_found")]
+    for event in events:
+        lines.append(f"\n<b>{html.escape(event['title'])}</b>\n{event['date']}")
+        if event.get("venue"):
+            lines.append(html.escape(event["venue"]))
+        if event.get("link"):
+            lines.append(html.escape(event["link"]))
+    return "\n".join(lines)
+
+
 @dp.callback_query(lambda c: c.data == "search_events")
-async def search_events_handler(callback: types.CallbackQuery, state: FSMContext) -> None:
-    await callback.answer("Поиск событий пока не реализован.", show_alert=True)
+async def search_events_handler(callback: types.CallbackQuery, state: FSMContext, lang: str) -> None:
+    events = await recommender.recommend(callback.from_user.id, k=EVENTS_PER_SEARCH)
+    await callback.answer()
+    if not events:
+        outbox.post(callback.message.chat.id, get_msg(lang, "no_events"))
+        return
+    outbox.post(callback.message.chat.id, render_events(lang, events), parse_mode="HTML")
 
 
 @dp.callback_query(lambda c: c.data == "edit_schedule")
-async def edit_schedule_handler(callback: types.CallbackQuery, state: FSMContext) -> None:
+async def edit_schedule_handler(callback: types.CallbackQuery, state: FSMContext, lang: str) -> None:
     await callback.answer()
     await state.set_state(EditingSchedule.new_event)
-    await callback.message.answer(get_msg("ru", "edit_schedule_prompt"), parse_mode="HTML")
+    outbox.post(callback.message.chat.id, get_msg(lang, "edit_schedule_prompt"), parse_mode="HTML")
 
 
 @dp.message(StateFilter(EditingSchedule.new_event))
-async def process_new_event(message: types.Message, state: FSMContext) -> None:
+async def process_new_event(message: types.Message, state: FSMContext, lang: str) -> None:
     text = message.text.strip()
     # Ожидаемый формат: [День] [Время начала] - [Время конца] [Событие]
-    pattern = r"^(ПН|ВТ|СР|ЧТ|ПТ|СБ|ВС)\s+(\d{2}:\d{2})\s*-\s*(\d{2}:\d{2})\s+(.+)$"
+    # Часы 00-23, минуты 00-59: время за пределами суток не принимаем
+    pattern = r"^(ПН|ВТ|СР|ЧТ|ПТ|СБ|ВС)\s+((?:[01]\d|2[0-3]):[0-5]\d)\s*-\s*((?:[01]\d|2[0-3]):[0-5]\d)\s+(.+)$"
     match = re.match(pattern, text)
     if not match:
-        await message.answer("Неверный формат. Попробуйте снова. Пример: ПН 19:40 - 21:30 просмотр фильма",
-                             parse_mode="HTML")
+        outbox.post(message.chat.id, get_msg(lang, "invalid_event_format"), parse_mode="HTML")
         return
     day, start, end, event_desc = match.groups()
-    event_line = f"{start}-{end}: {event_desc}"
+    start_min, end_min = to_minutes(start), to_minutes(end)
+    if end_min <= start_min:
+        outbox.post(message.chat.id, get_msg(lang, "invalid_event_time"), parse_mode="HTML")
+        return
     user_id = str(message.from_user.id)
-    schedules = load_schedules()
-    user_schedule = schedules.get(user_id, {})
-    # Обновляем расписание: записываем только дату и события без повторения дня
-    if day not in user_schedule:
-        user_schedule[day] = f"{get_date_for_day(day)}\n{event_line}"
-    else:
-        user_schedule[day] += f"\n{event_line}"
-    schedules[user_id] = user_schedule
-    save_schedules(schedules)
-    global user_schedules
-    user_schedules = schedules
-    await message.answer("Событие добавлено.", parse_mode="HTML")
+    day_schedule = schedule_store.get_day(user_id, day)
+    if day_schedule is None:
+        day_schedule = DaySchedule(get_date_for_day(day))
+    # Не даём добавить событие поверх уже занятого времени
+    conflicts, suggestion = check_event(day_schedule, start_min, end_min)
+    if conflicts:
+        lines = [get_msg(lang, "event_conflict", conflicts="\n".join(html.escape(ev.render()) for ev in conflicts))]
+        if suggestion:
+            lines.append(get_msg(lang, "event_free_slot", day=day, start=format_minutes(suggestion[0]),
+                                 end=format_minutes(suggestion[1])))
+        lines.append(get_msg(lang, "try_again"))
+        outbox.post(message.chat.id, "\n".join(lines), parse_mode="HTML")
+        return
+    # Добавляем в копию: день из кэша schedule_store меняется только после успешной записи в put_day
+    updated = DaySchedule(day_schedule.date, day_schedule.events)
+    updated.add(Event(start_min, end_min, event_desc, source="user"))
+    schedule_store.put_day(user_id, day, updated)
+    recommender.forget(message.from_user.id)
+    reminders.reschedule(user_id)
+    outbox.post(message.chat.id, get_msg(lang, "event_added"), parse_mode="HTML")
     # После обновления информации выводим финальное меню
-    final_kb = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=get_msg("ru", "view_schedule"), callback_data="view_schedule")],
-        [InlineKeyboardButton(text=get_msg("ru", "edit_schedule"), callback_data="edit_schedule")],
-        [InlineKeyboardButton(text=get_msg("ru", "event_search"), callback_data="search_events")]
-    ])
-    await message.answer(get_msg("ru", "registration_finished"), reply_markup=final_kb, parse_mode="HTML")
+    outbox.post(message.chat.id, get_msg(lang, "registration_finished"), reply_markup=final_menu(lang), parse_mode="HTML")
     await state.clear()
 
 
 @dp.callback_query(lambda c: c.data == "view_schedule")
-async def view_schedule_handler(callback: types.CallbackQuery, state: FSMContext) -> None:
-    days = [("ПН", "ПН"), ("ВТ", "ВТ"), ("СР", "СР"), ("ЧТ", "ЧТ"), ("ПТ", "ПТ"), ("СБ", "СБ"), ("ВС", "ВС")]
-    day_kb = InlineKeyboardMarkup(
-        inline_keyboard=[[InlineKeyboardButton(text=abbr, callback_data=f"day_{abbr}")] for abbr, _ in days])
+async def view_schedule_handler(callback: types.CallbackQuery, state: FSMContext, lang: str) -> None:
     await callback.answer()
-    await callback.message.answer("Выберите день недели:", reply_markup=day_kb, parse_mode="HTML")
+    outbox.post(callback.message.chat.id, get_msg(lang, "choose_day"), reply_markup=DAY_KB, parse_mode="HTML")
 
 
 @dp.callback_query(lambda c: c.data.startswith("day_"))
-async def day_schedule_handler(callback: types.CallbackQuery, state: FSMContext) -> None:
+async def day_schedule_handler(callback: types.CallbackQuery, state: FSMContext, lang: str) -> None:
     day = callback.data[4:]
     user_id = str(callback.from_user.id)
-    schedule = user_schedules.get(user_id, {})
-    day_schedule = schedule.get(day, "Расписание не найдено.")
+    day_schedule = schedule_store.get_day(user_id, day)
+    if day_schedule is not None:
+        # Названия событий вводит пользователь: без экранирования Telegram отклонит HTML
+        text = html.escape(day_schedule.render(day_off=get_msg(lang, "day_off")))
+    else:
+        text = get_msg(lang, "schedule_not_found")
     await callback.answer()
-    await callback.message.answer(f"<b>{day}</b>\n{day_schedule}", parse_mode="HTML")
+    outbox.post(callback.message.chat.id, f"<b>{day}</b>\n{text}", parse_mode="HTML")
 
 
 @dp.callback_query(lambda c: c.data == "update_info")
-async def update_info_handler(callback: types.CallbackQuery, state: FSMContext) -> None:
+async def update_info_handler(callback: types.CallbackQuery, state: FSMContext, lang: str) -> None:
     await callback.answer()
-    # Для обновления информации вопросы будут на русском
-    lang = "ru"
-    update_activity_kb = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=str(i), callback_data=str(i)) for i in range(1, 6)]
-    ])
     await state.set_state(AdditionalInfo.activity)
-    await callback.message.answer(get_msg(lang, "update_enter_activity"), reply_markup=update_activity_kb,
-                                  parse_mode="HTML")
+    outbox.post(callback.message.chat.id, get_msg(lang, "update_enter_activity"), reply_markup=RATING_KB,
+                parse_mode="HTML")
 
 
 @dp.callback_query(lambda c: c.data in [str(i) for i in range(1, 6)], StateFilter(AdditionalInfo.activity))
-async def update_info_activity_cb(callback: types.CallbackQuery, state: FSMContext) -> None:
+async def update_info_activity_cb(callback: types.CallbackQuery, state: FSMContext, lang: str) -> None:
     chosen_activity = callback.data
     await state.update_data(additional_activity=chosen_activity)
-    lang = "ru"
     logger.info(f"User {callback.from_user.id} (update info) выбрал активность: {chosen_activity}")
     await callback.message.delete()
-    update_sociability_kb = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=str(i), callback_data=str(i)) for i in range(1, 6)]
-    ])
     await state.set_state(AdditionalInfo.sociability)
-    await bot.send_message(callback.message.chat.id, get_msg(lang, "update_enter_sociability"),
-                           reply_markup=update_sociability_kb, parse_mode="HTML")
+    outbox.post(callback.message.chat.id, get_msg(lang, "update_enter_sociability"),
+                reply_markup=RATING_KB, parse_mode="HTML")
     await callback.answer()
 
 
 @dp.callback_query(lambda c: c.data in [str(i) for i in range(1, 6)], StateFilter(AdditionalInfo.sociability))
-async def update_info_sociability_cb(callback: types.CallbackQuery, state: FSMContext) -> None:
+async def update_info_sociability_cb(callback: types.CallbackQuery, state: FSMContext, lang: str) -> None:
     chosen_sociability = callback.data
     await state.update_data(additional_sociability=chosen_sociability)
-    lang = "ru"
     logger.info(f"User {callback.from_user.id} (update info) выбрал общительность: {chosen_sociability}")
     await callback.message.delete()
     await state.set_state(AdditionalInfo.interests)
-    await bot.send_message(callback.message.chat.id, get_msg(lang, "update_enter_hobbies"), parse_mode="HTML")
+    outbox.post(callback.message.chat.id, get_msg(lang, "update_enter_hobbies"), parse_mode="HTML")
     await callback.answer()
 
 
 @dp.message(StateFilter(AdditionalInfo.interests))
-async def update_info_interests(message: types.Message, state: FSMContext) -> None:
+async def update_info_interests(message: types.Message, state: FSMContext, lang: str) -> None:
     interests = message.text.strip()
     await state.update_data(additional_interests=interests)
-    lang = "ru"
-    user_profiles[str(message.from_user.id)] = {
-        "activity": (await state.get_data()).get("additional_activity"),
-        "sociability": (await state.get_data()).get("additional_sociability"),
-        "interests": interests
-    }
-    await message.answer(get_msg(lang, "info_updated"), parse_mode="HTML")
+    data = await state.get_data()
+    user = users.save(message.from_user.id,
+                      activity=data.get("additional_activity"),
+                      sociability=data.get("additional_sociability"),
+                      interests=interests)
+    city_index.add_user(message.from_user.id, user)
+    recommender.forget(message.from_user.id)
+    outbox.post(message.chat.id, get_msg(lang, "info_updated"), parse_mode="HTML")
     # После обновления информации выводим финальное меню
-    final_kb = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=get_msg(lang, "view_schedule"), callback_data="view_schedule")],
-        [InlineKeyboardButton(text=get_msg(lang, "edit_schedule"), callback_data="edit_schedule")],
-        [InlineKeyboardButton(text=get_msg(lang, "event_search"), callback_data="search_events")]
-    ])
-    await message.answer(get_msg(lang, "registration_finished"), reply_markup=final_kb, parse_mode="HTML")
+    outbox.post(message.chat.id, get_msg(lang, "registration_finished"), reply_markup=final_menu(lang), parse_mode="HTML")
     await state.clear()
 
 
 if __name__ == '__main__':
-    async def main():
-        await dp.start_polling(bot)
+    if BOT_MODE == "webhook":
+        run_webhook(dp, bot, WEBHOOK_URL, path=WEBHOOK_PATH, host=WEBAPP_HOST, port=WEBAPP_PORT,
+                    secret_token=WEBHOOK_SECRET, concurrency=WEBHOOK_CONCURRENCY, throttle=throttling)
+    else:
+        async def main():
+            await dp.start_polling(bot)
 
 
-    asyncio.run(main())
+        asyncio.run(main())
@@ -0,0 +1,161 @@
+# cities.py
+
+import re
+import unicodedata
+
+# Города каталога: код -> названия, по которым пользователь может его указать,
+# и коды города в каждом источнике событий
+CITIES = {
+    'ekb': {
+        'names': ('Екатеринбург', 'Ekaterinburg', 'Yekaterinburg', 'Jekaterinburg', 'ЕКБ', 'Екат', 'Ебург',
+                  'Свердловск'),
+        'locations': {'kudago': 'ekb', 'timepad': 'Екатеринбург', 'eventbrite': 'Ekaterinburg'}
+    },
+    'msk': {
+        'names': ('Москва', 'Moscow', 'Moskva', 'Moskau', 'МСК'),
+        'locations': {'kudago': 'msk', 'timepad': 'Москва', 'eventbrite': 'Moscow'}
+    },
+    'spb': {
+        'names': ('Санкт-Петербург', 'Saint Petersburg', 'St. Petersburg', 'Sankt-Peterburg', 'Петербург',
+                  'Питер', 'СПб', 'Ленинград'),
+        'locations': {'kudago': 'spb', 'timepad': 'Санкт-Петербург', 'eventbrite': 'Saint Petersburg'}
+    }
+}
+
+CITY_LOCATIONS = {code: city['locations'] for code, city in CITIES.items()}
+
+TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh', 'з': 'z', 'и': 'i',
+    'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't',
+    'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '', 'ы': 'y',
+    'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya'
+})
+
+# "г. Москва", "город Москва", "city of Moscow"
+PREFIX = re.compile(r"^(г\.|г |гор\.|город |city of |city )\s*")
+NON_LETTERS = re.compile(r"[^a-z]")
+
+
+def city_key(text: str) -> str:
+    """Ключ для сравнения названий: без префикса, латиницей, только буквы."""
+    name = unicodedata.normalize('NFKC', text or '').strip().lower()
+    name = PREFIX.sub('', name)
+    return NON_LETTERS.sub('', name.translate(TRANSLIT))
+
+
+class CityResolver:
+    """
+    Приводит название города из профиля (свободный ввод на любом из языков
+    бота) к коду каталога: 'Екатеринбург', 'Ekaterinburg', 'екб', 'г. Екатеринбург'
+    -> 'ekb'. Названия сравниваются по city_key, поэтому транслитерация
+    ('Moskva', 'Sankt-Peterburg') распознаётся без отдельных записей.
+    Таблица ключей строится при первом обращении, ответы для уже
+    встречавшихся строк берутся из памяти.
+    """
+
+    def __init__(self, cities: dict = None, memo_size: int = 10000):
+        self.cities = cities or CITIES
+        self.memo_size = memo_size
+        self._aliases = None  # city_key -> код
+        self._memo = {}  # исходная строка -> код или None
+
+    def _load(self) -> dict:
+        aliases = {}
+        for code, city in self.cities.items():
+            aliases[city_key(code)] = code
+            for name in (*city['names'], *city['locations'].values()):
+                aliases[city_key(name)] = code
+        return aliases
+
+    def resolve(self, text: str):
+        """Код города или None, если город не задан или его нет в каталоге."""
+        if not text:
+            return None
+        if text in self._memo:
+            return self._memo[text]
+        if self._aliases is None:
+            self._aliases = self._load()
+        code = self._aliases.get(city_key(text))
+        if len(self._memo) >= self.memo_size:
+            self._memo.clear()
+        self._memo[text] = code
+        return code
+
+    def locations(self) -> dict:
+        """Код города -> коды этого города в источниках событий (для EventRefresher)."""
+        return {code: city['locations'] for code, city in self.cities.items()}
+
+
+class CityIndex:
+    """
+    Индекс в памяти: код города -> события этого города (шард каталога)
+    и пользователи из него с их профилями. Поиск событий и рассылка по городу
+    обходят только свой шард, а не всю таблицу. Оба отображения строятся
+    лениво при первом обращении: события — одним чтением EventStore (после
+    обновления каталога шарды сбрасываются через invalidate_events),
+    пользователи — одним проходом по UserRepository, дальше поддерживаются
+    через add_user после каждого сохранения профиля. Ключ None — пользователи
+    без распознанного города, им соответствует весь каталог.
+    """
+
+    def __init__(self, resolver: CityResolver, store, users):
+        self.resolver = resolver
+        self.store = store
+        self.users = users
+        self._events = None  # код -> список событий
+        self._users = None  # код или None -> {user_id: профиль}
+        self._user_cities = {}  # user_id -> код или None
+
+    def event_shards(self) -> dict:
+        """Код города -> события по возрастанию даты; None -> весь каталог."""
+        if self._events is None:
+            events = self.store.upcoming()
+            shards = {code: [] for code in self.resolver.cities}
+            for event in events:
+                shards.setdefault(event.get('city') or '', []).append(event)
+            shards[None] = events
+            self._events = shards
+        return self._events
+
+    def events(self, code: str) -> list:
+        return self.event_shards().get(code, [])
+
+    async def invalidate_events(self) -> None:
+        """Сбрасывает шарды событий; подходит как обработчик EventRefresher.listeners."""
+        self._events = None
+
+    def user_shards(self) -> dict:
+        """Код города (None — не распознан) -> {user_id: профиль}."""
+        if self._users is None:
+            shards = {}
+            for user_id, user in self.users.iter_profiles():
+                code = self.resolver.resolve(user.get('city'))
+                self._user_cities[user_id] = code
+                shards.setdefault(code, {})[user_id] = user
+            self._users = shards
+        return self._users
+
+    def user_ids(self, code) -> set:
+        """Пользователи города (None — без распознанного города)."""
+        return self.user_shards().get(code, {}).keys()
+
+    def profile(self, user_id: int):
+        """Профиль пользователя из индекса или None."""
+        code = self._user_cities.get(user_id)
+        return self.user_shards().get(code, {}).get(user_id)
+
+    def add_user(self, user_id: int, user: dict) -> None:
+        """Учитывает сохранённый профиль (UserRepository.save): нового пользователя или смену города."""
+        if self._users is None:
+            return
+        code = self.resolver.resolve(user.get('city'))
+        previous = self._user_cities.get(user_id, code)
+        self._users.get(previous, {}).pop(user_id, None)
+        self._user_cities[user_id] = code
+        self._users.setdefault(code, {})[user_id] = user
+
+    def stats(self) -> dict:
+        return {
+            'events': {code: len(shard) for code, shard in (self._events or {}).items() if code is not None},
+            'users': {code: len(shard) for code, shard in (self._users or {}).items()}
+        }
@@ -0,0 +1,140 @@
+# event_refresher.py
+
+import asyncio
+import logging
+import time
+
+from cities import CITY_LOCATIONS
+from event_sources import EventAggregator
+from event_store import EventStore, date_to_timestamp
+
+logger = logging.getLogger(__name__)
+
+
+class EventRefresher:
+    """
+    Фоновое обновление каталога событий. Для каждой пары (источник, город)
+    в EventStore хранится fetched_until — докуда события уже выгружены.
+    Очередной проход запрашивает только окно [fetched_until, сейчас + window],
+    то есть события, ставшие видимыми с прошлого раза. Изменения внутри уже
+    выгруженного окна источники отдельным фильтром не отдают, поэтому раз в
+    full_sync_interval окно выгружается целиком (upsert перепишет только
+    изменившиеся строки). Если источник упёрся в предел страниц, fetched_until
+    сдвигается только до последнего полученного события, и следующий проход
+    продолжает выгрузку с него. Прошедшие события удаляются.
+
+    Обработчики читают только EventStore и во внешние API не ходят.
+    """
+
+    def __init__(self, aggregator: EventAggregator, store: EventStore, locations: dict = None,
+                 interval: float = 900.0, window_days: int = 30, full_sync_interval: float = 86400.0):
+        self.aggregator = aggregator
+        self.store = store
+        self.locations = locations or CITY_LOCATIONS
+        self.interval = interval
+        self.window = window_days * 86400
+        self.full_sync_interval = full_sync_interval
+        self._task = None
+        # Метрики: (город, источник) -> последняя ошибка; (город, источник) -> дата последнего
+        # полученного события, если источник упёрся в предел страниц; итоги последнего прохода
+        self.errors = {}
+        self.truncated = {}
+        self.last_cycle = {'seconds': 0.0, 'changed': 0, 'expired': 0, 'finished_at': None}
+        # Корутины без аргументов, вызываются после каждого прохода (пересборка индексов и т.п.)
+        self.listeners = []
+
+    async def refresh_city(self, city: str) -> int:
+        """Обновляет один город. Возвращает число изменённых строк."""
+        now = time.time()
+        until = int(now + self.window)
+        marks = self.store.get_watermarks(city)
+        since, full = {}, {}
+        for source in self.aggregator.sources:
+            mark = marks.get(source.name)
+            full[source.name] = mark is None or now - mark['full_sync_at'] >= self.full_sync_interval
+            since[source.name] = int(now) if full[source.name] else max(int(now), mark['fetched_until'])
+
+        changed = dict.fromkeys(since, 0)
+        runs = {}
+        async for page in self.aggregator.stream(self.locations[city], since, until, runs=runs):
+            result = self.store.upsert(page, city=city)
+            changed[page[0]['source']] += result['changed']
+
+        for name, source_since in since.items():
+            if not self.locations[city].get(name) or source_since >= until:
+                continue
+            # Итоги этого опроса этого города, а не последнего опроса источника вообще
+            run = runs.get(name) or {'error': 'источник не опрошен'}
+            if run['error']:
+                # Водяной знак не сдвигаем: окно будет запрошено повторно
+                self.errors[(city, name)] = run['error']
+                continue
+            self.errors.pop((city, name), None)
+            fetched_until = until
+            if run['truncated']:
+                # Источник упёрся в max_pages: окно выгружено только до последнего полученного события,
+                # со следующего прохода продолжаем с него (upsert не создаст дублей)
+                fetched_until = max(source_since, date_to_timestamp(run['last_date']) or source_since)
+                self.truncated[(city, name)] = run['last_date']
+            else:
+                self.truncated.pop((city, name), None)
+            full_sync_at = now if full[name] else marks[name]['full_sync_at']
+            self.store.set_watermark(name, city, fetched_until, full_sync_at, now, changed[name])
+        return sum(changed.values())
+
+    async def refresh(self) -> None:
+        started = time.monotonic()
+        changed = 0
+        for city in self.locations:
+            changed += await self.refresh_city(city)
+        expired = self.store.expire(int(time.time()))
+        self.last_cycle = {
+            'seconds': time.monotonic() - started,
+            'changed': changed,
+            'expired': expired,
+            'finished_at': time.time()
+        }
+        logger.info(f"Каталог событий обновлён за {self.last_cycle['seconds']:.2f} с: "
+                    f"изменено {changed}, удалено прошедших {expired}")
+        for listener in self.listeners:
+            try:
+                await listener()
+            except Exception as exc:
+                logger.exception(f"Ошибка обработчика обновления каталога: {exc}")
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as exc:
+                logger.exception(f"Ошибка обновления каталога событий: {exc}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.aggregator.close()
+
+    def stats(self) -> dict:
+        """
+        Отставание (lag, секунды с последнего успешного обновления) и число
+        изменённых событий для каждой пары город/источник.
+        """
+        now = time.time()
+        sources = {}
+        for city in self.locations:
+            for name, mark in self.store.get_watermarks(city).items():
+                sources[f"{city}/{name}"] = {
+                    'lag': now - mark['refreshed_at'],
+                    'items': mark['items'],
+                    'fetched_until': mark['fetched_until'],
+                    'error': self.errors.get((city, name)),
+                    'truncated_at': self.truncated.get((city, name))
+                }
+        return {'sources': sources, 'last_cycle': self.last_cycle, 'events': self.store.count()}
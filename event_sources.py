@@ -0,0 +1,303 @@
+# event_sources.py
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+############################
+# ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
+############################
+
+def timestamp_to_str(ts):
+    """
+    Преобразование Unix timestamp в строку формата 'YYYY-MM-DD HH:MM'.
+    """
+    if not ts:
+        return ''
+    try:
+        return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M')
+    except (ValueError, OSError, OverflowError, TypeError):
+        return ''
+
+
+def iso_to_str(iso_str):
+    """
+    Преобразует ISO-дату '2025-02-11T12:00:00+03:00' к '2025-02-11 12:00'.
+    """
+    if not iso_str:
+        return ''
+    return iso_str[:16].replace('T', ' ')
+
+
+############################
+# ИСТОЧНИКИ
+############################
+
+class PageLimitReached(Exception):
+    """
+    Источник отдал max_pages страниц, а у него есть ещё: окно выгружено
+    не целиком. Бросается после последней отданной страницы.
+    """
+
+
+class KudaGoSource:
+    """
+    KudaGo: https://kudago.com/public-api/
+    Страницы перебираются по полю next из ответа.
+    """
+    name = 'kudago'
+
+    def __init__(self, base_url='https://kudago.com/public-api/v1.4/events/', page_size=100, max_pages=10):
+        self.base_url = base_url
+        self.page_size = page_size
+        self.max_pages = max_pages
+
+    @staticmethod
+    def parse(item):
+        title = item.get('title', 'Без названия')
+        dates_info = item.get('dates') or [{}]
+        place = item.get('place') or {}
+        return {
+            'source': 'kudago',
+            'event_id': str(item.get('id', '')),
+            'title': title,
+            'date': timestamp_to_str(dates_info[0].get('start')),
+            'link': item.get('site_url', ''),
+            'short_desc': item.get('short_title') or title,
+            'venue': place.get('title', '') if isinstance(place, dict) else ''
+        }
+
+    async def pages(self, session, location, since=None, until=None):
+        params = {
+            'location': location,
+            'page_size': self.page_size,
+            'lang': 'ru',
+            'fields': 'id,title,short_title,dates,place,site_url',
+            'expand': 'place'
+        }
+        if since:
+            params['actual_since'] = int(since)
+        if until:
+            params['actual_until'] = int(until)
+        url = self.base_url
+        for _ in range(self.max_pages):
+            async with session.get(url, params=params) as response:
+                response.raise_for_status()
+                data = await response.json()
+            yield [self.parse(item) for item in data.get('results', [])]
+            url, params = data.get('next'), None
+            if not url:
+                break
+        else:
+            raise PageLimitReached(self.name)
+
+
+class TimePadSource:
+    """
+    TimePad: https://timepad.github.io/api-doc/
+    Страницы перебираются смещением skip до значения total.
+    """
+    name = 'timepad'
+
+    def __init__(self, base_url='https://api.timepad.ru/v1/events', page_size=100, max_pages=10):
+        self.base_url = base_url
+        self.page_size = page_size
+        self.max_pages = max_pages
+
+    @staticmethod
+    def parse(item):
+        title = item.get('name', 'Без названия')
+        location = item.get('location') or {}
+        return {
+            'source': 'timepad',
+            'event_id': str(item.get('id', '')),
+            'title': title,
+            'date': iso_to_str(item.get('starts_at', '')),
+            'link': item.get('url', ''),
+            'short_desc': item.get('description_short', '') or title,
+            'venue': location.get('address', '') if isinstance(location, dict) else ''
+        }
+
+    async def pages(self, session, location, since=None, until=None):
+        params = {'limit': self.page_size, 'cities': location, 'sort': '+starts_at'}
+        if since:
+            params['starts_at_min'] = datetime.fromtimestamp(since).strftime('%Y-%m-%dT%H:%M:%S')
+        if until:
+            params['starts_at_max'] = datetime.fromtimestamp(until).strftime('%Y-%m-%dT%H:%M:%S')
+        for page in range(self.max_pages):
+            params['skip'] = page * self.page_size
+            async with session.get(self.base_url, params=params) as response:
+                response.raise_for_status()
+                data = await response.json()
+            values = data.get('values', [])
+            yield [self.parse(item) for item in values]
+            if not values or params['skip'] + len(values) >= data.get('total', 0):
+                break
+        else:
+            raise PageLimitReached(self.name)
+
+
+class EventbriteSource:
+    """
+    Eventbrite: https://www.eventbrite.com/platform/api
+    Нужен токен EVENTBRITE_TOKEN; страницы перебираются по continuation.
+    """
+    name = 'eventbrite'
+
+    def __init__(self, base_url='https://www.eventbriteapi.com/v3/events/search/', token=None, max_pages=10):
+        self.base_url = base_url
+        self.token = token or os.getenv('EVENTBRITE_TOKEN', '')
+        self.max_pages = max_pages
+
+    @staticmethod
+    def parse(item):
+        title = (item.get('name') or {}).get('text', 'Без названия')
+        venue = item.get('venue') or {}
+        return {
+            'source': 'eventbrite',
+            'event_id': str(item.get('id', '')),
+            'title': title,
+            'date': iso_to_str((item.get('start') or {}).get('local')),
+            'link': item.get('url', ''),
+            'short_desc': (item.get('description') or {}).get('text', '') or title,
+            'venue': venue.get('name', '') if isinstance(venue, dict) else ''
+        }
+
+    async def pages(self, session, location, since=None, until=None):
+        if not self.token:
+            return
+        params = {'q': location, 'token': self.token, 'expand': 'venue'}
+        if since:
+            params['start_date.range_start'] = datetime.utcfromtimestamp(since).strftime('%Y-%m-%dT%H:%M:%SZ')
+        if until:
+            params['start_date.range_end'] = datetime.utcfromtimestamp(until).strftime('%Y-%m-%dT%H:%M:%SZ')
+        for _ in range(self.max_pages):
+            async with session.get(self.base_url, params=params) as response:
+                response.raise_for_status()
+                data = await response.json()
+            yield [self.parse(item) for item in data.get('events', [])]
+            pagination = data.get('pagination') or {}
+            if not pagination.get('has_more_items'):
+                break
+            params['continuation'] = pagination.get('continuation')
+        else:
+            raise PageLimitReached(self.name)
+
+
+############################
+# АГРЕГАТОР
+############################
+
+class EventAggregator:
+    """
+    Опрашивает все источники одновременно через общий пул соединений aiohttp.
+    У каждого источника свой таймаут: медленный или упавший источник не
+    задерживает остальные, его события просто не попадают в результат.
+
+    locations — код города для каждого источника, например
+    {'kudago': 'ekb', 'timepad': 'Екатеринбург', 'eventbrite': 'Ekaterinburg'}.
+    """
+
+    def __init__(self, sources=None, timeouts=None, default_timeout=15.0, connection_limit=20):
+        self.sources = sources or [KudaGoSource(), TimePadSource(), EventbriteSource()]
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self.connection_limit = connection_limit
+        self._session = None
+        # Метрики последнего опроса: источник -> {'events', 'seconds', 'error', 'truncated', 'last_date'}
+        self.last_run = {}
+
+    async def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _pump(self, source, session, location, since, until, queue, run: dict) -> None:
+        started = time.monotonic()
+
+        async def drain():
+            async for events in source.pages(session, location, since, until):
+                run['events'] += len(events)
+                dates = [event['date'] for event in events if event['date']]
+                if dates:
+                    run['last_date'] = max(dates + [run['last_date'] or ''])
+                if events:
+                    await queue.put(events)
+
+        try:
+            await asyncio.wait_for(drain(), self.timeouts.get(source.name, self.default_timeout))
+        except PageLimitReached:
+            # Не ошибка: полученные страницы годятся, остаток окна выгрузится в следующий проход
+            run['truncated'] = True
+            logger.info(f"[{source.name}] Достигнут предел страниц, последнее событие {run['last_date']}")
+        except asyncio.TimeoutError:
+            run['error'] = 'timeout'
+        except (aiohttp.ClientError, ValueError) as exc:
+            run['error'] = str(exc) or type(exc).__name__
+        except Exception as exc:
+            # Неожиданный ответ (другая структура JSON и т.п.) — тоже ошибка источника, а не всего опроса
+            run['error'] = f"{type(exc).__name__}: {exc}"
+        run['seconds'] = time.monotonic() - started
+        self.last_run[source.name] = run
+        if run['error']:
+            logger.warning(f"[{source.name}] Ошибка: {run['error']}")
+
+    async def stream(self, locations: dict, since=None, until=None, runs: dict = None):
+        """
+        Асинхронно отдаёт страницы событий (списки словарей) по мере их получения
+        от любого источника. since можно задать общим числом или словарём
+        {источник: timestamp}; источник со since >= until пропускается.
+        В runs (если передан) записываются итоги именно этого опроса:
+        источник -> {'events', 'seconds', 'error', 'truncated', 'last_date'};
+        truncated — источник упёрся в max_pages, last_date — дата самого
+        позднего полученного события ('YYYY-MM-DD HH:MM').
+        """
+        runs = {} if runs is None else runs
+        session = await self.session()
+        queue = asyncio.Queue(maxsize=len(self.sources) * 2)
+        tasks = []
+        for source in self.sources:
+            source_since = since.get(source.name) if isinstance(since, dict) else since
+            if not locations.get(source.name) or (source_since and until and source_since >= until):
+                continue
+            runs[source.name] = {'events': 0, 'seconds': 0.0, 'error': None, 'truncated': False, 'last_date': None}
+            tasks.append(asyncio.create_task(
+                self._pump(source, session, locations[source.name], source_since, until, queue, runs[source.name])))
+        done = asyncio.gather(*tasks)
+        try:
+            while not (done.done() and queue.empty()):
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait({getter, done}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                else:
+                    getter.cancel()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def fetch_all(self, locations: dict, since=None, until=None) -> list:
+        events = []
+        async for page in self.stream(locations, since, until):
+            events.extend(page)
+        return events
@@ -0,0 +1,181 @@
+# event_store.py
+
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+EVENT_FIELDS = ('source', 'event_id', 'title', 'date', 'link', 'short_desc', 'venue', 'city')
+
+_PUNCTUATION = re.compile(r'[^\w\s]+')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """Нормализация для нечёткого сравнения: регистр, ё, кавычки и пунктуация, пробелы."""
+    text = (text or '').lower().replace('ё', 'е')
+    return _SPACES.sub(' ', _PUNCTUATION.sub(' ', text)).strip()
+
+
+def dedup_key(event: dict) -> str:
+    """Ключ одинаковых событий из разных источников: название, дата и площадка."""
+    return '|'.join((normalize_text(event.get('title')), event.get('date') or '',
+                     normalize_text(event.get('venue'))))
+
+
+def date_to_timestamp(date_str: str):
+    """'YYYY-MM-DD HH:MM' -> Unix timestamp или None."""
+    try:
+        return int(datetime.strptime(date_str, '%Y-%m-%d %H:%M').timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+class EventStore:
+    """
+    Каталог событий в SQLite. Пара (source, event_id) уникальна, поэтому
+    повторная загрузка того же каталога не создаёт дублей: пакет событий
+    записывается одним executemany-upsert в одной транзакции, а строки,
+    которые не изменились, не переписываются. События, совпадающие с уже
+    сохранёнными из другого источника по dedup_key, отбрасываются.
+    """
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT NOT NULL,
+                event_id TEXT NOT NULL,
+                title TEXT,
+                date TEXT,
+                link TEXT,
+                short_desc TEXT,
+                venue TEXT,
+                city TEXT,
+                starts_at INTEGER,
+                dedup_key TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (source, event_id)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS events_dedup ON events (dedup_key)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS events_city_start ON events (city, starts_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS events_start ON events (starts_at)")
+        # Докуда (fetched_until) каждый источник уже выгружен для каждого города
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS event_watermarks (
+                source TEXT NOT NULL,
+                city TEXT NOT NULL,
+                fetched_until INTEGER NOT NULL,
+                full_sync_at REAL NOT NULL,
+                refreshed_at REAL NOT NULL,
+                items INTEGER NOT NULL,
+                PRIMARY KEY (source, city)
+            ) WITHOUT ROWID
+        """)
+
+    def _foreign_duplicates(self, rows: list) -> set:
+        """dedup_key из пакета, которые уже заняты событием с другим (source, event_id)."""
+        taken = set()
+        keys = list({row['dedup_key'] for row in rows})
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            cursor = self.conn.execute(
+                f"SELECT dedup_key, source, event_id FROM events "
+                f"WHERE dedup_key IN ({', '.join('?' for _ in chunk)})", chunk
+            )
+            taken.update((key, source, event_id) for key, source, event_id in cursor)
+        return taken
+
+    def upsert(self, events, city: str = '') -> dict:
+        """
+        Сохраняет пакет событий. Возвращает {'changed', 'duplicates', 'received'}:
+        changed — сколько строк действительно вставлено или обновлено.
+        """
+        now = time.time()
+        rows = []
+        for ev in events:
+            row = {name: ev.get(name) or '' for name in EVENT_FIELDS}
+            row['city'] = row['city'] or city
+            row['starts_at'] = date_to_timestamp(row['date'])
+            row['dedup_key'] = dedup_key(row)
+            row['updated_at'] = now
+            rows.append(row)
+
+        # Отбрасываем дубли: внутри пакета и с тем, что уже лежит в базе от других источников
+        owners = {}
+        for key, source, event_id in self._foreign_duplicates(rows):
+            owners.setdefault(key, (source, event_id))
+        unique_rows = []
+        for row in rows:
+            owner = owners.setdefault(row['dedup_key'], (row['source'], row['event_id']))
+            if owner == (row['source'], row['event_id']):
+                unique_rows.append(row)
+
+        changes_before = self.conn.total_changes
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany("""
+                INSERT INTO events (source, event_id, title, date, link, short_desc, venue, city,
+                                    starts_at, dedup_key, updated_at)
+                VALUES (:source, :event_id, :title, :date, :link, :short_desc, :venue, :city,
+                        :starts_at, :dedup_key, :updated_at)
+                ON CONFLICT (source, event_id) DO UPDATE SET
+                    title = excluded.title, date = excluded.date, link = excluded.link,
+                    short_desc = excluded.short_desc, venue = excluded.venue, city = excluded.city,
+                    starts_at = excluded.starts_at, dedup_key = excluded.dedup_key,
+                    updated_at = excluded.updated_at
+                WHERE (title, date, link, short_desc, venue, city)
+                      IS NOT (excluded.title, excluded.date, excluded.link, excluded.short_desc,
+                              excluded.venue, excluded.city)
+            """, unique_rows)
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return {
+            'received': len(rows),
+            'changed': self.conn.total_changes - changes_before,
+            'duplicates': len(rows) - len(unique_rows)
+        }
+
+    def upcoming(self, city: str = None, since: int = None, limit: int = None) -> list:
+        """События, начинающиеся не раньше since (по умолчанию — сейчас), по возрастанию даты."""
+        query = "SELECT * FROM events WHERE starts_at >= ?"
+        params = [int(since if since is not None else time.time())]
+        if city is not None:
+            query += " AND city = ?"
+            params.append(city)
+        query += " ORDER BY starts_at"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self.conn.execute(query, params)]
+
+    def expire(self, before: int) -> int:
+        """Удаляет события, начавшиеся раньше before. Возвращает число удалённых."""
+        return self.conn.execute("DELETE FROM events WHERE starts_at < ?", (before,)).rowcount
+
+    def get_watermarks(self, city: str) -> dict:
+        rows = self.conn.execute("SELECT * FROM event_watermarks WHERE city = ?", (city,))
+        return {row['source']: dict(row) for row in rows}
+
+    def set_watermark(self, source: str, city: str, fetched_until: int, full_sync_at: float,
+                      refreshed_at: float, items: int) -> None:
+        self.conn.execute("""
+            INSERT INTO event_watermarks (source, city, fetched_until, full_sync_at, refreshed_at, items)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (source, city) DO UPDATE SET
+                fetched_until = excluded.fetched_until, full_sync_at = excluded.full_sync_at,
+                refreshed_at = excluded.refreshed_at, items = excluded.items
+        """, (source, city, fetched_until, full_sync_at, refreshed_at, items))
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
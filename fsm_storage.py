@@ -0,0 +1,143 @@
+# fsm_storage.py
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM-хранилище aiogram поверх SQLite: незавершённые регистрации и
+    диалоги AdditionalInfo переживают перезапуск бота.
+
+    Чтение и запись идут через кэш в памяти, изменения сбрасываются в базу
+    пачками одной транзакцией (раз в flush_interval секунд или при накоплении
+    batch_size изменений). Состояния, не менявшиеся дольше ttl секунд,
+    считаются брошенными и удаляются.
+    """
+
+    def __init__(self, path: str, ttl: float = 24 * 60 * 60, flush_interval: float = 1.0,
+                 batch_size: int = 500, key_builder: Optional[KeyBuilder] = None) -> None:
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS fsm_states (
+                key TEXT PRIMARY KEY,
+                state TEXT,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS fsm_states_updated ON fsm_states (updated_at)")
+        # key -> [state, data, updated_at]
+        self._records: Dict[str, list] = {}
+        self._dirty = set()
+        self._flusher: Optional[asyncio.Task] = None
+
+    def _load(self, key: StorageKey) -> list:
+        db_key = self.key_builder.build(key)
+        record = self._records.get(db_key)
+        if record is None:
+            row = self.conn.execute(
+                "SELECT state, data, updated_at FROM fsm_states WHERE key = ?", (db_key,)
+            ).fetchone()
+            record = [row[0], json.loads(row[1]), row[2]] if row else [None, {}, time.time()]
+            self._records[db_key] = record
+        if time.time() - record[2] > self.ttl:
+            record[:] = [None, {}, time.time()]
+            self._dirty.add(db_key)
+        return record
+
+    def _touch(self, key: StorageKey, record: list) -> None:
+        db_key = self.key_builder.build(key)
+        record[2] = time.time()
+        self._dirty.add(db_key)
+        if self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+        if len(self._dirty) >= self.batch_size:
+            self.flush()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self._load(key)
+        record[0] = state.state if isinstance(state, State) else state
+        self._touch(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return self._load(key)[0]
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = self._load(key)
+        record[1] = data.copy()
+        self._touch(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return self._load(key)[1].copy()
+
+    def flush(self) -> None:
+        """Сбрасывает накопленные изменения в базу одной транзакцией."""
+        if not self._dirty:
+            return
+        upserts, deletes = [], []
+        for db_key in self._dirty:
+            state, data, updated_at = self._records[db_key]
+            if state is None and not data:
+                deletes.append((db_key,))
+            else:
+                upserts.append((db_key, state, json.dumps(data, ensure_ascii=False), updated_at))
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany(
+                "INSERT INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET state = excluded.state, data = excluded.data, "
+                "updated_at = excluded.updated_at",
+                upserts
+            )
+            self.conn.executemany("DELETE FROM fsm_states WHERE key = ?", deletes)
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        self._dirty.clear()
+
+    def expire(self) -> int:
+        """Удаляет брошенные состояния из базы и кэша. Возвращает число удалённых записей."""
+        deadline = time.time() - self.ttl
+        stale = [k for k, record in self._records.items() if record[2] < deadline and k not in self._dirty]
+        for db_key in stale:
+            del self._records[db_key]
+        cursor = self.conn.execute("DELETE FROM fsm_states WHERE updated_at < ?", (deadline,))
+        return cursor.rowcount
+
+    async def _flush_loop(self) -> None:
+        last_expire = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.flush()
+                if time.monotonic() - last_expire > min(self.ttl, 60 * 60):
+                    expired = self.expire()
+                    last_expire = time.monotonic()
+                    if expired:
+                        logger.info(f"Удалено брошенных FSM-состояний: {expired}")
+            except sqlite3.Error:
+                logger.exception("Не удалось сохранить FSM-состояния")
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,93 @@
+# jobs.py
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    Очередь фоновых задач с ограниченным числом воркеров и повторами.
+    Обработчики только ставят задачу в очередь и сразу отвечают пользователю,
+    а долгие операции (привязка вуза, импорт расписания) выполняются здесь.
+    """
+
+    def __init__(self, workers: int = 4, maxsize: int = 1000, max_retries: int = 3, retry_delay: float = 1.0):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._tasks = []
+        # Метрики
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    async def start(self) -> None:
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"job-worker-{i}"))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def submit(self, name: str, func, *args, on_failure=None) -> None:
+        """
+        Ставит корутину func(*args) в очередь. Если очередь заполнена, ждёт
+        свободного места. on_failure(exc) вызывается, когда повторы исчерпаны.
+        """
+        await self._queue.put((name, func, args, on_failure, time.monotonic()))
+
+    async def _worker(self) -> None:
+        while True:
+            name, func, args, on_failure, submitted = await self._queue.get()
+            self.running += 1
+            try:
+                await self._run(name, func, args, on_failure)
+            finally:
+                self.running -= 1
+                self._queue.task_done()
+                latency = time.monotonic() - submitted
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+
+    async def _run(self, name: str, func, args, on_failure) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                await func(*args)
+                self.completed += 1
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                if attempt < self.max_retries:
+                    self.retried += 1
+                    logger.warning(f"Задача {name} упала (попытка {attempt + 1}), повторяем: {exc}")
+                    await asyncio.sleep(self.retry_delay * 2 ** attempt)
+                    continue
+                self.failed += 1
+                logger.exception(f"Задача {name} не выполнена после {attempt + 1} попыток")
+                if on_failure is not None:
+                    try:
+                        await on_failure(exc)
+                    except Exception:
+                        logger.exception(f"Ошибка в обработчике сбоя задачи {name}")
+
+    def stats(self) -> dict:
+        finished = self.completed + self.failed
+        return {
+            "depth": self._queue.qsize(),
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "latency_avg": self.latency_total / finished if finished else 0.0,
+            "latency_max": self.latency_max
+        }
@@ -0,0 +1,66 @@
+# keyboards.py
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from localization import MESSAGES, get_msg
+from schedule import DAYS
+
+# Клавиатуры строятся один раз при импорте и переиспользуются всеми обработчиками.
+# Объекты aiogram неизменяемы, поэтому их безопасно отдавать в reply_markup повторно.
+
+UNIVERSITIES = {
+    "uni_cu": "ЦУ",
+    "uni_bauman": "Бауманка",
+    "uni_hse": "ВШЭ"
+}
+
+LANGUAGE_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="Русский", callback_data="lang_ru"),
+     InlineKeyboardButton(text="English", callback_data="lang_en")],
+    [InlineKeyboardButton(text="Беларускі", callback_data="lang_be"),
+     InlineKeyboardButton(text="Қазақша", callback_data="lang_kk")],
+    [InlineKeyboardButton(text="中文", callback_data="lang_zh"),
+     InlineKeyboardButton(text="한국어", callback_data="lang_ko")]
+])
+
+UNIVERSITY_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text=UNIVERSITIES["uni_cu"], callback_data="uni_cu"),
+     InlineKeyboardButton(text=UNIVERSITIES["uni_bauman"], callback_data="uni_bauman")],
+    [InlineKeyboardButton(text=UNIVERSITIES["uni_hse"], callback_data="uni_hse")]
+])
+
+DAY_KB = InlineKeyboardMarkup(
+    inline_keyboard=[[InlineKeyboardButton(text=day, callback_data=f"day_{day}")] for day in DAYS])
+
+# Оценка от 1 до 5 (активность и общительность)
+RATING_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text=str(i), callback_data=str(i)) for i in range(1, 6)]
+])
+
+
+# Кнопки финального меню: ключ текста в локализации -> callback_data
+MENU_ACTIONS = {
+    "event_search": "search_events",
+    "update_info": "update_info",
+    "edit_schedule": "edit_schedule",
+    "view_schedule": "view_schedule"
+}
+
+
+def _menu(lang: str, keys) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=get_msg(lang, key), callback_data=MENU_ACTIONS[key])] for key in keys
+    ])
+
+
+# Финальное меню, пока дополнительная информация не заполнена – 4 кнопки
+FULL_MENU_KB = {lang: _menu(lang, ("event_search", "update_info", "edit_schedule", "view_schedule"))
+                for lang in MESSAGES}
+# Финальное меню после заполнения дополнительной информации – 3 кнопки
+MAIN_MENU_KB = {lang: _menu(lang, ("view_schedule", "edit_schedule", "event_search"))
+                for lang in MESSAGES}
+
+
+def final_menu(lang: str, has_profile: bool = True) -> InlineKeyboardMarkup:
+    menus = MAIN_MENU_KB if has_profile else FULL_MENU_KB
+    return menus.get(lang) or menus["en"]
@@ -1,5 +1,9 @@
 # localization.py
 
+import logging
+
+logger = logging.getLogger(__name__)
+
 MESSAGES = {
     "en": {
         "greeting": "Hello! Welcome to the app for international students.",
@@ -26,7 +30,20 @@ MESSAGES = {
         "update_enter_hobbies": "Please describe what you enjoy:",
         "info_updated": "Information updated.",
         "edit_schedule_prompt": ("Enter an event in the format: [day] [start time] - [end time] [event description]\n"
-                                 "Example: MN 19:40 - 21:30 Movie screening")
+                                 "Example: MN 19:40 - 21:30 Movie screening"),
+        "choose_day": "Choose a day of the week:",
+        "event_added": "Event added.",
+        "invalid_event_format": "Invalid format. Please try again. Example: ПН 19:40 - 21:30 Movie screening",
+        "invalid_event_time": "The end time must be later than the start time. Please try again.",
+        "event_conflict": "The event overlaps with:\n{conflicts}",
+        "event_free_slot": "Nearest free time: {day} {start} - {end}",
+        "try_again": "Please try again.",
+        "schedule_not_found": "Schedule not found.",
+        "day_off": "Day off",
+        "events_found": "Events you might like:",
+        "no_events": "No upcoming events found yet, please try again later.",
+        "import_failed": "Could not get your schedule from the university. Please try again later.",
+        "reminder": "In {minutes} min: {start} {title}"
     },
     "ru": {
         "greeting": "Привет! Добро пожаловать в приложение для иностранных студентов.",
@@ -53,7 +70,20 @@ MESSAGES = {
         "update_enter_hobbies": "Опишите, что вам нравится:",
         "info_updated": "Информация обновлена.",
         "edit_schedule_prompt": ("Введите событие в формате: [день недели] [время начала] - [время конца] [событие]\n"
-                                 "Пример: ПН 19:40 - 21:30 просмотр фильма")
+                                 "Пример: ПН 19:40 - 21:30 просмотр фильма"),
+        "choose_day": "Выберите день недели:",
+        "event_added": "Событие добавлено.",
+        "invalid_event_format": "Неверный формат. Попробуйте снова. Пример: ПН 19:40 - 21:30 просмотр фильма",
+        "invalid_event_time": "Время окончания должно быть позже времени начала. Попробуйте снова.",
+        "event_conflict": "Событие пересекается с:\n{conflicts}",
+        "event_free_slot": "Ближайшее свободное время: {day} {start} - {end}",
+        "try_again": "Попробуйте снова.",
+        "schedule_not_found": "Расписание не найдено.",
+        "day_off": "Выходной",
+        "events_found": "Вам могут понравиться события:",
+        "no_events": "Пока не нашлось ближайших событий, попробуйте позже.",
+        "import_failed": "Не удалось получить расписание из вуза. Попробуйте позже.",
+        "reminder": "Через {minutes} мин: {start} {title}"
     },
     "be": {
         "greeting": "Прывітанне! Сардэчна запрашаем у прыкладанне для замежных студэнтаў.",
@@ -80,7 +110,20 @@ MESSAGES = {
         "update_enter_hobbies": "Апішыце, што вам падабаецца:",
         "info_updated": "Інфармацыя абноўлена.",
         "edit_schedule_prompt": ("Увядзіце падзею ў фармаце: [дзень тыдня] [час пачатку] - [час заканчэння] [падзея]\n"
-                                 "Прыклад: ПН 19:40 - 21:30 прагляд фільма")
+                                 "Прыклад: ПН 19:40 - 21:30 прагляд фільма"),
+        "choose_day": "Абярыце дзень тыдня:",
+        "event_added": "Падзея дададзена.",
+        "invalid_event_format": "Няправільны фармат. Паспрабуйце яшчэ раз. Прыклад: ПН 19:40 - 21:30 прагляд фільма",
+        "invalid_event_time": "Час заканчэння павінен быць пазней за час пачатку. Паспрабуйце яшчэ раз.",
+        "event_conflict": "Падзея перакрываецца з:\n{conflicts}",
+        "event_free_slot": "Бліжэйшы вольны час: {day} {start} - {end}",
+        "try_again": "Паспрабуйце яшчэ раз.",
+        "schedule_not_found": "Расклад не знойдзены.",
+        "day_off": "Выхадны",
+        "events_found": "Вам могуць спадабацца падзеі:",
+        "no_events": "Пакуль не знайшлося бліжэйшых падзей, паспрабуйце пазней.",
+        "import_failed": "Не ўдалося атрымаць расклад з ВНУ. Паспрабуйце пазней.",
+        "reminder": "Праз {minutes} хв: {start} {title}"
     },
     "kk": {
         "greeting": "Сәлем! Шетел студенттеріне арналған қосымшаға қош келдіңіз.",
@@ -107,7 +150,20 @@ MESSAGES = {
         "update_enter_hobbies": "Сипаттаңыз, сізге не ұнайды:",
         "info_updated": "Ақпарат жаңартылды.",
         "edit_schedule_prompt": ("Оқиғаны келесі форматта енгізіңіз: [апта күні] [басталу уақыты] - [аяқталу уақыты] [оқиға]\n"
-                                 "Мысал: ДҰ 19:40 - 21:30 кино көру")
+                                 "Мысал: ДҰ 19:40 - 21:30 кино көру"),
+        "choose_day": "Апта күнін таңдаңыз:",
+        "event_added": "Оқиға қосылды.",
+        "invalid_event_format": "Формат қате. Қайталап көріңіз. Мысал: ПН 19:40 - 21:30 кино көру",
+        "invalid_event_time": "Аяқталу уақыты басталу уақытынан кеш болуы керек. Қайталап көріңіз.",
+        "event_conflict": "Оқиға мыналармен қиылысады:\n{conflicts}",
+        "event_free_slot": "Ең жақын бос уақыт: {day} {start} - {end}",
+        "try_again": "Қайталап көріңіз.",
+        "schedule_not_found": "Кесте табылмады.",
+        "day_off": "Демалыс күні",
+        "events_found": "Сізге ұнауы мүмкін оқиғалар:",
+        "no_events": "Әзірге жақын оқиғалар табылмады, кейінірек қайталап көріңіз.",
+        "import_failed": "Университеттен кестені алу мүмкін болмады. Кейінірек қайталап көріңіз.",
+        "reminder": "{minutes} минуттан кейін: {start} {title}"
     },
     "zh": {
         "greeting": "你好！欢迎使用针对国际学生的应用程序。",
@@ -133,7 +189,20 @@ MESSAGES = {
         "update_enter_hobbies": "请描述您喜欢的事物：",
         "info_updated": "信息已更新.",
         "edit_schedule_prompt": ("请输入事件，格式为：[星期缩写] [开始时间] - [结束时间] [事件描述]\n"
-                                 "例如：周一 19:40 - 21:30 观看电影")
+                                 "例如：周一 19:40 - 21:30 观看电影"),
+        "choose_day": "请选择星期几：",
+        "event_added": "活动已添加。",
+        "invalid_event_format": "格式错误，请重试。例如：ПН 19:40 - 21:30 观看电影",
+        "invalid_event_time": "结束时间必须晚于开始时间，请重试。",
+        "event_conflict": "该活动与以下安排冲突：\n{conflicts}",
+        "event_free_slot": "最近的空闲时间：{day} {start} - {end}",
+        "try_again": "请重试。",
+        "schedule_not_found": "未找到时间表。",
+        "day_off": "休息日",
+        "events_found": "您可能感兴趣的活动：",
+        "no_events": "暂时没有找到近期活动，请稍后再试。",
+        "import_failed": "无法从大学获取时间表，请稍后再试。",
+        "reminder": "{minutes} 分钟后开始：{start} {title}"
     },
     "ko": {
         "greeting": "안녕하세요! 국제 학생들을 위한 앱에 오신 것을 환영합니다.",
@@ -159,7 +228,20 @@ MESSAGES = {
         "update_enter_hobbies": "좋아하는 것을 설명해주세요:",
         "info_updated": "정보가 업데이트되었습니다.",
         "edit_schedule_prompt": ("[요일] [시작 시간] - [종료 시간] [이벤트 설명] 형식으로 이벤트를 입력해주세요.\n"
-                                 "예: 월 19:40 - 21:30 영화 감상")
+                                 "예: 월 19:40 - 21:30 영화 감상"),
+        "choose_day": "요일을 선택해주세요:",
+        "event_added": "이벤트가 추가되었습니다.",
+        "invalid_event_format": "잘못된 형식입니다. 다시 시도해주세요. 예: ПН 19:40 - 21:30 영화 감상",
+        "invalid_event_time": "종료 시간은 시작 시간보다 늦어야 합니다. 다시 시도해주세요.",
+        "event_conflict": "이벤트가 다음 일정과 겹칩니다:\n{conflicts}",
+        "event_free_slot": "가장 가까운 빈 시간: {day} {start} - {end}",
+        "try_again": "다시 시도해주세요.",
+        "schedule_not_found": "시간표를 찾을 수 없습니다.",
+        "day_off": "휴일",
+        "events_found": "관심 있을 만한 이벤트:",
+        "no_events": "아직 예정된 이벤트가 없습니다. 나중에 다시 시도해 주세요.",
+        "import_failed": "대학교에서 시간표를 가져오지 못했습니다. 나중에 다시 시도해주세요.",
+        "reminder": "{minutes}분 후 시작: {start} {title}"
     }
 }
 
@@ -172,5 +254,46 @@ LANG_MAP = {
     "lang_ko": "ko"
 }
 
-def get_msg(lang: str, key: str) -> str:
-    return MESSAGES.get(lang, MESSAGES["en"]).get(key, "")
+# Язык, на который откатываются отсутствующие переводы и неизвестные языки
+DEFAULT_LANG = "en"
+
+
+def find_missing_keys() -> dict:
+    """Ключи, которые есть хотя бы в одном языке, но отсутствуют в данном: {язык: [ключи]}."""
+    all_keys = set().union(*MESSAGES.values())
+    return {lang: sorted(all_keys - set(messages))
+            for lang, messages in MESSAGES.items() if all_keys - set(messages)}
+
+
+def _compile() -> dict:
+    """
+    Разворачивает MESSAGES в плоскую таблицу {(язык, ключ): текст}, в которой
+    откат на DEFAULT_LANG уже применён. Поиск сообщения — одно обращение к dict.
+    """
+    catalog = {}
+    for lang, messages in MESSAGES.items():
+        for key, text in {**MESSAGES[DEFAULT_LANG], **messages}.items():
+            catalog[lang, key] = text
+    return catalog
+
+
+MISSING_KEYS = find_missing_keys()
+for _lang, _keys in MISSING_KEYS.items():
+    logger.warning(f"Локализация: для языка {_lang} нет ключей {', '.join(_keys)}")
+
+CATALOG = _compile()
+
+
+def get_msg(lang: str, key: str, **params) -> str:
+    """
+    Текст сообщения на языке lang. Шаблоны с параметрами ("{day} {start}")
+    подставляются через params.
+    """
+    try:
+        text = CATALOG[lang, key]
+    except KeyError:
+        text = CATALOG.get((DEFAULT_LANG, key))
+        if text is None:
+            logger.error(f"Локализация: неизвестный ключ {key}")
+            return ""
+    return text.format(**params) if params else text
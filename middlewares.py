@@ -0,0 +1,252 @@
+# middlewares.py
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import TelegramObject
+
+from localization import DEFAULT_LANG, MESSAGES
+from users import UserRepository
+
+logger = logging.getLogger(__name__)
+
+
+class LocaleMiddleware(BaseMiddleware):
+    """
+    Определяет язык пользователя один раз на апдейт и передаёт его
+    обработчикам аргументом lang. Язык берётся из профиля (кэш UserRepository),
+    для новых пользователей — из language_code Telegram, иначе DEFAULT_LANG.
+    """
+
+    def __init__(self, users: UserRepository) -> None:
+        self.users = users
+        self.calls = 0
+        self.total_ns = 0
+
+    def resolve(self, user) -> str:
+        if user is None:
+            return DEFAULT_LANG
+        profile = self.users.get(user.id)
+        if profile and profile.get("language"):
+            return profile["language"]
+        if user.language_code in MESSAGES:
+            return user.language_code
+        return DEFAULT_LANG
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        started = time.perf_counter_ns()
+        data["lang"] = self.resolve(data.get("event_from_user"))
+        self.total_ns += time.perf_counter_ns() - started
+        self.calls += 1
+        return await handler(event, data)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "avg_us": self.total_ns / self.calls / 1000 if self.calls else 0.0
+        }
+
+
+class TokenBucket:
+    """
+    Ведро токенов с резервированием: reserve() всегда занимает токен и
+    возвращает, сколько секунд подождать до его появления (0 — токен есть).
+    Токены могут уйти в минус, так что ожидающие выстраиваются в очередь
+    в порядке вызова, а не отбрасываются.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _fill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Ожидание для следующего reserve() без резервирования."""
+        self._fill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def reserve(self, now: float) -> float:
+        wait = self.delay(now)
+        self.tokens -= 1
+        return wait
+
+    def idle(self, now: float) -> bool:
+        self._fill(now)
+        return self.tokens >= self.capacity
+
+
+class BucketMap:
+    """Вёдра по ключу (user_id, chat_id); полные вёдра неактивных ключей периодически удаляются."""
+
+    def __init__(self, rate: float, capacity: float, max_size: int = 10000) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.max_size = max_size
+        self.buckets = {}
+
+    def get(self, key, now: float) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_size:
+                self.buckets = {k: b for k, b in self.buckets.items() if not b.idle(now)}
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.capacity, now)
+        return bucket
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Ограничение входящих апдейтов: по ведру на пользователя и на чат. Апдейт
+    сверх лимита не отбрасывается, а ждёт своей очереди (asyncio.sleep), поэтому
+    серия нажатий на кнопки обрабатывается по порядку, но не чаще rate в секунду.
+    Отбрасываются только апдейты, которым пришлось бы ждать дольше max_delay, —
+    защита от накопления тысяч ожидающих задач от одного источника.
+    В режиме вебхука ожидание проходит до слота обработки (см. webhook.py),
+    чтобы один флудящий чат не занимал слоты, нужные остальным. clock можно
+    подменить (проверки с поддельным временем).
+    """
+
+    def __init__(self, user_rate: float = 2.0, user_burst: float = 5,
+                 chat_rate: float = 5.0, chat_burst: float = 10, max_delay: float = 10.0,
+                 clock=time.monotonic) -> None:
+        self.clock = clock
+        self.users = BucketMap(user_rate, user_burst)
+        self.chats = BucketMap(chat_rate, chat_burst)
+        self.max_delay = max_delay
+        self.passed = 0
+        self.throttled = 0
+        self.dropped = 0
+        self.delayed_seconds = 0.0
+
+    def admit(self, user, chat) -> Optional[float]:
+        """
+        Занимает токены апдейта и возвращает, сколько секунд ему подождать,
+        или None, если апдейт нужно отбросить (ожидание дольше max_delay).
+        """
+        now = self.clock()
+        buckets = []
+        if user is not None:
+            buckets.append(self.users.get(user.id, now))
+        if chat is not None:
+            buckets.append(self.chats.get(chat.id, now))
+        wait = max((bucket.delay(now) for bucket in buckets), default=0.0)
+        if wait > self.max_delay:
+            self.dropped += 1
+            logger.warning(f"Апдейт отброшен: user={user.id if user else None}, "
+                           f"chat={chat.id if chat else None}, ожидание {wait:.1f} с")
+            return None
+        wait = max((bucket.reserve(now) for bucket in buckets), default=0.0)
+        if wait > 0:
+            self.throttled += 1
+            self.delayed_seconds += wait
+        self.passed += 1
+        return wait
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        # Вебхук пропускает апдейт через admit() сам, до того как занять слот обработки
+        if data.get("throttle_admitted"):
+            return await handler(event, data)
+        wait = self.admit(data.get("event_from_user"), data.get("event_chat"))
+        if wait is None:
+            return None
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return await handler(event, data)
+
+    def stats(self) -> dict:
+        return {
+            "passed": self.passed,
+            "throttled": self.throttled,
+            "dropped": self.dropped,
+            "delayed_seconds": self.delayed_seconds,
+            "tracked_users": len(self.users.buckets),
+            "tracked_chats": len(self.chats.buckets)
+        }
+
+
+class SendLimiter(BaseRequestMiddleware):
+    """
+    Ограничение исходящих сообщений (middleware сессии бота): не больше rate
+    в секунду на всех (лимит Telegram — около 30; burst=1 — без всплесков сверх
+    него) и chat_rate в секунду на один чат. Сообщения одного чата уходят по
+    одному и в порядке вызова. Запрос сверх лимита ждёт своей очереди и не
+    отбрасывается. Остальные методы API (getUpdates, answerCallbackQuery, ...)
+    не ограничиваются.
+    """
+
+    LIMITED_PREFIXES = ("send", "copy", "forward", "edit")
+
+    def __init__(self, rate: float = 30.0, burst: float = 1, chat_rate: float = 1.0, chat_burst: float = 3) -> None:
+        self.bucket = TokenBucket(rate, burst, time.monotonic())
+        self.chats = BucketMap(chat_rate, chat_burst)
+        self._chat_locks = {}  # chat_id -> (Lock, число ожидающих)
+        self.sent = 0
+        self.throttled = 0
+        self.delayed_seconds = 0.0
+        self.max_wait = 0.0
+
+    async def _wait(self, bucket: TokenBucket) -> None:
+        wait = bucket.reserve(time.monotonic())
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def __call__(self, make_request, bot, method):
+        if not method.__api_method__.startswith(self.LIMITED_PREFIXES):
+            return await make_request(bot, method)
+        started = time.monotonic()
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            await self._wait(self.bucket)
+            return await self._send(make_request, bot, method, started)
+        lock, waiters = self._chat_locks.get(chat_id, (None, 0))
+        lock = lock or asyncio.Lock()
+        self._chat_locks[chat_id] = (lock, waiters + 1)
+        try:
+            async with lock:
+                await self._wait(self.chats.get(chat_id, time.monotonic()))
+                # Общий слот берётся после ожидания чата: иначе отложенные сообщения ушли бы пачкой
+                await self._wait(self.bucket)
+                return await self._send(make_request, bot, method, started)
+        finally:
+            lock, waiters = self._chat_locks[chat_id]
+            if waiters == 1:
+                del self._chat_locks[chat_id]
+            else:
+                self._chat_locks[chat_id] = (lock, waiters - 1)
+
+    async def _send(self, make_request, bot, method, started: float):
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.throttled += 1
+            self.delayed_seconds += waited
+            self.max_wait = max(self.max_wait, waited)
+        self.sent += 1
+        return await make_request(bot, method)
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "throttled": self.throttled,
+            "delayed_seconds": self.delayed_seconds,
+            "max_wait": self.max_wait
+        }
@@ -0,0 +1,109 @@
+"""
+Пропускная способность Database против aiosqlite.connect() на каждый вызов
+обработчика (как было в main_v2.py) при последовательных и конкурентных вызовах:
+    python bench_database.py [вызовов]
+"""
+
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import aiosqlite
+
+from database import Database
+
+USERS = 20000
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        telegram_id INTEGER PRIMARY KEY, name TEXT, country TEXT, city TEXT,
+        interests TEXT, language_level TEXT, is_mentor INTEGER DEFAULT 0
+    )
+"""
+READ = "SELECT interests, city FROM users WHERE telegram_id=?"
+WRITE = ("INSERT OR REPLACE INTO users (telegram_id, name, country, city, interests, language_level) "
+         "VALUES (?, ?, ?, ?, ?, ?)")
+
+
+def prepare(path: str) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(SCHEMA)
+    conn.executemany("INSERT INTO users (telegram_id, name, city, interests) VALUES (?, ?, ?, ?)",
+                     [(i, f"user{i}", "Москва", "музыка") for i in range(USERS)])
+    conn.commit()
+    conn.close()
+
+
+async def connect_per_call(path: str, i: int, write: bool) -> None:
+    async with aiosqlite.connect(path) as db:
+        if write:
+            await db.execute(WRITE, (USERS + i, "x", "y", "Москва", "музыка", "B2"))
+            await db.commit()
+        else:
+            cursor = await db.execute(READ, (random.randrange(USERS),))
+            await cursor.fetchone()
+
+
+async def pooled(db: Database, i: int, write: bool) -> None:
+    if write:
+        await db.execute(WRITE, (USERS + i, "x", "y", "Москва", "музыка", "B2"))
+    else:
+        await db.fetchone(READ, (random.randrange(USERS),))
+
+
+async def run(kind: str, tmp: str, total: int, concurrency: int, write_share: float) -> str:
+    path = os.path.join(tmp, f"{kind}-{concurrency}-{write_share}.db")
+    prepare(path)
+    db = None
+    if kind == "pool":
+        db = Database(path)
+        await db.open()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failed = 0
+
+    async def call(i: int) -> None:
+        nonlocal failed
+        async with semaphore:
+            started = time.perf_counter()
+            write = random.random() < write_share
+            try:
+                if db is not None:
+                    await pooled(db, i, write)
+                else:
+                    await connect_per_call(path, i, write)
+            except sqlite3.OperationalError:
+                # database is locked: писатели с отдельными соединениями не дождались блокировки
+                failed += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(call(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    line = (f"{kind:8} одновременно {concurrency:3}, записи {write_share:4.0%}: {total / elapsed:7.0f} вызовов/с, "
+            f"p50 {latencies[len(latencies) // 2] * 1000:6.2f} мс, p99 {latencies[int(len(latencies) * .99)] * 1000:7.2f} мс")
+    if failed:
+        line += f", ошибок {failed}"
+    if db is not None:
+        line += f", в среднем {db.stats()['avg_batch']:.0f} записей на коммит"
+        await db.close()
+    return line
+
+
+async def main(total: int) -> None:
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        for concurrency in (1, 64):
+            for write_share in (0.0, 0.2, 1.0):
+                for kind in ("connect", "pool"):
+                    print(await run(kind, tmp, total, concurrency, write_share))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 4000))
@@ -0,0 +1,80 @@
+"""
+Накладные расходы на вызов GigaChat: новый экземпляр GigaChat на каждый
+вызов (как было в translate.py и main_v2.py) против общего GigaChatClient,
+плюс пачка одновременных вызовов с повторяющимися промптами (склейка).
+Замер идёт против fake_llm.py, запущенного в этом же процессе:
+    python bench_gigachat.py [вызовов] [мс на ответ] [мс на токен]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from aiohttp import web
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+# Задержки fake_llm читает при импорте
+os.environ["FAKE_LLM_CHAT_DELAY"] = str((float(sys.argv[2]) if len(sys.argv) > 2 else 20.0) / 1000)
+os.environ["FAKE_LLM_AUTH_DELAY"] = str((float(sys.argv[3]) if len(sys.argv) > 3 else 50.0) / 1000)
+
+import fake_llm
+from gigachat_client import GigaChatClient
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_gigachat.chat_models import GigaChat
+
+HOST, PORT = "127.0.0.1", 8091
+BASE_URL = f"http://{HOST}:{PORT}/api/v1"
+AUTH_URL = f"http://{HOST}:{PORT}/api/v2/oauth"
+SYSTEM = "Переведи текст на английский."
+
+
+async def per_call(text: str) -> str:
+    """Старый путь: модель, токен и соединения создаются заново на каждый вызов."""
+    model = GigaChat(credentials="bench", scope="GIGACHAT_API_PERS", model="GigaChat",
+                     verify_ssl_certs=False, base_url=BASE_URL, auth_url=AUTH_URL)
+    res = await model.ainvoke([SystemMessage(content=SYSTEM), HumanMessage(content=text)])
+    return res.content
+
+
+def report(name: str, counts: dict, seconds: float, calls: int) -> None:
+    print(f"{name}: {seconds / calls * 1000:.1f} мс/вызов, {seconds:.2f} с, "
+          f"запросов токена {counts['auth']}, запросов чата {counts['chat']}")
+
+
+async def main() -> None:
+    app = fake_llm.create_app()
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+    counts = app["counts"]
+    print(f"{CALLS} последовательных вызовов, ответ {fake_llm.CHAT_DELAY * 1000:g} мс, "
+          f"токен {fake_llm.AUTH_DELAY * 1000:g} мс")
+    try:
+        started = time.perf_counter()
+        for i in range(CALLS):
+            await per_call(f"текст {i}")
+        report("GigaChat на каждый вызов", counts, time.perf_counter() - started, CALLS)
+
+        counts.update(auth=0, chat=0)
+        client = GigaChatClient(credentials="bench", base_url=BASE_URL, auth_url=AUTH_URL)
+        started = time.perf_counter()
+        for i in range(CALLS):
+            await client.ask(SYSTEM, f"текст {i}")
+        report("GigaChatClient", counts, time.perf_counter() - started, CALLS)
+
+        # Пачка: половина вызовов с одинаковым промптом (например, одно событие для многих пользователей)
+        counts.update(auth=0, chat=0)
+        burst = [client.ask(SYSTEM, "одно и то же") for _ in range(CALLS)]
+        burst += [client.ask(SYSTEM, f"разное {i}") for i in range(CALLS)]
+        started = time.perf_counter()
+        await asyncio.gather(*burst)
+        report(f"GigaChatClient, {len(burst)} одновременных вызовов ({CALLS} одинаковых)",
+               counts, time.perf_counter() - started, len(burst))
+        print(f"    {client.stats()}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,160 @@
+"""Общий слой доступа к SQLite: пул соединений для чтения и один писатель с пакетными коммитами."""
+
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Database:
+    """
+    Вместо connect() в каждом обработчике — соединения, открытые один раз:
+    - чтения идут через pool_size соединений; в режиме WAL читатели не ждут
+      писателя и друг друга;
+    - все записи идут через одно соединение и очередь: накопившиеся к моменту
+      коммита запросы (до max_batch) выполняются одной транзакцией, каждый под
+      своим SAVEPOINT, так что ошибка одного не откатывает соседние. execute()
+      возвращает управление после коммита, поэтому следующее чтение уже видит запись;
+    - запросы — постоянные строки SQL с параметрами, sqlite3 держит подготовленные
+      выражения в кэше соединения (cached_statements) и не компилирует их заново.
+
+    Соединения — обычный sqlite3; запрос целиком (execute + fetch) выполняется
+    в собственном пуле потоков за один переход, а не по переходу на каждый вызов курсора.
+    """
+
+    def __init__(self, path: str, pool_size: int = 4, max_batch: int = 256, cached_statements: int = 256):
+        self.path = path
+        self.pool_size = pool_size
+        self.max_batch = max_batch
+        self.cached_statements = cached_statements
+        self._executor = None
+        self._readers = None
+        self._writer = None
+        self._queue = None
+        self._writer_task = None
+        self.reads = 0
+        self.writes = 0
+        self.batches = 0
+        self.max_batch_seen = 0
+
+    def _connect(self, query_only: bool) -> sqlite3.Connection:
+        # Соединение берёт из пула одна задача за раз, поэтому его можно отдавать в любой поток пула
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        if query_only:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    async def open(self) -> None:
+        if self._writer is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size + 1, thread_name_prefix="sqlite")
+        # Писатель открывается первым: он создаёт файл базы и включает WAL
+        self._writer = self._connect(query_only=False)
+        self._readers = asyncio.Queue()
+        for _ in range(self.pool_size):
+            self._readers.put_nowait(self._connect(query_only=True))
+        self._queue = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._write_loop())
+
+    async def close(self) -> None:
+        if self._writer is None:
+            return
+        # Сначала дописываем очередь, потом закрываем соединения
+        await self._queue.join()
+        self._writer_task.cancel()
+        await asyncio.gather(self._writer_task, return_exceptions=True)
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+        self._writer.close()
+        self._writer = None
+        self._executor.shutdown(wait=True)
+
+    @staticmethod
+    def _read(conn: sqlite3.Connection, sql: str, params, one: bool):
+        cursor = conn.execute(sql, params)
+        return cursor.fetchone() if one else cursor.fetchall()
+
+    async def _query(self, sql: str, params, one: bool):
+        conn = await self._readers.get()
+        self.reads += 1
+        future = asyncio.get_running_loop().run_in_executor(self._executor, self._read, conn, sql, params, one)
+        # Соединение возвращается в пул, только когда поток закончил с ним работать
+        future.add_done_callback(lambda _: self._readers.put_nowait(conn))
+        # shield: отмена обработчика не отменяет future раньше, чем освободится соединение
+        return await asyncio.shield(future)
+
+    async def fetchone(self, sql: str, params=()):
+        return await self._query(sql, params, one=True)
+
+    async def fetchall(self, sql: str, params=()) -> list:
+        return await self._query(sql, params, one=False)
+
+    async def _submit(self, sql: str, params, many: bool):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((sql, params, many, future))
+        return await future
+
+    async def execute(self, sql: str, params=()) -> int:
+        """Запрос на запись. Возвращает rowcount после коммита."""
+        return await self._submit(sql, params, many=False)
+
+    async def executemany(self, sql: str, seq_of_params) -> int:
+        return await self._submit(sql, list(seq_of_params), many=True)
+
+    def _apply(self, batch: list) -> list:
+        conn = self._writer
+        results = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params, many, _ in batch:
+                conn.execute("SAVEPOINT item")
+                try:
+                    cursor = conn.executemany(sql, params) if many else conn.execute(sql, params)
+                    conn.execute("RELEASE item")
+                    results.append(cursor.rowcount)
+                except sqlite3.Error as exc:
+                    conn.execute("ROLLBACK TO item")
+                    conn.execute("RELEASE item")
+                    results.append(exc)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return results
+
+    async def _write_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self.batches += 1
+            self.writes += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            try:
+                results = await asyncio.shield(loop.run_in_executor(self._executor, self._apply, batch))
+            except Exception as exc:
+                results = [exc] * len(batch)
+            for (_, _, _, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            for _ in batch:
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "reads": self.reads,
+            "writes": self.writes,
+            "batches": self.batches,
+            "avg_batch": self.writes / self.batches if self.batches else 0.0,
+            "max_batch": self.max_batch_seen,
+            "write_queue": self._queue.qsize() if self._queue is not None else 0,
+            "idle_readers": self._readers.qsize() if self._readers is not None else 0
+        }
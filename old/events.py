@@ -30,6 +30,12 @@ def init_db(db_name='events.db'):
             short_desc TEXT
         )
     """)
+    # Убираем накопившиеся дубли и запрещаем новые
+    cursor.execute("""
+        DELETE FROM events
+        WHERE id NOT IN (SELECT MIN(id) FROM events GROUP BY source, event_id)
+    """)
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS events_source_event ON events (source, event_id)")
     conn.commit()
     conn.close()
 
@@ -45,22 +51,26 @@ def save_events_to_db(events, db_name='events.db'):
       'link': str,
       'short_desc': str
     }
+    Повторно полученные события (та же пара source, event_id) обновляются,
+    а не добавляются заново.
     """
     conn = sqlite3.connect(db_name)
     cursor = conn.cursor()
 
-    for ev in events:
-        cursor.execute("""
-            INSERT INTO events (source, event_id, title, date, link, short_desc)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            ev.get('source', ''),
-            ev.get('event_id', ''),
-            ev.get('title', ''),
-            ev.get('date', ''),
-            ev.get('link', ''),
-            ev.get('short_desc', '')
-        ))
+    cursor.executemany("""
+        INSERT INTO events (source, event_id, title, date, link, short_desc)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (source, event_id) DO UPDATE SET
+            title = excluded.title, date = excluded.date,
+            link = excluded.link, short_desc = excluded.short_desc
+    """, [(
+        ev.get('source', ''),
+        ev.get('event_id', ''),
+        ev.get('title', ''),
+        ev.get('date', ''),
+        ev.get('link', ''),
+        ev.get('short_desc', '')
+    ) for ev in events])
     conn.commit()
     conn.close()
 
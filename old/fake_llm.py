@@ -0,0 +1,63 @@
+"""Локальный заглушечный сервер GigaChat API для проверок и замеров.
+
+Запуск: python fake_llm.py, затем в .env
+    GIGACHAT_BASE_URL=http://127.0.0.1:8090/api/v1
+    GIGACHAT_AUTH_URL=http://127.0.0.1:8090/api/v2/oauth
+    GIGACHAT_CREDENTIALS=fake
+"""
+
+import asyncio
+import os
+import time
+import uuid
+
+from aiohttp import web
+
+# Искусственные задержки и время жизни токена, секунды
+AUTH_DELAY = float(os.getenv("FAKE_LLM_AUTH_DELAY", "0.05"))
+CHAT_DELAY = float(os.getenv("FAKE_LLM_CHAT_DELAY", "0.2"))
+TOKEN_TTL = float(os.getenv("FAKE_LLM_TOKEN_TTL", "1800"))
+
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app["tokens"] = {}  # токен -> момент истечения
+    app["counts"] = {"auth": 0, "chat": 0, "unauthorized": 0}
+
+    async def oauth(request: web.Request) -> web.Response:
+        app["counts"]["auth"] += 1
+        await asyncio.sleep(AUTH_DELAY)
+        token = uuid.uuid4().hex
+        expires_at = time.time() + TOKEN_TTL
+        app["tokens"][token] = expires_at
+        return web.json_response({"access_token": token, "expires_at": int(expires_at * 1000)})
+
+    async def chat(request: web.Request) -> web.Response:
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if app["tokens"].get(token, 0) < time.time():
+            app["counts"]["unauthorized"] += 1
+            return web.json_response({"status": 401, "message": "Token has expired"}, status=401)
+        app["counts"]["chat"] += 1
+        body = await request.json()
+        await asyncio.sleep(CHAT_DELAY)
+        answer = f"echo: {body['messages'][-1]['content']}"
+        return web.json_response({
+            "choices": [{"message": {"role": "assistant", "content": answer},
+                         "index": 0, "finish_reason": "stop"}],
+            "created": int(time.time()),
+            "model": body.get("model", "GigaChat"),
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            "object": "chat.completion"
+        })
+
+    async def counts(request: web.Request) -> web.Response:
+        return web.json_response(app["counts"])
+
+    app.router.add_post("/api/v2/oauth", oauth)
+    app.router.add_post("/api/v1/chat/completions", chat)
+    app.router.add_get("/counts", counts)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host="127.0.0.1", port=int(os.getenv("FAKE_LLM_PORT", "8090")))
@@ -0,0 +1,99 @@
+"""Долгоживущий клиент GigaChat для бота: один экземпляр на процесс."""
+
+import asyncio
+import hashlib
+import os
+
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_gigachat.chat_models import GigaChat
+
+load_dotenv()
+
+
+class GigaChatClient:
+    """
+    Обёртка над одним экземпляром GigaChat. Токен доступа и HTTP-соединения
+    живут внутри этого экземпляра: SDK кэширует токен и обновляет его
+    незадолго до истечения, а пул соединений httpx переиспользуется между
+    вызовами. Сверху добавлены:
+    - ограничение числа одновременных запросов (max_concurrency);
+    - склейка одинаковых запросов: пока запрос с тем же промптом в полёте,
+      повторные вызовы ждут его результат, а не идут в API ещё раз.
+    """
+
+    def __init__(self, credentials=None, base_url=None, auth_url=None, max_concurrency=4, timeout=60):
+        settings = {
+            "credentials": credentials or os.getenv("GIGACHAT_CREDENTIALS", ""),
+            "scope": "GIGACHAT_API_PERS",
+            "model": "GigaChat",
+            # Отключает проверку наличия сертификатов НУЦ Минцифры
+            "verify_ssl_certs": False,
+            "max_connections": max_concurrency,
+            "timeout": timeout
+        }
+        # Адреса можно переопределить, например, для локального fake_llm.py
+        base_url = base_url or os.getenv("GIGACHAT_BASE_URL")
+        auth_url = auth_url or os.getenv("GIGACHAT_AUTH_URL")
+        if base_url:
+            settings["base_url"] = base_url
+        if auth_url:
+            settings["auth_url"] = auth_url
+        self.model = GigaChat(**settings)
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._inflight = {}  # ключ промпта -> Future с ответом
+        self.calls = 0
+        self.coalesced = 0
+        self.requests = 0
+
+    @staticmethod
+    def _key(system: str, text: str) -> str:
+        return hashlib.sha256(f"{system}\0{text}".encode("utf-8")).hexdigest()
+
+    async def _request(self, system: str, text: str) -> str:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            self.requests += 1
+            res = await self.model.ainvoke([SystemMessage(content=system), HumanMessage(content=text)])
+        return res.content
+
+    async def ask(self, system: str, text: str) -> str:
+        """Ответ модели на text с системной инструкцией system."""
+        self.calls += 1
+        key = self._key(system, text)
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = asyncio.ensure_future(self._request(system, text))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: отмена одного ожидающего не отменяет общий запрос для остальных
+        return await asyncio.shield(future)
+
+    def ask_sync(self, system: str, text: str) -> str:
+        """Синхронный вариант для скриптов без цикла событий."""
+        self.calls += 1
+        self.requests += 1
+        return self.model.invoke([SystemMessage(content=system), HumanMessage(content=text)]).content
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight)
+        }
+
+
+_client = None
+
+
+def get_client() -> GigaChatClient:
+    """Общий клиент процесса, создаётся при первом обращении."""
+    global _client
+    if _client is None:
+        _client = GigaChatClient(max_concurrency=int(os.getenv("GIGACHAT_CONCURRENCY", "4")))
+    return _client
@@ -1,6 +1,5 @@
 import asyncio
 import logging
-import sqlite3
 import os
 import requests
 
@@ -9,6 +8,8 @@ from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 from aiogram.filters import Command
 from dotenv import load_dotenv
 
+from database import Database
+
 
 try:
     from langchain_core.messages import HumanMessage, SystemMessage
@@ -28,13 +29,17 @@ logging.basicConfig(level=logging.INFO)
 bot = Bot(token=TOKEN)
 dp = Dispatcher()
 
+# Соединения с базами открываются один раз при старте (init_db)
+students_db = Database("students.db")
+events_db = Database("events.db", pool_size=2)
+
 ##############################################
 # Инициализация базы данных пользователей
 ##############################################
-def init_db():
-    conn = sqlite3.connect("students.db")
-    cursor = conn.cursor()
-    cursor.execute("""
+async def init_db():
+    await students_db.open()
+    await events_db.open()
+    await students_db.execute("""
     CREATE TABLE IF NOT EXISTS users (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         telegram_id INTEGER UNIQUE,
@@ -53,10 +58,11 @@ def init_db():
         weekly_plans TEXT
     )
     """)
-    conn.commit()
-    conn.close()
 
-init_db()
+
+async def close_db():
+    await students_db.close()
+    await events_db.close()
 
 ##############################################
 # Клавиатура выбора языка
@@ -177,12 +183,8 @@ def gigachat_find_relevant_events_langchain(user_interests, all_events):
 ##############################################
 # Получить все события из events.db
 ##############################################
-def get_all_events():
-    conn = sqlite3.connect("events.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT title, date, link, short_desc FROM events")
-    rows = cursor.fetchall()
-    conn.close()
+async def get_all_events():
+    rows = await events_db.fetchall("SELECT title, date, link, short_desc FROM events")
 
     events_list = []
     for row in rows:
@@ -200,16 +202,11 @@ def get_all_events():
 @dp.message(Command("start"))
 async def start_handler(message: types.Message):
     telegram_id = message.from_user.id
-    conn = sqlite3.connect("students.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
-    user = cursor.fetchone()
+    user = await students_db.fetchone("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
 
     if user is None:
-        cursor.execute("INSERT INTO users (telegram_id) VALUES (?)", (telegram_id,))
-        conn.commit()
+        await students_db.execute("INSERT INTO users (telegram_id) VALUES (?)", (telegram_id,))
 
-    conn.close()
     await message.answer("Выберите язык:", reply_markup=language_keyboard)
 
 ##############################################
@@ -220,11 +217,7 @@ async def event_command_handler(message: types.Message):
     telegram_id = message.from_user.id
 
     # 1. Получаем профиль пользователя
-    conn = sqlite3.connect("students.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
-    user = cursor.fetchone()
-    conn.close()
+    user = await students_db.fetchone("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
 
     if not user:
         await message.answer("Сначала нужно зарегистрироваться через /start.")
@@ -237,7 +230,7 @@ async def event_command_handler(message: types.Message):
         user_interests = "нет интересов"
 
     # 2. Все события
-    all_events = get_all_events()
+    all_events = await get_all_events()
     if not all_events:
         await message.answer("В базе нет мероприятий. Попробуйте позже.")
         return
@@ -259,13 +252,9 @@ async def event_command_handler(message: types.Message):
 @dp.message()
 async def process_registration(message: types.Message):
     telegram_id = message.from_user.id
-    conn = sqlite3.connect("students.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
-    user = cursor.fetchone()
+    user = await students_db.fetchone("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
 
     if user is None:
-        conn.close()
         return
 
     # user = (
@@ -286,66 +275,53 @@ async def process_registration(message: types.Message):
     #   14: weekly_plans
     # )
     if user[2] is None:
-        cursor.execute("UPDATE users SET language = ? WHERE telegram_id = ?", (message.text, telegram_id))
-        conn.commit()
+        await students_db.execute("UPDATE users SET language = ? WHERE telegram_id = ?", (message.text, telegram_id))
         await message.answer("Введите ваш логин:")
     elif user[3] is None:
-        cursor.execute("UPDATE users SET username = ? WHERE telegram_id = ?", (message.text, telegram_id))
-        conn.commit()
+        await students_db.execute("UPDATE users SET username = ? WHERE telegram_id = ?", (message.text, telegram_id))
         await message.answer("Придумайте пароль:")
     elif user[4] is None:
-        cursor.execute("UPDATE users SET password = ? WHERE telegram_id = ?", (message.text, telegram_id))
-        conn.commit()
+        await students_db.execute("UPDATE users SET password = ? WHERE telegram_id = ?", (message.text, telegram_id))
         await message.answer("Выберите страну:")
     elif user[5] is None:
-        cursor.execute("UPDATE users SET country = ? WHERE telegram_id = ?", (message.text, telegram_id))
-        conn.commit()
+        await students_db.execute("UPDATE users SET country = ? WHERE telegram_id = ?", (message.text, telegram_id))
         await message.answer("Введите город ВУЗа:")
     elif user[6] is None:
-        cursor.execute("UPDATE users SET city = ? WHERE telegram_id = ?", (message.text, telegram_id))
-        conn.commit()
+        await students_db.execute("UPDATE users SET city = ? WHERE telegram_id = ?", (message.text, telegram_id))
         await message.answer("Введите название ВУЗа:")
     elif user[7] is None:
-        cursor.execute("UPDATE users SET university = ? WHERE telegram_id = ?", (message.text, telegram_id))
-        conn.commit()
+        await students_db.execute("UPDATE users SET university = ? WHERE telegram_id = ?", (message.text, telegram_id))
         await message.answer("Введите факультет:")
     elif user[8] is None:
-        cursor.execute("UPDATE users SET faculty = ? WHERE telegram_id = ?", (message.text, telegram_id))
-        conn.commit()
+        await students_db.execute("UPDATE users SET faculty = ? WHERE telegram_id = ?", (message.text, telegram_id))
         await message.answer("Введите название группы:")
     elif user[9] is None:
-        cursor.execute("UPDATE users SET group_name = ? WHERE telegram_id = ?", (message.text, telegram_id))
-        conn.commit()
+        await students_db.execute("UPDATE users SET group_name = ? WHERE telegram_id = ?", (message.text, telegram_id))
         await message.answer("Расскажи немного о своих интересах: Укажи свои хобби")
     elif user[10] is None:
-        cursor.execute("UPDATE users SET hobbies = ? WHERE telegram_id = ?", (message.text, telegram_id))
-        conn.commit()
+        await students_db.execute("UPDATE users SET hobbies = ? WHERE telegram_id = ?", (message.text, telegram_id))
         await message.answer("Что бы тебе хотелось изучить в будущем?")
     elif user[11] is None:
-        cursor.execute("UPDATE users SET future_interests = ? WHERE telegram_id = ?", (message.text, telegram_id))
-        conn.commit()
+        await students_db.execute("UPDATE users SET future_interests = ? WHERE telegram_id = ?", (message.text, telegram_id))
         await message.answer("Оцени, насколько ты активный человек от 1 до 10")
     elif user[12] is None:
-        cursor.execute("UPDATE users SET activity_level = ? WHERE telegram_id = ?", (message.text, telegram_id))
-        conn.commit()
+        await students_db.execute("UPDATE users SET activity_level = ? WHERE telegram_id = ?", (message.text, telegram_id))
         await message.answer("Оцени, насколько ты общительный человек от 1 до 10")
     elif user[13] is None:
-        cursor.execute("UPDATE users SET social_level = ? WHERE telegram_id = ?", (message.text, telegram_id))
-        conn.commit()
+        await students_db.execute("UPDATE users SET social_level = ? WHERE telegram_id = ?", (message.text, telegram_id))
         await message.answer("Если у тебя уже есть внеурочные планы на неделе, ты можешь о них написать здесь (в формате: понедельник; 15:00; плаванье)")
     elif user[14] is None:
-        cursor.execute("UPDATE users SET weekly_plans = ? WHERE telegram_id = ?", (message.text, telegram_id))
-        conn.commit()
+        await students_db.execute("UPDATE users SET weekly_plans = ? WHERE telegram_id = ?", (message.text, telegram_id))
         await message.answer("Регистрация прошла успешно! Для поиска мероприятий напишите /event")
     else:
         await message.answer("Вы уже зарегистрированы! Для поиска мероприятий напишите /event")
 
-    conn.close()
-
 ##############################################
 # Точка входа
 ##############################################
 async def main():
+    dp.startup.register(init_db)
+    dp.shutdown.register(close_db)
     await dp.start_polling(bot)
 
 if __name__ == "__main__":
@@ -7,7 +7,6 @@ Now includes:
 import os
 import logging
 import asyncio
-import requests
 from aiogram import Dispatcher, F
 from aiogram.filters import Command, CommandStart
 from aiogram.types import Message, ContentType
@@ -15,8 +14,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
 import datetime
-import aiosqlite
-import aiohttp
+import sys
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 ###############################
@@ -24,8 +22,19 @@ from datetime import datetime, timedelta
 ###############################
 from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.client.bot import Bot, DefaultBotProperties
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_gigachat.chat_models import GigaChat
+
+from database import Database
+from gigachat_client import get_client
+from mentors import DEFAULT_CAPACITY, MentorIndex
+from metrics import StageMetrics
+from translation_cache import TranslationCache
+
+# Каталог событий и его фоновое обновление — общие с bot.py модули из корня репозитория
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cities import CityResolver
+from event_refresher import EventRefresher
+from event_sources import EventAggregator
+from event_store import EventStore
 
 ###############################
 # Load environment variables
@@ -51,141 +60,100 @@ bot = Bot(
     default=DefaultBotProperties(parse_mode="HTML")
 )
 
+# Гистограммы задержек: этапы /events и обработка апдейтов целиком
+metrics = StageMetrics()
 
-def get_upcoming_events(city='msk', days_ahead=30, max_events=30):
-    # Базовый URL API KudaGo
-    base_url = "https://kudago.com/public-api/v1.4/events/"
-
-    # Параметры запроса
-    params = {
-        'location': city,
-        'actual_since': int(datetime.now().timestamp()),
-        'actual_until': int((datetime.now() + timedelta(days=days_ahead)).timestamp()),
-        'page_size': max_events,
-        'lang': 'ru',
-        'fields': 'id,title,dates,place,location,is_free,price,site_url',
-        'expand': 'dates,place'
-    }
-
-    # Отправка GET-запроса
-    response = requests.get(base_url, params=params)
-
-    # Проверка успешности запроса
-    if response.status_code == 200:
-        events = response.json().get('results', [])
-        ev_lst = []
-        for event in events:
-            '''print(f"Название: {event['title']}")
-            print(f"Дата: {event['dates'][0]['start']}")
-            print(f"Место: {event['place']['title'] if event['place'] else 'Не указано'}")
-            print(f"Стоимость: {'Бесплатно' if event['is_free'] else event.get('price', 'Не указана')}")
-            print(f"Ссылка: {event['site_url']}")
-            print("-" * 40)'''
-            ev_lst.append(event['title'])
-    else:
-        print(f"Ошибка при запросе данных: {response.status_code}")
-        return []
+# Кэш переводов /translate (память + таблица translations в базе бота)
+translation_cache = TranslationCache(DATABASE_PATH)
 
+# Каталог событий для /events: отдельный файл, в базе бота уже есть своя таблица events
+event_store = EventStore(os.getenv("EVENTS_DATABASE_PATH", "events.db"))
+city_resolver = CityResolver()
+event_refresher = EventRefresher(EventAggregator(), event_store, city_resolver.locations(),
+                                 interval=float(os.getenv("EVENTS_REFRESH_INTERVAL", "900")))
 
-# Пример использования функции
+# Пул соединений с базой бота: открывается при старте, общий для всех обработчиков
+db = Database(DATABASE_PATH, pool_size=int(os.getenv("DATABASE_POOL_SIZE", "4")))
 
+# Индекс менторов (город, язык, интересы, нагрузка) строится из базы при старте
+MENTOR_CAPACITY = int(os.getenv("MENTOR_CAPACITY", str(DEFAULT_CAPACITY)))
+mentors = MentorIndex(db)
 
-def suggest(interests, events):
-    # print('start')
-    load_dotenv()
-    credentials = os.getenv("GIGACHAT_CREDENTIALS", "")
-    # Авторизация в GigaChat
-    model = GigaChat(
-        credentials=credentials,
-        scope="GIGACHAT_API_PERS",
-        model="GigaChat",
-        # Отключает проверку наличия сертификатов НУЦ Минцифры
-        verify_ssl_certs=False,
-    )
 
-    messages = [
-        SystemMessage(
-            content=f"Ты бот, который помогает иностранному студенту ассимилироваться в России, из предложеного списка мероприятий предложи студенту мероприятия на основе его интересов: {interests}:"
-        )
-    ]
-    # print('1')
-    messages.append(HumanMessage(content=str(events)))
-    res = model.invoke(messages)
-    messages.append(res)
-    return res.content
+async def get_upcoming_events(city=None, days_ahead=30, max_events=30):
+    # Каталог выгружает event_refresher в фоне: на запросе /events внешние API не вызываются
+    code = city_resolver.resolve(city) or 'msk'
+    until = int((datetime.now() + timedelta(days=days_ahead)).timestamp())
+    return [event['title'] for event in event_store.upcoming(city=code, limit=max_events)
+            if event['starts_at'] < until]
 
 
-async def gigachat_translate(text: str, target_language: str = "ru") -> str:
-    load_dotenv()
-    credentials = os.getenv("GIGACHAT_CREDENTIALS", "")
-    # Авторизация в GigaChat
-    model = GigaChat(
-        credentials=credentials,
-        scope="GIGACHAT_API_PERS",
-        model="GigaChat",
-        # Отключает проверку наличия сертификатов НУЦ Минцифры
-        verify_ssl_certs=False,
+async def suggest(interests, events):
+    # Общий клиент: токен, соединения и лимит одновременных запросов переиспользуются
+    return await get_client().ask(
+        f"Ты бот, который помогает иностранному студенту ассимилироваться в России, из предложеного списка мероприятий предложи студенту мероприятия на основе его интересов: {interests}:",
+        str(events)
     )
 
-    messages = [
-        SystemMessage(
-            content=f"Ты бот-переводчик, переведи текст на язык {target_language}:"
-        )
-    ]
 
-    messages.append(HumanMessage(content=text))
-    res = model.invoke(messages)
-    messages.append(res)
-    return res.content
+async def gigachat_translate(text: str, target_language: str = "ru") -> str:
+    # Частые фразы отдаются из кэша без обращения к GigaChat
+    cached = translation_cache.get(text, target_language)
+    if cached is not None:
+        return cached
+    translated = await get_client().ask(f"Ты бот-переводчик, переведи текст на язык {target_language}:", text)
+    translation_cache.put(text, target_language, translated)
+    return translated
 
 
 async def init_db():
     """Initialize the SQLite database (and do migrations if needed)."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        # Users table with 'city' column
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                telegram_id INTEGER PRIMARY KEY,
-                name TEXT,
-                country TEXT,
-                city TEXT,
-                interests TEXT,
-                language_level TEXT,
-                is_mentor INTEGER DEFAULT 0
-            )
-        ''')
-
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT,
-                description TEXT,
-                tags TEXT,
-                date TEXT
-            )
-        ''')
-        # Insert some demo events if table is empty
-        cursor = await db.execute("SELECT COUNT(*) FROM events")
-        count = (await cursor.fetchone())[0]
-        if count == 0:
-            sample_events = [
-                ("City Tour", "Explore the main city attractions.", "tour,city,sightseeing", "2025-03-10"),
-                ("Language Exchange", "Practice languages with locals.", "language,exchange,communication",
-                 "2025-03-11"),
-                ("Music Festival", "Enjoy live music performances.", "music,festival,concert", "2025-03-12"),
-                (
-                    "Russian Culture 101", "Intro session on local traditions.", "culture,traditions,lecture",
-                    "2025-03-15")
-            ]
-            await db.executemany(
-                "INSERT INTO events (title, description, tags, date) VALUES (?,?,?,?)",
-                sample_events
-            )
-            await db.commit()
-
-        # Optional: If we want to add new columns in the future, we could do migrations here.
-
-        await db.commit()
+    await db.open()
+    # Users table with 'city' column
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            telegram_id INTEGER PRIMARY KEY,
+            name TEXT,
+            country TEXT,
+            city TEXT,
+            interests TEXT,
+            language_level TEXT,
+            is_mentor INTEGER DEFAULT 0
+        )
+    ''')
+
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT,
+            description TEXT,
+            tags TEXT,
+            date TEXT
+        )
+    ''')
+    # Insert some demo events if table is empty
+    count = (await db.fetchone("SELECT COUNT(*) FROM events"))[0]
+    if count == 0:
+        sample_events = [
+            ("City Tour", "Explore the main city attractions.", "tour,city,sightseeing", "2025-03-10"),
+            ("Language Exchange", "Practice languages with locals.", "language,exchange,communication",
+             "2025-03-11"),
+            ("Music Festival", "Enjoy live music performances.", "music,festival,concert", "2025-03-12"),
+            (
+                "Russian Culture 101", "Intro session on local traditions.", "culture,traditions,lecture",
+                "2025-03-15")
+        ]
+        await db.executemany(
+            "INSERT INTO events (title, description, tags, date) VALUES (?,?,?,?)",
+            sample_events
+        )
+
+    # Migrations: language (Telegram language_code) and mentor capacity for mentor matching
+    columns = {row[1] for row in await db.fetchall("PRAGMA table_info(users)")}
+    if "language" not in columns:
+        await db.execute("ALTER TABLE users ADD COLUMN language TEXT")
+    if "mentor_capacity" not in columns:
+        await db.execute(f"ALTER TABLE users ADD COLUMN mentor_capacity INTEGER DEFAULT {MENTOR_CAPACITY}")
 
 
 ###############################
@@ -217,9 +185,7 @@ async def cmd_start(message: Message, state: FSMContext):
 
     # Check if user is already in DB
     user_id = message.from_user.id
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute("SELECT * FROM users WHERE telegram_id=?", (user_id,))
-        exists = await cursor.fetchone()
+    exists = await db.fetchone("SELECT 1 FROM users WHERE telegram_id=?", (user_id,))
 
     if exists:
         await message.answer(
@@ -264,20 +230,19 @@ async def process_language(message: Message, state: FSMContext):
     user_data["language_level"] = message.text.strip()
 
     user_id = message.from_user.id
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        await db.execute(
-            "INSERT INTO users (telegram_id, name, country, city, interests, language_level) "
-            "VALUES (?, ?, ?, ?, ?, ?)",
-            (
-                user_id,
-                user_data["name"],
-                user_data["country"],
-                user_data["city"],
-                user_data["interests"],
-                user_data["language_level"]
-            )
+    await db.execute(
+        "INSERT INTO users (telegram_id, name, country, city, interests, language_level, language) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            user_id,
+            user_data["name"],
+            user_data["country"],
+            user_data["city"],
+            user_data["interests"],
+            user_data["language_level"],
+            message.from_user.language_code
         )
-        await db.commit()
+    )
 
     await message.answer(
         "Registration complete!\n"
@@ -298,6 +263,7 @@ async def cmd_help(message: Message):
         "/start - Start or reset the bot (registration)\n"
         "/events - Get event recommendations\n"
         "/mentor - Request a mentor\n"
+        "/become_mentor - Volunteer as a mentor\n"
         "/translate &lt;text&gt; - Translate text (via GigaChat)\n"
         "/phrase &lt;topic&gt; - Get useful phrases\n"
         "/help - Show this help message"
@@ -312,42 +278,37 @@ async def cmd_help(message: Message):
 async def cmd_events(message: Message):
     user_id = message.from_user.id
     # Retrieve user interests
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute("SELECT interests, city FROM users WHERE telegram_id=?", (user_id,))
-        row = await cursor.fetchone()
-        if not row:
-            await message.answer("You are not registered yet. Please use /start.")
-            return
-        user_interests, user_city = row[0], row[1]
-        events = get_upcoming_events()
-
-        txt = suggest(user_interests, events)
-        print(txt)
-        await message.answer(txt)
-        '''# For simplicity, naive match on event tags.
-        # In the future, we can parse city-based events. For now, we ignore city.
-        all_events = []
-        cursor = await db.execute("SELECT id, title, description, tags, date FROM events")
-        events_data = await cursor.fetchall()
-        for e_id, title, desc, tags, date_ in events_data:
-            if user_interests:
-                u_tags = [t.strip().lower() for t in user_interests.split(",")]
-                e_tags = [t.strip().lower() for t in tags.split(",")] if tags else []
-                # If any overlap, consider recommended
-                if any(tag in e_tags for tag in u_tags):
-                    all_events.append((title, desc, date_))
-            else:
-                # If user has no interests, show all
-                all_events.append((title, desc, date_))
-
-    if not all_events:
-        await message.answer("No matching events found for your interests!")
+    with metrics.timed("events.db"):
+        row = await db.fetchone("SELECT interests, city FROM users WHERE telegram_id=?", (user_id,))
+    if not row:
+        await message.answer("You are not registered yet. Please use /start.")
         return
+    user_interests, user_city = row[0], row[1]
 
-    response_lines = ["Here are some recommended events:"]
-    for idx, (title, desc, date_) in enumerate(all_events, start=1):
-        response_lines.append(f"\n{idx}) {title}\nDate: {date_}\nDescription: {desc}")
-    await message.answer("\n".join(response_lines))'''
+    with metrics.timed("events.fetch"):
+        events = await get_upcoming_events(user_city)
+    if not events:
+        await message.answer("No upcoming events found, please try again later.")
+        return
+
+    with metrics.timed("events.llm"):
+        txt = await suggest(user_interests, events)
+    with metrics.timed("events.send"):
+        await message.answer(txt)
+
+
+###############################
+# /latency handler
+###############################
+@router.message(Command(commands=["latency"]))
+async def cmd_latency(message: Message):
+    cache = translation_cache.stats()
+    database = db.stats()
+    await message.answer(f"<pre>{metrics.render()}\n"
+                         f"translate cache: hit rate {cache['hit_rate']:.0%}, "
+                         f"memory {cache['memory_hits']}, disk {cache['disk_hits']}, miss {cache['misses']}\n"
+                         f"db: reads {database['reads']}, writes {database['writes']} "
+                         f"in {database['batches']} commits (max batch {database['max_batch']})</pre>")
 
 
 ###############################
@@ -356,24 +317,32 @@ async def cmd_events(message: Message):
 @router.message(Command(commands=["mentor"]))
 async def cmd_mentor(message: Message):
     user_id = message.from_user.id
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        # Check if the user is registered
-        cursor = await db.execute("SELECT name FROM users WHERE telegram_id=?", (user_id,))
-        row = await cursor.fetchone()
-        if not row:
-            await message.answer("You are not registered. Please use /start.")
-            return
+    # Check if the user is registered
+    row = await db.fetchone("SELECT city, language, interests FROM users WHERE telegram_id=?", (user_id,))
+    if not row:
+        await message.answer("You are not registered. Please use /start.")
+        return
+
+    # Mentor from the same city / language / interests with free capacity, least loaded first
+    mentor = await mentors.assign(user_id, *row)
+    if mentor is None:
+        await message.answer("No mentors available at the moment.")
+        return
 
-        # For simplicity, pick a random mentor
-        cursor_mentor = await db.execute(
-            "SELECT telegram_id, name FROM users WHERE is_mentor=1 ORDER BY RANDOM() LIMIT 1")
-        mentor_row = await cursor_mentor.fetchone()
-        if not mentor_row:
-            await message.answer("No mentors available at the moment.")
-            return
-        mentor_id, mentor_name = mentor_row
+    await message.answer(f"We found a mentor: {mentor.name}. They will contact you soon!")
 
-    await message.answer(f"We found a mentor: {mentor_name}. They will contact you soon!")
+
+###############################
+# /become_mentor handler
+###############################
+@router.message(Command(commands=["become_mentor"]))
+async def cmd_become_mentor(message: Message):
+    # The mentor is added to the in-memory index right away, no restart needed
+    mentor = await mentors.register(message.from_user.id)
+    if mentor is None:
+        await message.answer("You are not registered. Please use /start.")
+        return
+    await message.answer(f"You are now a mentor! You can guide up to {mentor.capacity} students at a time.")
 
 
 ###############################
@@ -439,6 +408,27 @@ async def cmd_phrase(message: Message):
 async def on_startup(dispatcher: Dispatcher, bot: Bot):
     logging.info("Bot is starting up. Initializing DB...")
     await init_db()
+    await mentors.load()
+    await event_refresher.start()
+    logging.info(f"Mentor index: {mentors.stats()}")
+    logging.info(f"Translation cache: removed {translation_cache.prune()} stale entries")
+
+
+@router.shutdown()
+async def on_shutdown():
+    await event_refresher.stop()
+    event_store.close()
+    translation_cache.close()
+    await db.close()
+
+
+###############################
+# Update latency middleware
+###############################
+async def measure_update(handler, event, data):
+    # Время обработки любого апдейта: не должно расти, пока идут рекомендации
+    with metrics.timed("update"):
+        return await handler(event, data)
 
 
 ###############################
@@ -448,6 +438,7 @@ async def main():
     # Create dispatcher, attach router
     dp = Dispatcher(storage=MemoryStorage())
     dp.include_router(router)
+    dp.update.outer_middleware(measure_update)
 
     # Start polling
     await dp.start_polling(bot, skip_updates=True)
@@ -0,0 +1,227 @@
+"""Подбор ментора по индексу в памяти вместо ORDER BY RANDOM() по всей таблице users."""
+
+import asyncio
+import heapq
+import itertools
+import re
+import time
+from dataclasses import dataclass, field
+
+_WORD = re.compile(r"[^\W\d_]{3,}")
+
+# Сколько студентов ментор ведёт одновременно, если в профиле не указано иное
+DEFAULT_CAPACITY = 5
+
+
+def normalize(value) -> str:
+    return (value or "").strip().lower()
+
+
+def interest_keys(interests: str) -> set:
+    return set(_WORD.findall(normalize(interests)))
+
+
+@dataclass
+class Mentor:
+    mentor_id: int
+    name: str
+    city: str
+    language: str
+    interests: set
+    capacity: int = DEFAULT_CAPACITY
+    load: int = 0
+    keys: list = field(default_factory=list)
+
+    @property
+    def available(self) -> bool:
+        return self.load < self.capacity
+
+
+class MentorIndex:
+    """
+    Свободные менторы разложены по корзинам (город, язык, интерес), (город, язык),
+    (город, *), (*, язык) и (*, *); в каждой корзине — куча по текущей нагрузке.
+    Подбор проверяет вершины нескольких корзин от самой точной к самой общей
+    (число проверок зависит от числа интересов студента, а не от размера
+    таблицы users) и берёт наименее загруженного ментора первого подходящего уровня.
+    Изменение нагрузки кладёт в кучи новую запись, устаревшие отбрасываются
+    при чтении; ментор без свободных мест в кучах не участвует.
+
+    Назначения хранятся в таблице mentor_assignments, индекс строится из
+    базы при старте (load) и дальше обновляется без запросов на чтение;
+    новые менторы попадают в индекс через register(). Нагрузка меняется
+    только после успешной записи в базу, поэтому назначения и освобождения
+    идут под одной блокировкой: параллельный подбор не видит место, которое
+    вот-вот займут.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.mentors = {}  # mentor_id -> Mentor
+        self.assignments = {}  # student_id -> mentor_id
+        self._buckets = {}  # ключ -> куча (load, порядок, mentor_id)
+        self._order = itertools.count()
+        self._entries = 0  # записей во всех кучах, включая устаревшие
+        self._limit = 0  # при скольких записях пересобрать кучи
+        self._lock = asyncio.Lock()
+        self.matches = 0
+        self.match_ns = 0
+
+    async def load(self) -> None:
+        """Читает менторов и текущие назначения из базы, пересобирает индекс."""
+        await self.db.execute("""
+            CREATE TABLE IF NOT EXISTS mentor_assignments (
+                student_id INTEGER PRIMARY KEY,
+                mentor_id INTEGER NOT NULL,
+                assigned_at REAL NOT NULL
+            )
+        """)
+        rows = await self.db.fetchall(
+            "SELECT telegram_id, name, city, language, interests, mentor_capacity FROM users WHERE is_mentor=1")
+        assignments = await self.db.fetchall("SELECT student_id, mentor_id FROM mentor_assignments")
+        self.mentors, self.assignments = {}, {}
+        for row in rows:
+            mentor = self._mentor(*row)
+            self.mentors[mentor.mentor_id] = mentor
+        for student_id, mentor_id in assignments:
+            self.assignments[student_id] = mentor_id
+            if mentor_id in self.mentors:
+                self.mentors[mentor_id].load += 1
+        self._rebuild()
+
+    def _mentor(self, mentor_id, name, city, language, interests, capacity) -> Mentor:
+        mentor = Mentor(mentor_id, name or "", normalize(city), normalize(language), interest_keys(interests),
+                        capacity if capacity is not None else DEFAULT_CAPACITY)
+        mentor.keys = self._keys(mentor.city, mentor.language, mentor.interests)
+        return mentor
+
+    async def register(self, mentor_id: int, capacity: int = None):
+        """
+        Делает зарегистрированного пользователя ментором и добавляет его в индекс
+        (повторный вызов обновляет профиль и вместимость). Возвращает Mentor или
+        None, если пользователя нет в базе.
+        """
+        async with self._lock:
+            updated = await self.db.execute(
+                "UPDATE users SET is_mentor=1, mentor_capacity=COALESCE(?, mentor_capacity) WHERE telegram_id=?",
+                (capacity, mentor_id))
+            if not updated:
+                return None
+            row = await self.db.fetchone(
+                "SELECT telegram_id, name, city, language, interests, mentor_capacity FROM users WHERE telegram_id=?",
+                (mentor_id,))
+            mentor = self._mentor(*row)
+            # Нагрузка — по уже закреплённым студентам; старые записи ментора в кучах станут устаревшими
+            mentor.load = sum(assigned == mentor_id for assigned in self.assignments.values())
+            self.mentors[mentor_id] = mentor
+            self._push(mentor)
+            self._compact()
+            return mentor
+
+    def _rebuild(self) -> None:
+        """Кучи заново, без устаревших записей."""
+        self._buckets, self._entries = {}, 0
+        for mentor in self.mentors.values():
+            self._push(mentor)
+        self._limit = 4 * self._entries + 4096
+
+    @staticmethod
+    def _keys(city: str, language: str, interests) -> list:
+        """Корзины от самой точной к самой общей."""
+        keys = []
+        for level in ((city, language), (city, None), (None, language), (None, None)):
+            if (level[0] is not None and not city) or (level[1] is not None and not language):
+                continue
+            keys.extend((*level, interest) for interest in sorted(interests))
+            keys.append((*level, None))
+        return keys
+
+    def _push(self, mentor: Mentor) -> None:
+        if not mentor.available:
+            return
+        entry = (mentor.load, next(self._order), mentor.mentor_id)
+        for key in mentor.keys:
+            heapq.heappush(self._buckets.setdefault(key, []), entry)
+        self._entries += len(mentor.keys)
+
+    def _compact(self) -> None:
+        # Устаревшие записи снимаются только с вершины; когда их накопилось много — пересборка
+        if self._entries > self._limit:
+            self._rebuild()
+
+    def _top(self, key, exclude: int):
+        """Наименее загруженный свободный ментор корзины: запись кучи или None."""
+        heap = self._buckets.get(key)
+        skipped = None
+        top = None
+        while heap:
+            load, _, mentor_id = heap[0]
+            mentor = self.mentors.get(mentor_id)
+            if mentor is None or not mentor.available or mentor.load != load:
+                heapq.heappop(heap)  # устаревшая запись
+                continue
+            if mentor_id == exclude:
+                skipped = heapq.heappop(heap)
+                continue
+            top = heap[0]
+            break
+        if skipped is not None:
+            heapq.heappush(heap, skipped)
+        return top
+
+    def match(self, city: str, language: str, interests: str, exclude: int = None):
+        """Подходящий ментор (Mentor) или None; нагрузку не меняет."""
+        started = time.perf_counter_ns()
+        keys = self._keys(normalize(city), normalize(language), interest_keys(interests))
+        best = None
+        for key in keys:
+            # Совпадение по интересам на этом уровне важнее, чем просто меньшая нагрузка
+            if key[2] is None and best is not None:
+                break
+            top = self._top(key, exclude)
+            if top is not None and (best is None or top < best):
+                best = top
+            if key[2] is None and best is not None:
+                break
+        self.matches += 1
+        self.match_ns += time.perf_counter_ns() - started
+        return self.mentors[best[2]] if best is not None else None
+
+    async def assign(self, student_id: int, city: str, language: str, interests: str):
+        """Закрепляет за студентом ментора (повторный вызов вернёт того же) или возвращает None."""
+        async with self._lock:
+            mentor_id = self.assignments.get(student_id)
+            if mentor_id in self.mentors:
+                return self.mentors[mentor_id]
+            mentor = self.match(city, language, interests, exclude=student_id)
+            if mentor is None:
+                return None
+            # Если запись не удалась, исключение уходит наверх, а индекс остаётся как был
+            await self.db.execute(
+                "INSERT OR REPLACE INTO mentor_assignments (student_id, mentor_id, assigned_at) VALUES (?, ?, ?)",
+                (student_id, mentor.mentor_id, time.time()))
+            mentor.load += 1
+            self.assignments[student_id] = mentor.mentor_id
+            self._push(mentor)
+            self._compact()
+            return mentor
+
+    async def release(self, student_id: int) -> None:
+        """Освобождает место у ментора студента."""
+        async with self._lock:
+            await self.db.execute("DELETE FROM mentor_assignments WHERE student_id=?", (student_id,))
+            mentor_id = self.assignments.pop(student_id, None)
+            mentor = self.mentors.get(mentor_id)
+            if mentor is not None:
+                mentor.load -= 1
+                self._push(mentor)
+                self._compact()
+
+    def stats(self) -> dict:
+        return {
+            "mentors": len(self.mentors),
+            "available": sum(mentor.available for mentor in self.mentors.values()),
+            "assigned": len(self.assignments),
+            "matches": self.matches,
+            "match_avg_us": self.match_ns / self.matches / 1000 if self.matches else 0.0
+        }
@@ -0,0 +1,78 @@
+"""Гистограммы задержек по этапам обработки (fetch, llm, send, ...)."""
+
+import bisect
+import time
+from contextlib import contextmanager
+
+# Верхние границы корзин, миллисекунды
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class LatencyHistogram:
+    """Гистограмма с фиксированными корзинами: запись O(log n), память не растёт."""
+
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q: float) -> float:
+        """Оценка q-квантиля (0..1) сверху — граница корзины, в мс."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max_ms
+        return self.max_ms
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max_ms
+        }
+
+
+class StageMetrics:
+    """Набор гистограмм по именам этапов."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        if stage not in self.stages:
+            self.stages[stage] = LatencyHistogram()
+        self.stages[stage].observe(seconds)
+
+    @contextmanager
+    def timed(self, stage: str):
+        """Замер этапа; внутри блока можно await-ить."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def summary(self) -> dict:
+        return {stage: hist.summary() for stage, hist in self.stages.items()}
+
+    def render(self) -> str:
+        lines = []
+        for stage, s in sorted(self.summary().items()):
+            lines.append(f"{stage}: n={s['count']} avg={s['avg_ms']:.0f}ms "
+                         f"p50<={s['p50_ms']:.0f}ms p99<={s['p99_ms']:.0f}ms max={s['max_ms']:.0f}ms")
+        return "\n".join(lines) or "No data yet."
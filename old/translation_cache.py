@@ -0,0 +1,130 @@
+"""Кэш переводов: LRU в памяти поверх постоянной таблицы SQLite."""
+
+import hashlib
+import re
+import sqlite3
+import time
+import unicodedata
+from collections import OrderedDict
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Приводит текст к каноническому виду: NFKC, без лишних пробелов по краям и внутри."""
+    return _SPACES.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def cache_key(text: str, target_language: str) -> str:
+    return hashlib.sha256(f"{target_language}\0{normalize(text)}".encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """
+    Двухуровневый кэш переводов по ключу sha256(язык + нормализованный текст).
+    Первый уровень — LRU в памяти на capacity записей, второй — таблица
+    translations на диске, переживающая перезапуск. Запись старше ttl
+    считается устаревшей на обоих уровнях; prune() удаляет такие записи
+    с диска и оставляет не больше max_rows последних использованных.
+    put() сам вызывает prune() через каждые prune_every записей или
+    prune_interval секунд, так что таблица не растёт между перезапусками.
+    """
+
+    def __init__(self, path: str, capacity: int = 10000, ttl: float = 30 * 86400, max_rows: int = 200000,
+                 prune_every: int = 1000, prune_interval: float = 3600):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        self.prune_interval = prune_interval
+        self._puts_since_prune = 0
+        self._pruned_at = time.time()
+        self.pruned = 0
+        self._memory = OrderedDict()  # ключ -> (перевод, created_at)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                language TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS translations_used ON translations (used_at)")
+
+    def _remember(self, key: str, value: tuple) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str, target_language: str):
+        """Перевод из кэша или None."""
+        key = cache_key(text, target_language)
+        now = time.time()
+        value = self._memory.get(key)
+        if value is not None and now - value[1] < self.ttl:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return value[0]
+        row = self.conn.execute(
+            "SELECT translation, created_at FROM translations WHERE key = ? AND created_at > ?",
+            (key, now - self.ttl)
+        ).fetchone()
+        if row is None:
+            self._memory.pop(key, None)
+            self.misses += 1
+            return None
+        self.conn.execute("UPDATE translations SET used_at = ? WHERE key = ?", (now, key))
+        self._remember(key, (row[0], row[1]))
+        self.disk_hits += 1
+        return row[0]
+
+    def put(self, text: str, target_language: str, translation: str) -> None:
+        key = cache_key(text, target_language)
+        now = time.time()
+        self.conn.execute("""
+            INSERT INTO translations (key, language, translation, created_at, used_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                translation = excluded.translation, created_at = excluded.created_at, used_at = excluded.used_at
+        """, (key, target_language, translation, now, now))
+        self._remember(key, (translation, now))
+        self._puts_since_prune += 1
+        if self._puts_since_prune >= self.prune_every or now - self._pruned_at >= self.prune_interval:
+            self.prune()
+
+    def prune(self) -> int:
+        """Удаляет устаревшие записи и лишние по used_at. Возвращает число удалённых."""
+        removed = self.conn.execute(
+            "DELETE FROM translations WHERE created_at <= ?", (time.time() - self.ttl,)
+        ).rowcount
+        removed += self.conn.execute("""
+            DELETE FROM translations WHERE key IN (
+                SELECT key FROM translations ORDER BY used_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_rows,)).rowcount
+        self._puts_since_prune = 0
+        self._pruned_at = time.time()
+        self.pruned += removed
+        return removed
+
+    def stats(self) -> dict:
+        total = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / total if total else 0.0,
+            "memory_size": len(self._memory),
+            "pruned": self.pruned
+        }
+
+    def close(self) -> None:
+        self.conn.close()
@@ -0,0 +1,249 @@
+# outbox.py
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты: ответы пользователю и массовые рассылки (напоминания и т.п.)
+INTERACTIVE = 0
+BULK = 1
+
+# Ограничение Telegram на длину текста сообщения
+MAX_TEXT = 4096
+# Разделитель склеенных текстов
+SEPARATOR = "\n\n"
+
+
+class Outgoing:
+    __slots__ = ("chat_id", "text", "kwargs", "priority", "future", "posted", "expires")
+
+    def __init__(self, chat_id: int, text: str, kwargs: dict, priority: int, future: asyncio.Future,
+                 expires_in: float = None) -> None:
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future = future
+        self.posted = time.monotonic()
+        self.expires = self.posted + expires_in if expires_in is not None else None
+
+    @property
+    def options(self) -> dict:
+        """Параметры send_message без клавиатуры: у склеиваемых текстов они должны совпадать."""
+        return {key: value for key, value in self.kwargs.items() if key != "reply_markup"}
+
+
+class Outbox:
+    """
+    Очередь исходящих сообщений. Обработчик ставит ответ в очередь (post)
+    и не ждёт отправки. У каждого чата своя очередь, её разбирает один
+    воркер за раз, поэтому порядок сообщений в чате сохраняется; тексты,
+    стоящие подряд, с одинаковыми параметрами склеиваются в одно сообщение
+    (клавиатура допустима только у последнего). При TelegramRetryAfter все
+    воркеры ждут retry_after и отправка повторяется.
+
+    Чаты с интерактивными сообщениями выбираются раньше чатов с рассылкой,
+    а рассылка занимает не больше workers - 1 воркеров: даже при большой
+    рассылке один воркер свободен для ответов пользователям.
+
+    Сообщение с expires_in, до которого очередь не дошла за это время
+    (напоминание об уже начавшейся паре), не отправляется: его future
+    отменяется, счётчик expired растёт.
+    """
+
+    def __init__(self, bot: Bot, workers: int = 4, max_retries: int = 3) -> None:
+        self.bot = bot
+        self.workers = workers
+        self.bulk_workers = max(1, workers - 1)
+        self.max_retries = max_retries
+        self._pending = {}  # chat_id -> deque[Outgoing]
+        self._ready = {INTERACTIVE: deque(), BULK: deque()}  # чаты, ждущие воркера
+        self._active = set()  # чаты, которые сейчас отправляет воркер
+        self._wakeup = asyncio.Event()
+        self._paused_until = 0.0
+        self._tasks = []
+        self.bulk_running = 0
+        # Метрики
+        self.posted = 0
+        self.sent = 0
+        self.merged = 0
+        self.retry_after = 0
+        self.failed = 0
+        self.expired = 0
+        self.latency_total = {INTERACTIVE: 0.0, BULK: 0.0}
+        self.latency_count = {INTERACTIVE: 0, BULK: 0}
+        self.latency_max = {INTERACTIVE: 0.0, BULK: 0.0}
+
+    async def start(self) -> None:
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"outbox-worker-{i}"))
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Дожидается отправки очереди (не дольше timeout) и останавливает воркеров."""
+        deadline = time.monotonic() + timeout
+        while (self._pending or self._active) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def post(self, chat_id: int, text: str, priority: int = INTERACTIVE, expires_in: float = None,
+             **kwargs) -> asyncio.Future:
+        """
+        Ставит сообщение в очередь; kwargs — параметры send_message. Возвращает
+        future с отправленным Message (общим для склеенных текстов); ждать его
+        не обязательно, ошибки отправки логируются. expires_in — через сколько
+        секунд сообщение теряет смысл и отправлять его уже не нужно.
+        """
+        future = asyncio.get_running_loop().create_future()
+        # Ошибка, которую никто не ждёт, уже залогирована воркером
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending.setdefault(chat_id, deque()).append(
+            Outgoing(chat_id, text, kwargs, priority, future, expires_in))
+        self.posted += 1
+        if chat_id not in self._active:
+            # Чат может оказаться в обеих очередях; лишняя запись пропускается при выборе
+            self._ready[priority].append(chat_id)
+            self._wakeup.set()
+        return future
+
+    async def send(self, chat_id: int, text: str, priority: int = INTERACTIVE, **kwargs):
+        """post() с ожиданием отправки."""
+        return await self.post(chat_id, text, priority, **kwargs)
+
+    def _next_chat(self):
+        for priority in (INTERACTIVE, BULK):
+            if priority == BULK and self.bulk_running >= self.bulk_workers:
+                break
+            ready = self._ready[priority]
+            while ready:
+                chat_id = ready.popleft()
+                if chat_id not in self._active and self._pending.get(chat_id):
+                    return chat_id
+        return None
+
+    def _expire(self, queue: deque) -> None:
+        """Убирает из очереди чата сообщения, срок которых истёк."""
+        now = time.monotonic()
+        if not any(item.expires is not None and item.expires <= now for item in queue):
+            return
+        for item in list(queue):
+            if item.expires is not None and item.expires <= now:
+                queue.remove(item)
+                item.future.cancel()
+                self.expired += 1
+
+    def _take(self, chat_id: int) -> list:
+        """Первое сообщение чата и идущие за ним, которые можно склеить с ним в одно (пусто — всё истекло)."""
+        queue = self._pending[chat_id]
+        self._expire(queue)
+        if not queue:
+            return []
+        batch = [queue.popleft()]
+        options = batch[0].options
+        length = len(batch[0].text)
+        # Клавиатура прикрепляется к сообщению целиком, поэтому после неё склейка заканчивается
+        while queue and "reply_markup" not in batch[-1].kwargs:
+            item = queue[0]
+            if item.options != options or length + len(SEPARATOR) + len(item.text) > MAX_TEXT:
+                break
+            batch.append(queue.popleft())
+            length += len(SEPARATOR) + len(item.text)
+        return batch
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id = self._next_chat()
+            if chat_id is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            batch = self._take(chat_id)
+            if not batch:
+                self._pending.pop(chat_id, None)
+                continue
+            bulk = all(item.priority == BULK for item in batch)
+            self._active.add(chat_id)
+            self.bulk_running += bulk
+            try:
+                await self._deliver(batch)
+            finally:
+                self.bulk_running -= bulk
+                self._active.discard(chat_id)
+                queue = self._pending.get(chat_id)
+                if queue:
+                    self._ready[min(item.priority for item in queue)].append(chat_id)
+                    self._wakeup.set()
+                else:
+                    self._pending.pop(chat_id, None)
+                if bulk:
+                    # Освободилось место для рассылки
+                    self._wakeup.set()
+
+    async def _deliver(self, batch: list) -> None:
+        text = SEPARATOR.join(item.text for item in batch)
+        # Параметры у склеенных текстов совпадают, клавиатура — от последнего
+        kwargs = batch[-1].kwargs
+        for attempt in range(self.max_retries + 1):
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            try:
+                message = await self.bot.send_message(batch[0].chat_id, text, **kwargs)
+            except TelegramRetryAfter as exc:
+                self.retry_after += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + exc.retry_after)
+                logger.warning(f"Telegram просит подождать {exc.retry_after} с (чат {batch[0].chat_id})")
+                if attempt < self.max_retries:
+                    continue
+                self._fail(batch, exc)
+                return
+            except Exception as exc:
+                # Бот заблокирован, чат не найден и т.п.: повтор не поможет
+                self._fail(batch, exc)
+                return
+            self._done(batch, message)
+            return
+
+    def _done(self, batch: list, message) -> None:
+        now = time.monotonic()
+        self.sent += 1
+        self.merged += len(batch) - 1
+        for item in batch:
+            latency = now - item.posted
+            self.latency_total[item.priority] += latency
+            self.latency_count[item.priority] += 1
+            self.latency_max[item.priority] = max(self.latency_max[item.priority], latency)
+            if not item.future.done():
+                item.future.set_result(message)
+
+    def _fail(self, batch: list, exc: Exception) -> None:
+        self.failed += len(batch)
+        logger.error(f"Не удалось отправить сообщение в чат {batch[0].chat_id}: {exc}")
+        for item in batch:
+            if not item.future.done():
+                item.future.set_exception(exc)
+
+    def stats(self) -> dict:
+        return {
+            "queued": sum(len(queue) for queue in self._pending.values()),
+            "posted": self.posted,
+            "sent": self.sent,
+            "merged": self.merged,
+            "retry_after": self.retry_after,
+            "failed": self.failed,
+            "expired": self.expired,
+            "latency_avg": {
+                name: self.latency_total[priority] / self.latency_count[priority]
+                if self.latency_count[priority] else 0.0
+                for name, priority in (("interactive", INTERACTIVE), ("bulk", BULK))
+            },
+            "latency_max": {"interactive": self.latency_max[INTERACTIVE], "bulk": self.latency_max[BULK]}
+        }
@@ -0,0 +1,466 @@
+# recommender.py
+
+import asyncio
+import logging
+import re
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+from cities import CityIndex
+from event_store import normalize_text
+from schedule import DAY_END, FreeTime
+from schedule_store import ScheduleStore
+
+logger = logging.getLogger(__name__)
+
+# Размерность хешированного пространства признаков: коллизии основ практически исключены
+DIMENSIONS = 2 ** 20
+# Длина основы слова: "музыка", "музыкальный" -> "музык"
+STEM_LENGTH = 5
+
+# Слова, по которым событие считается «активным» и «общительным»; вклад оценок
+# activity/sociability из профиля в итоговый балл не больше PROFILE_WEIGHT
+ACTIVE_WORDS = "спорт футбол хоккей йога бег забег поход экскурсия прогулка велосипед танцы sport yoga run hike tour"
+SOCIAL_WORDS = "концерт вечеринка квиз игры митап фестиваль стендап нетворкинг танцы party meetup quiz festival concert"
+PROFILE_WEIGHT = 0.1
+# Ограничение размера блока оценок (пользователи x события) при пакетном расчёте
+BATCH_CELLS = 4_000_000
+# Длительность события, если источник её не отдаёт, минуты
+EVENT_DURATION = 120
+
+# Только буквенные слова: числа и даты в названиях не говорят об интересах
+_WORD = re.compile(r'[^\W\d_]{2,}')
+
+
+def tokens(text: str) -> list:
+    return [word[:STEM_LENGTH] for word in _WORD.findall(normalize_text(text))]
+
+
+def hashed_counts(text: str, dimensions: int = DIMENSIONS) -> dict:
+    """Разреженный вектор частот основ: {индекс признака: count}."""
+    counts = {}
+    for token in tokens(text):
+        index = zlib.crc32(token.encode('utf-8')) % dimensions
+        counts[index] = counts.get(index, 0) + 1
+    return counts
+
+
+def rating(value) -> float:
+    """Оценка 1..5 из профиля -> [-1, 1]; без оценки — 0."""
+    try:
+        return (min(max(int(value), 1), 5) - 3) / 2
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def week_minute(date_str: str) -> int:
+    """'YYYY-MM-DD HH:MM' -> минута недели от начала понедельника или -1."""
+    try:
+        moment = datetime.strptime(date_str, '%Y-%m-%d %H:%M')
+    except (TypeError, ValueError):
+        return -1
+    return moment.weekday() * DAY_END + moment.hour * 60 + moment.minute
+
+
+def event_text(event: dict) -> str:
+    # Название весит больше описания и площадки
+    return ' '.join((event.get('title') or '',) * 2 + (event.get('short_desc') or '', event.get('venue') or ''))
+
+
+class EventIndex:
+    """
+    TF-IDF по хешированным основам слов для каталога событий. Нормированные
+    векторы событий хранятся по столбцам (признак -> события и веса, как
+    в инвертированном индексе) в плоских массивах NumPy. Блок пользователей
+    оценивается против всех событий сразу: постинги их признаков собираются
+    одной выборкой, а матрица оценок (пользователи x события) складывается
+    np.bincount. Top-N по строкам выбирается argpartition без полной сортировки.
+    """
+
+    def __init__(self, events: list, dimensions: int = DIMENSIONS):
+        self.dimensions = dimensions
+        # События уже идут по возрастанию даты (EventStore.upcoming)
+        self.events = events
+        self.cities = np.array([event.get('city') or '' for event in events])
+        counts = [hashed_counts(event_text(event), dimensions) for event in events]
+        lengths = np.fromiter((len(doc) for doc in counts), dtype=np.int64, count=len(counts))
+        rows = np.repeat(np.arange(len(events)), lengths)
+        columns = np.fromiter((f for doc in counts for f in doc), dtype=np.int64, count=int(lengths.sum()))
+        weights = np.log1p(np.fromiter((n for doc in counts for n in doc.values()),
+                                       dtype=np.float32, count=int(lengths.sum())))
+
+        # В каждом документе признак встречается один раз, поэтому bincount столбцов — это df
+        document_frequency = np.bincount(columns, minlength=dimensions)
+        self.idf = (np.log((1 + len(events)) / (1 + document_frequency)) + 1).astype(np.float32)
+        weights *= self.idf[columns]
+        norms = np.sqrt(np.bincount(rows, weights * weights, minlength=len(events)))
+        weights /= np.maximum(norms, 1e-9)[rows].astype(np.float32)
+
+        order = np.argsort(columns, kind='stable')
+        self.rows = rows[order]
+        self.weights = weights[order]
+        self.offsets = np.concatenate(([0], np.cumsum(document_frequency)))
+
+        self.active = self._marks(counts, ACTIVE_WORDS)
+        self.social = self._marks(counts, SOCIAL_WORDS)
+        names, self.event_city_ids = np.unique(self.cities, return_inverse=True)
+        self.city_ids = {name: i for i, name in enumerate(names.tolist())}
+        self._base_rows = {}
+        self._base_tops = {}
+        self._base_orders = {}
+        # Время события в минутах недели для сверки со свободным временем (-1 — неизвестно)
+        self.week_starts = np.fromiter((week_minute(event.get('date')) for event in events),
+                                       dtype=np.int64, count=len(events))
+        self._unique_starts, self._start_inverse = np.unique(self.week_starts, return_inverse=True)
+
+    def _marks(self, counts: list, words: str) -> np.ndarray:
+        features = set(hashed_counts(words, self.dimensions))
+        return np.fromiter((bool(features & doc.keys()) for doc in counts), dtype=np.float64, count=len(counts))
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def base_row(self, activity: float, sociability: float, city: str) -> np.ndarray:
+        """
+        Часть оценки, не зависящая от интересов: поправка за activity/sociability,
+        -inf для событий другого города и сдвиг, при котором из равных по
+        оценке событий выше более близкое. Комбинаций немного, строки кэшируются.
+        """
+        key = (activity, sociability, city)
+        row = self._base_rows.get(key)
+        if row is None:
+            row = self._base(activity, sociability, self._city_id(city), np.arange(len(self.events)))
+            self._base_rows[key] = row
+        return row
+
+    def _city_id(self, city: str) -> int:
+        # -1 — город не задан (фильтра нет), -2 — города нет в каталоге
+        return self.city_ids.get(city, -2) if city else -1
+
+    def _base(self, activity, sociability, city_id, rows: np.ndarray) -> np.ndarray:
+        """base_row для пар (пользователь, событие); аргументы — скаляры или массивы той же длины, что rows."""
+        values = PROFILE_WEIGHT * (activity * self.active[rows] + sociability * self.social[rows]) - rows * 1e-9
+        mask = (city_id != -1) & (city_id != self.event_city_ids[rows])
+        return np.where(mask, -np.inf, values)
+
+    def base_top(self, key: tuple, n: int):
+        """n лучших событий только по base_row: (индексы, оценки) по убыванию оценки."""
+        cached = self._base_tops.get((key, n))
+        if cached is None:
+            row = self.base_row(*key)
+            top = np.argpartition(-row, n - 1)[:n]
+            top = top[np.argsort(-row[top], kind='stable')]
+            cached = (top, row[top])
+            self._base_tops[(key, n)] = cached
+        return cached
+
+    def base_top_masked(self, key: tuple, mask: np.ndarray, n: int):
+        """base_top среди событий, разрешённых mask."""
+        order = self._base_orders.get(key)
+        if order is None:
+            order = np.argsort(-self.base_row(*key), kind='stable')
+            self._base_orders[key] = order
+        # Свободна обычно заметная доля недели: хватает короткого начала order
+        block = 4 * n
+        while True:
+            head = order[:block]
+            top = head[mask[self._start_inverse[head]]][:n]
+            if len(top) == n or block >= len(order):
+                return top, self.base_row(*key)[top]
+            block *= 4
+
+    def free_mask(self, free_time: FreeTime) -> np.ndarray:
+        """
+        Маска по различным минутам начала (их не больше минут в неделе), а не по
+        событиям: помещается ли событие с таким началом в свободное время
+        пользователя. Событию i соответствует mask[_start_inverse[i]]; события
+        без известного времени разрешены.
+        """
+        fits = free_time.fits(self._unique_starts, self._unique_starts + EVENT_DURATION)
+        return (self._unique_starts < 0) | fits
+
+    def vectorize(self, interests: str):
+        """Нормированный вектор интересов: (массив признаков, массив весов)."""
+        doc = hashed_counts(interests or '', self.dimensions)
+        features = np.fromiter(doc, dtype=np.int64, count=len(doc))
+        weights = np.log1p(np.fromiter(doc.values(), dtype=np.float32, count=len(doc))) * self.idf[features]
+        return features, weights / max(float(np.sqrt(weights @ weights)), 1e-9)
+
+    def postings(self, interests: list):
+        """Ненулевые слагаемые косинусной близости: массивы (пользователь, событие, вклад)."""
+        vectors = [self.vectorize(text) for text in interests]
+        users = np.repeat(np.arange(len(vectors)), [len(features) for features, _ in vectors])
+        features = np.concatenate([features for features, _ in vectors] or [np.empty(0, np.int64)])
+        weights = np.concatenate([weights for _, weights in vectors] or [np.empty(0, np.float32)])
+
+        starts = self.offsets[features]
+        lengths = self.offsets[features + 1] - starts
+        total = int(lengths.sum())
+        # Номера постингов всех признаков подряд, без цикла по признакам
+        postings = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+        return (np.repeat(users, lengths), self.rows[postings],
+                self.weights[postings] * np.repeat(weights, lengths))
+
+    def rank(self, profiles: list, n: int, masks: list = None) -> list:
+        """
+        Для каждого профиля (interests, city — код города, activity, sociability)
+        массив индексов не более n лучших событий. masks — для каждого профиля
+        None или free_mask: допустимые минуты начала событий.
+        """
+        masks = masks or [None] * len(profiles)
+        if not self.events:
+            return [np.empty(0, dtype=np.int64) for _ in profiles]
+        n = min(n, len(self.events))
+        keys = [(rating(profile.get('activity')), rating(profile.get('sociability')), profile.get('city') or '')
+                for profile in profiles]
+        users, rows, contributions = self.postings([profile.get('interests') or '' for profile in profiles])
+        size = len(profiles) * len(self.events)
+        # Интересы обычно задевают малую часть событий: тогда считаем только задетые пары
+        if len(rows) * 16 < size:
+            return self._rank_sparse(keys, masks, users, rows, contributions, n)
+
+        scores = np.bincount(users * len(self.events) + rows, contributions, minlength=size)
+        scores = scores.reshape(len(profiles), len(self.events)) + np.stack([self.base_row(*key) for key in keys])
+        for i, mask in enumerate(masks):
+            if mask is not None:
+                scores[i, ~mask[self._start_inverse]] = -np.inf
+        top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        values = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-values, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        values = np.take_along_axis(values, order, axis=1)
+        return [row[np.isfinite(row_values)] for row, row_values in zip(top, values)]
+
+    def _rank_sparse(self, keys: list, masks: list, users, rows, contributions, n: int) -> list:
+        """
+        Оценка по интересам неотрицательна, поэтому событие без общих признаков
+        попадает в top-n, только если оно в top-n по одной base_row (среди
+        допустимых маской). Достаточно сравнить задетые пары с base_top.
+        """
+        size = len(self.events)
+        cells, inverse = np.unique(users * size + rows, return_inverse=True)
+        users, rows = cells // size, cells % size
+        activity = np.array([key[0] for key in keys])
+        sociability = np.array([key[1] for key in keys])
+        city_ids = np.array([self._city_id(key[2]) for key in keys])
+        scores = np.bincount(inverse, contributions) + self._base(
+            activity[users], sociability[users], city_ids[users], rows)
+        masked = [i for i, mask in enumerate(masks) if mask is not None]
+        if masked:
+            slots = np.full(len(keys), -1)
+            slots[masked] = np.arange(len(masked))
+            allowed = np.stack([masks[i] for i in masked])
+            pair_slots = slots[users]
+            scores[(pair_slots >= 0) & ~allowed[np.maximum(pair_slots, 0), self._start_inverse[rows]]] = -np.inf
+
+        tops = [self.base_top(key, n) if mask is None else self.base_top_masked(key, mask, n)
+                for key, mask in zip(keys, masks)]
+        base_users = np.repeat(np.arange(len(keys)), [len(top) for top, _ in tops])
+        base_rows = np.concatenate([top for top, _ in tops])
+        base_scores = np.concatenate([values for _, values in tops])
+        # Событие из base_top, уже задетое интересами, оценено среди пар (и не ниже)
+        base_cells = base_users * size + base_rows
+        found = np.searchsorted(cells, base_cells)
+        fresh = cells[np.minimum(found, len(cells) - 1)] != base_cells if len(cells) else np.ones(len(base_cells), bool)
+
+        users = np.concatenate((users, base_users[fresh]))
+        rows = np.concatenate((rows, base_rows[fresh]))
+        scores = np.concatenate((scores, base_scores[fresh]))
+        keep = np.isfinite(scores)
+        users, rows, scores = users[keep], rows[keep], scores[keep]
+
+        order = np.lexsort((-scores, users))
+        users, rows = users[order], rows[order]
+        position = np.arange(len(users)) - np.searchsorted(users, users)
+        users, rows = users[position < n], rows[position < n]
+        return np.split(rows, np.cumsum(np.bincount(users, minlength=len(keys)))[:-1])
+
+
+class Recommender:
+    """
+    Рекомендации из заранее посчитанного кэша. После каждого обновления
+    каталога refresh() пересобирает EventIndex для каждого шарда CityIndex
+    и пакетно считает top_n для всех пользователей из шардов CityIndex:
+    пользователь оценивается только против событий своего города, а без
+    распознанного города — против всего каталога. Обработчик только берёт
+    готовый список. Пользователь, которого нет в кэше (новый или обновивший профиль),
+    считается по запросу тем же ранжированием и попадает в кэш.
+
+    Если передано хранилище расписаний, из рекомендаций убираются события,
+    которые не помещаются в свободное время пользователя (FreeTime).
+
+    LLM подключается только опционально: rerank получает интересы и короткий
+    список кандидатов и возвращает их в нужном порядке.
+    """
+
+    def __init__(self, cities: CityIndex, users, schedules: ScheduleStore = None, rerank=None, top_n: int = 20):
+        self.cities = cities
+        self.users = users
+        self.schedules = schedules
+        self.rerank = rerank
+        self.top_n = top_n
+        self.indexes = {}  # код города или None -> EventIndex
+        self.cache = {}  # user_id -> (код города, индексы событий в self.indexes[код])
+        self.free_times = {}  # user_id -> FreeTime, только для пользователей с расписанием
+        self._forgotten = None  # user_id, сброшенные во время идущего пересчёта
+        self._lock = asyncio.Lock()
+        self._queued = None  # пересчёт, ждущий окончания текущего
+        self._task = None  # первый пересчёт после старта
+        self.hits = 0
+        self.misses = 0
+        self.last_batch = {'users': 0, 'events': 0, 'schedules': 0, 'seconds': 0.0}
+
+    def _shard(self, user: dict):
+        return self.cities.resolver.resolve(user.get('city'))
+
+    @staticmethod
+    def _profile(user: dict) -> dict:
+        # Город уже учтён выбором шарда, внутри шарда фильтр по городу не нужен
+        return dict(user, city=None)
+
+    def precompute(self, index: EventIndex, profiles: list, free_times: dict) -> dict:
+        """Top-N для списка пар (user_id, профиль) блоками по BATCH_CELLS ячеек."""
+        cache = {}
+        chunk = max(1, BATCH_CELLS // max(len(index), 1))
+        for i in range(0, len(profiles), chunk):
+            part = profiles[i:i + chunk]
+            masks = [index.free_mask(free_times[user_id]) if user_id in free_times else None
+                     for user_id, _ in part]
+            ranked = index.rank([profile for _, profile in part], self.top_n, masks)
+            for (user_id, _), user_ranked in zip(part, ranked):
+                cache[user_id] = user_ranked
+        return cache
+
+    @staticmethod
+    def build_free_times(rows: list, known: dict = None) -> dict:
+        """
+        Строки ScheduleStore.all_rows() -> {user_id (int): FreeTime}. FreeTime из known
+        берутся как есть: forget() убирает их при изменении расписания, поэтому
+        разбирается только расписание новых и изменившихся пользователей.
+        """
+        known = known or {}
+        free_times = {}
+        fresh = []
+        for row in rows:
+            if not row[0].isdigit():
+                continue
+            user_id = int(row[0])
+            if user_id in known:
+                free_times[user_id] = known[user_id]
+            else:
+                fresh.append(row)
+        for user_id, busy in ScheduleStore.decode_busy(fresh).items():
+            free_times[int(user_id)] = FreeTime(busy)
+        return free_times
+
+    def _batch(self, shards: dict, groups: dict, rows: list, known: dict):
+        indexes = {code: EventIndex(events) for code, events in shards.items()}
+        free_times = self.build_free_times(rows, known)
+        cache = {}
+        for code, profiles in groups.items():
+            for user_id, ranked in self.precompute(indexes[code], profiles, free_times).items():
+                cache[user_id] = (code, ranked)
+        return indexes, free_times, cache
+
+    async def start(self) -> None:
+        """
+        Запускает первый пересчёт в фоне: старт бота его не ждёт, до его
+        окончания рекомендации считаются по запросу (recommend).
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._initial_refresh(), name="recommender-refresh")
+
+    async def _initial_refresh(self) -> None:
+        try:
+            await self.refresh()
+        except Exception as exc:
+            logger.exception(f"Ошибка первого пересчёта рекомендаций: {exc}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def refresh(self) -> None:
+        """
+        Пересчитывает рекомендации всех пользователей. Пересчёты не пересекаются:
+        вызов во время расчёта ставит в очередь ещё один (он прочитает свежие
+        данные), а вызовы, пришедшие, пока тот ждёт, дожидаются его же.
+        """
+        if self._queued is None:
+            self._queued = asyncio.ensure_future(self._refresh_locked())
+        await asyncio.shield(self._queued)
+
+    async def _refresh_locked(self) -> None:
+        async with self._lock:
+            # Дальнейшие вызовы уже не увидят данных, прочитанных этим пересчётом
+            self._queued = None
+            await self._refresh()
+
+    async def _refresh(self) -> None:
+        started = time.monotonic()
+        # Чтение базы — в потоке цикла событий, расчёт — в отдельном потоке
+        shards = self.cities.event_shards()
+        # Пользователи уже разложены по городам в CityIndex: ни чтения всех профилей, ни разбора городов
+        groups = {code: [(user_id, self._profile(user)) for user_id, user in profiles.items()]
+                  for code, profiles in self.cities.user_shards().items()}
+        rows = self.schedules.all_rows() if self.schedules is not None else []
+        forgotten = self._forgotten = set()
+        try:
+            indexes, free_times, cache = await asyncio.to_thread(
+                self._batch, shards, groups, rows, dict(self.free_times))
+        finally:
+            self._forgotten = None
+        # Кто изменил профиль или расписание во время расчёта, посчитан по старым данным
+        for user_id in forgotten:
+            cache.pop(user_id, None)
+            free_times.pop(user_id, None)
+        # Индекс и кэш подменяются вместе: индексы в кэше ссылаются на этот каталог
+        self.indexes, self.free_times, self.cache = indexes, free_times, cache
+        self.last_batch = {'users': len(cache), 'events': len(shards[None]), 'schedules': len(free_times),
+                           'seconds': time.monotonic() - started}
+        logger.info(f"Рекомендации пересчитаны для {len(cache)} пользователей по {len(shards[None])} событиям "
+                    f"за {self.last_batch['seconds']:.2f} с")
+
+    def forget(self, user_id: int) -> None:
+        """Сбрасывает рекомендации пользователя после изменения профиля или расписания."""
+        self.cache.pop(user_id, None)
+        self.free_times.pop(user_id, None)
+        if self._forgotten is not None:
+            self._forgotten.add(user_id)
+
+    def _free_time(self, user_id: int):
+        free_time = self.free_times.get(user_id)
+        if free_time is None and self.schedules is not None and self.schedules.has_user(str(user_id)):
+            free_time = FreeTime.from_schedule(self.schedules.get_user(str(user_id)))
+            self.free_times[user_id] = free_time
+        return free_time
+
+    async def recommend(self, user_id: int, k: int = 5) -> list:
+        user = self.users.get(user_id) or {}
+        code = self._shard(user)
+        index = self.indexes.get(code)
+        if index is None:
+            # Пакетный пересчёт ещё не закончился (первый идёт в фоне после старта): индекс шарда строим сами
+            index = self.indexes[code] = EventIndex(self.cities.events(code))
+        cached = self.cache.get(user_id)
+        if cached is None or cached[0] != code:
+            self.misses += 1
+            free_time = self._free_time(user_id)
+            mask = index.free_mask(free_time) if free_time is not None else None
+            ranked = index.rank([self._profile(user)], self.top_n, [mask])[0]
+            self.cache[user_id] = (code, ranked)
+        else:
+            self.hits += 1
+            ranked = cached[1]
+        events = [index.events[i] for i in ranked]
+        if self.rerank is None or len(events) <= 1:
+            return events[:k]
+        return (await self.rerank(user.get('interests') or '', events))[:k]
+
+    def stats(self) -> dict:
+        return dict(self.last_batch, hits=self.hits, misses=self.misses, cached=len(self.cache))
@@ -0,0 +1,206 @@
+# reminders.py
+
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta
+
+from localization import DEFAULT_LANG, get_msg
+from outbox import BULK
+from schedule import DAYS, DAY_END, WEEK, format_minutes
+from schedule_store import ScheduleStore
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderScheduler:
+    """
+    Напоминания «через 15 минут начинается …» о парах и событиях из расписаний.
+
+    Каждая запись расписания повторяется раз в неделю. Ближайшие срабатывания
+    всех пользователей (начало минус lead) лежат в одной куче: цикл спит до
+    вершины, снимает наступившие записи и возвращает их в кучу со сдвигом на
+    неделю. Расписания целиком читаются один раз при старте, дальше на каждое
+    напоминание — O(log n) без перебора пользователей по минутам.
+
+    Время в куче — минуты от полуночи понедельника недели запуска по часам
+    clock (локальное время сервера, как и в расписаниях). reschedule после
+    изменения расписания увеличивает версию пользователя и кладёт новые записи;
+    записи старой версии отбрасываются при снятии с вершины, а когда их больше
+    половины кучи — она пересобирается.
+
+    Язык берётся из профиля через profiles(user_id) — в боте это
+    CityIndex.profile, профиль из памяти без запроса к базе.
+
+    Сообщения уходят через Outbox с приоритетом BULK: общий лимит отправки
+    соблюдается, ответы пользователям рассылка не задерживает. Напоминание,
+    которое очередь не успела отправить до начала пары, Outbox отбрасывает.
+    clock и sleep можно подменить (проверки с поддельным временем).
+    """
+
+    def __init__(self, store: ScheduleStore, profiles, outbox, lead: int = 15, clock=datetime.now,
+                 sleep=asyncio.sleep):
+        self.store = store
+        self.profiles = profiles
+        self.outbox = outbox
+        self.lead = lead
+        self.clock = clock
+        self.sleep = sleep
+        self._base = None  # полночь понедельника недели запуска
+        self._heap = None  # (минута срабатывания, user_id, версия, название)
+        self._versions = {}  # user_id -> версия расписания (нет записи — 0)
+        self._counts = {}  # user_id -> записей текущей версии в куче
+        self._stale = 0
+        self._changed = None  # изменённые во время загрузки расписания
+        self._wakeup = asyncio.Event()
+        self._task = None
+        # Метрики
+        self.sent = 0
+        self.missed = 0
+        self.load_seconds = 0.0
+
+    def _now(self) -> float:
+        return (self.clock() - self._base).total_seconds() / 60
+
+    def _entries(self, user_id: str, days: dict, version: int, now: float, grace: int, titles: dict) -> list:
+        """
+        Ближайшие срабатывания пользователя: days — {день: [(начало, название), ...]}.
+        Срабатывание, прошедшее не больше чем grace минут назад, остаётся на этой неделе.
+        Одинаковые названия пар хранятся одной строкой из titles.
+        """
+        entries = []
+        week = int(now // WEEK) * WEEK
+        for day, items in days.items():
+            if day not in DAYS:
+                continue
+            offset = week + DAYS.index(day) * DAY_END - self.lead
+            for start, title in items:
+                key = offset + start
+                if key + grace <= now:
+                    key += WEEK * int((now - key - grace) // WEEK + 1)
+                entries.append((key, user_id, version, titles.setdefault(title, title)))
+        return entries
+
+    def _build(self, rows, now: float) -> tuple:
+        heap, counts, titles = [], {}, {}
+        for user_id, days in ScheduleStore.decode_starts(rows).items():
+            # После перезапуска бота напоминание о ещё не начавшейся паре отправится сразу
+            entries = self._entries(user_id, days, 0, now, grace=self.lead, titles=titles)
+            heap.extend(entries)
+            counts[user_id] = len(entries)
+        heapq.heapify(heap)
+        return heap, counts
+
+    async def load(self) -> None:
+        """Строит кучу по всем расписаниям: чтение базы — в цикле событий, разбор — в отдельном потоке."""
+        started = time.monotonic()
+        moment = self.clock()
+        self._base = (moment - timedelta(days=moment.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        rows = self.store.all_rows()
+        self._changed = set()
+        try:
+            heap, counts = await asyncio.to_thread(self._build, rows, self._now())
+        finally:
+            changed, self._changed = self._changed, None
+        self._heap, self._counts, self._versions, self._stale = heap, counts, {}, 0
+        # Кто изменил расписание во время загрузки, собран по старым строкам
+        for user_id in changed:
+            self.reschedule(user_id)
+        self.load_seconds = time.monotonic() - started
+        logger.info(f"Напоминания: {len(heap)} записей расписаний {len(counts)} пользователей "
+                    f"загружены за {self.load_seconds:.2f} с")
+
+    def reschedule(self, user_id: str) -> None:
+        """Перечитывает расписание пользователя после изменения."""
+        if self._heap is None:
+            if self._changed is not None:
+                self._changed.add(user_id)
+            return
+        version = self._versions.get(user_id, 0) + 1
+        self._versions[user_id] = version
+        self._stale += self._counts.get(user_id, 0)
+        days = {day: [(ev.start, ev.title) for ev in day_schedule.events]
+                for day, day_schedule in self.store.get_user(user_id).items()}
+        # Наступившие срабатывания уже отправлены по старой версии — повторно не напоминаем
+        entries = self._entries(user_id, days, version, self._now(), grace=0, titles={})
+        for entry in entries:
+            heapq.heappush(self._heap, entry)
+        self._counts[user_id] = len(entries)
+        if self._stale > len(self._heap) // 2:
+            self._heap = [entry for entry in self._heap if entry[2] == self._versions.get(entry[1], 0)]
+            heapq.heapify(self._heap)
+            self._stale = 0
+        # Новая запись может оказаться раньше той, до которой спит цикл
+        self._wakeup.set()
+
+    async def start(self) -> None:
+        await self.load()
+        self._task = asyncio.create_task(self._run(), name="reminders")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def due(self) -> int:
+        """Отправляет наступившие напоминания. Возвращает число отправленных."""
+        heap = self._heap
+        now = self._now()
+        ready = []
+        while heap and heap[0][0] <= now:
+            key, user_id, version, title = heap[0]
+            if version != self._versions.get(user_id, 0):
+                heapq.heappop(heap)
+                self._stale -= 1
+                continue
+            heapq.heapreplace(heap, (key + WEEK, user_id, version, title))
+            if key + self.lead <= now:
+                # Цикл проспал начало пары (остановка бота, долгая пауза) — напоминать поздно
+                self.missed += 1
+                continue
+            ready.append((user_id, key + self.lead, title))
+        # Язык — один раз на пользователя из всей пачки (в 09:45 их тысячи)
+        languages = {user_id: (self.profiles(int(user_id)) or {}).get("language") or DEFAULT_LANG
+                     for user_id in {user_id for user_id, _, _ in ready}}
+        for user_id, start, title in ready:
+            self._notify(user_id, languages[user_id], start, title, (start - now) * 60)
+        return len(ready)
+
+    def _notify(self, user_id: str, lang: str, start: float, title: str, expires_in: float) -> None:
+        text = get_msg(lang, "reminder", minutes=self.lead, start=format_minutes(int(start) % DAY_END), title=title)
+        # Рассылка большая, а лимит отправки общий: после начала пары напоминание уже не нужно
+        self.outbox.post(int(user_id), text, priority=BULK, expires_in=expires_in)
+        self.sent += 1
+
+    async def _wait(self, delay) -> None:
+        """Ждёт delay секунд (None — без ограничения) или вызова reschedule."""
+        self._wakeup.clear()
+        waiters = {asyncio.ensure_future(self._wakeup.wait())}
+        if delay is not None:
+            waiters.add(asyncio.ensure_future(self.sleep(delay)))
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.due()
+            except Exception as exc:
+                logger.error(f"Ошибка при отправке напоминаний: {exc}")
+            delay = (self._heap[0][0] - self._now()) * 60 if self._heap else None
+            await self._wait(max(delay, 0.0) if delay is not None else None)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._heap or ()),
+            "stale": self._stale,
+            "users": len(self._counts),
+            "sent": self.sent,
+            "missed": self.missed,
+            "load_seconds": self.load_seconds
+        }
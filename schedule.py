@@ -0,0 +1,247 @@
+# schedule.py
+
+import re
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+import numpy as np
+
+DAYS = ["ПН", "ВТ", "СР", "ЧТ", "ПТ", "СБ", "ВС"]
+
+EVENT_LINE = re.compile(r"^(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2}):\s*(.*)$")
+DATE_LINE = re.compile(r"(\d{2}\.\d{2}\.\d{4})")
+
+DAY_START = 0
+DAY_END = 24 * 60
+WEEK = 7 * DAY_END
+
+
+def to_minutes(hhmm: str) -> int:
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def get_date_for_day(day: str, today: date = None) -> str:
+    """Дата указанного дня недели на текущей неделе в формате ДД.ММ.ГГГГ."""
+    today = today or date.today()
+    monday = today - timedelta(days=today.weekday())
+    return (monday + timedelta(days=DAYS.index(day))).strftime("%d.%m.%Y")
+
+
+@dataclass(frozen=True, order=True)
+class Event:
+    start: int                                   # Начало, минуты от полуночи
+    end: int                                     # Конец, минуты от полуночи
+    title: str = field(compare=False)
+    source: str = field(default="user", compare=False)  # "university", "user", "import"
+
+    def overlaps(self, start: int, end: int) -> bool:
+        return self.start < end and start < self.end
+
+    def render(self) -> str:
+        return f"{format_minutes(self.start)}-{format_minutes(self.end)}: {self.title}"
+
+
+class DaySchedule:
+    """
+    События одного дня, отсортированные по началу. Рядом с ними хранится
+    массив префиксных максимумов концов — неявное интервальное дерево:
+    поиск пересечений занимает O(log n + k) без разбора строк.
+    """
+
+    def __init__(self, date_str: str, events=()):
+        self.date = date_str
+        self.events = sorted(events)
+        self._reindex()
+
+    def _reindex(self) -> None:
+        self._starts = [ev.start for ev in self.events]
+        self._max_end = []
+        running = -1
+        for ev in self.events:
+            running = max(running, ev.end)
+            self._max_end.append(running)
+        # Свободные окна дня строятся лениво, при первой проверке конфликтов
+        self._gaps = None
+
+    def free_gaps(self) -> list:
+        """Свободные промежутки [(начало, конец)] внутри суток, по возрастанию."""
+        if self._gaps is None:
+            gaps = []
+            cursor = DAY_START
+            for ev in self.events:
+                if ev.start > cursor:
+                    gaps.append((cursor, ev.start))
+                cursor = max(cursor, ev.end)
+            if cursor < DAY_END:
+                gaps.append((cursor, DAY_END))
+            self._gaps = gaps
+            self._gap_starts = [gap[0] for gap in gaps]
+        return self._gaps
+
+    def nearest_free_window(self, start: int, duration: int):
+        """
+        Ближайшее к start свободное окно длиной duration: (начало, конец) или None.
+        Поиск идёт от окна, в которое попадает start, в обе стороны.
+        """
+        gaps = self.free_gaps()
+        pivot = bisect_left(self._gap_starts, start + 1) - 1
+        best = None
+        left, right = pivot, pivot + 1
+        while left >= 0 or right < len(gaps):
+            for i in (left, right):
+                if not 0 <= i < len(gaps):
+                    continue
+                gap_start, gap_end = gaps[i]
+                if gap_end - gap_start < duration:
+                    continue
+                candidate = min(max(start, gap_start), gap_end - duration)
+                if best is None or abs(candidate - start) < abs(best - start):
+                    best = candidate
+            # Окна дальше текущих границ не могут оказаться ближе найденного
+            left_distance = start - gaps[left][1] if left >= 0 else None
+            right_distance = gaps[right][0] - start if right < len(gaps) else None
+            if best is not None and all(d is None or d >= abs(best - start)
+                                        for d in (left_distance, right_distance)):
+                break
+            left, right = left - 1, right + 1
+        return (best, best + duration) if best is not None else None
+
+    def add(self, event: Event) -> None:
+        insort(self.events, event)
+        self._reindex()
+
+    def overlapping(self, start: int, end: int) -> list:
+        """События, пересекающиеся с полуинтервалом [start, end)."""
+        found = []
+        i = bisect_left(self._starts, end) - 1
+        while i >= 0 and self._max_end[i] > start:
+            if self.events[i].end > start:
+                found.append(self.events[i])
+            i -= 1
+        found.reverse()
+        return found
+
+    def next_after(self, minute: int):
+        """Ближайшее событие, начинающееся не раньше minute."""
+        i = bisect_left(self._starts, minute)
+        return self.events[i] if i < len(self.events) else None
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def render(self, day_off: str = "Выходной") -> str:
+        lines = [self.date] + [ev.render() for ev in self.events]
+        if not self.events:
+            lines.append(day_off)
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {
+            "date": self.date,
+            "events": [[ev.start, ev.end, ev.title, ev.source] for ev in self.events]
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DaySchedule":
+        return cls(data["date"], (Event(*item) for item in data["events"]))
+
+
+def check_event(day_schedule: DaySchedule, start: int, end: int):
+    """
+    Проверяет новое событие [start, end) на пересечения с днём.
+    Возвращает (список пересекающихся событий, предложенное свободное окно или None).
+    """
+    conflicts = day_schedule.overlapping(start, end)
+    if not conflicts:
+        return [], None
+    return conflicts, day_schedule.nearest_free_window(start, end - start)
+
+
+def parse_day(text: str, source: str = "import") -> DaySchedule:
+    """
+    Разбирает день в старом строковом формате:
+    "[ДН ]ДД.ММ.ГГГГ\\nЧЧ:ММ-ЧЧ:ММ: событие\\n...". Строки без времени
+    (например, "Выходной") пропускаются.
+    """
+    lines = text.split("\n")
+    date_match = DATE_LINE.search(lines[0]) if lines else None
+    date_str = date_match.group(1) if date_match else ""
+    events = []
+    for line in lines[1:] if date_match else lines:
+        match = EVENT_LINE.match(line.strip())
+        if not match:
+            continue
+        h1, m1, h2, m2, title = match.groups()
+        events.append(Event(int(h1) * 60 + int(m1), int(h2) * 60 + int(m2), title, source))
+    return DaySchedule(date_str, events)
+
+
+def convert_schedules(raw: dict, source: str = "import") -> dict:
+    """Конвертирует содержимое schedules.json в {user_id: {день: DaySchedule}}."""
+    return {
+        str(user_id): {day: parse_day(text, source) for day, text in days.items()}
+        for user_id, days in raw.items()
+    }
+
+
+class FreeTime:
+    """
+    Свободное время пользователя за неделю в минутах от начала понедельника:
+    дополнение занятых интервалов, смежные промежутки (в том числе через
+    полночь) объединены. День без расписания считается свободным целиком.
+    Неделя записана дважды подряд, чтобы событие в ночь с воскресенья на
+    понедельник тоже помещалось в один промежуток.
+    """
+
+    def __init__(self, busy: dict):
+        """busy: {день: [(начало, конец), ...]} — занятые интервалы внутри суток."""
+        intervals = []
+        for i, day in enumerate(DAYS):
+            for start, end in busy.get(day, ()):
+                # Интервал за концом суток продолжается в следующем дне, за концом недели — в понедельнике
+                start, end = min(start + i * DAY_END, WEEK), min(end + i * DAY_END, 2 * WEEK)
+                intervals.append((start, min(end, WEEK)))
+                if end > WEEK:
+                    intervals.append((0, end - WEEK))
+        intervals.sort()
+        free = []
+        cursor = 0
+        for start, end in intervals:
+            if start > cursor:
+                free.append((cursor, start))
+            cursor = max(cursor, end)
+        if cursor < WEEK:
+            free.append((cursor, WEEK))
+        week = np.array(free, dtype=np.int64).reshape(-1, 2)
+        # Вторая копия недели; промежуток через полночь воскресенья склеивается
+        shifted = week + WEEK
+        if len(week) and week[-1, 1] == WEEK and week[0, 0] == 0:
+            shifted[0, 0] = week[-1, 0]
+            week = week[:-1]
+        both = np.concatenate((week, shifted))
+        self.starts = both[:, 0].copy()
+        self.ends = both[:, 1].copy()
+
+    @classmethod
+    def from_schedule(cls, days: dict) -> "FreeTime":
+        """Из расписания {день: DaySchedule}."""
+        return cls({day: [(ev.start, ev.end) for ev in day_schedule.events]
+                    for day, day_schedule in days.items() if day_schedule is not None})
+
+    def fits(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        Для интервалов [starts, ends) в минутах недели (starts < WEEK): помещается ли
+        каждый целиком в свободное время. Промежутки не пересекаются и отсортированы,
+        поэтому достаточно одного бинарного поиска на интервал.
+        """
+        if not len(self.starts):
+            # Вся неделя занята
+            return np.zeros(len(starts), dtype=bool)
+        i = np.searchsorted(self.starts, starts, side="right") - 1
+        return (i >= 0) & (self.ends[np.maximum(i, 0)] >= ends)
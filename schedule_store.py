@@ -0,0 +1,161 @@
+# schedule_store.py
+
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from operator import itemgetter
+
+from schedule import DaySchedule, convert_schedules, parse_day
+
+
+class ScheduleStore:
+    """
+    Хранилище расписаний в SQLite: одна строка на пару (пользователь, день).
+    Запись затрагивает только изменённый день, а не весь файл, поэтому
+    стоимость добавления не зависит от числа пользователей. Каждая запись
+    выполняется в отдельной транзакции (WAL), так что сбой посреди записи
+    не портит уже сохранённые данные.
+
+    День хранится как JSON структуры DaySchedule; разобранные объекты
+    кэшируются в памяти, поэтому обработчики не разбирают строки повторно.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS schedule_days (
+                user_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                body TEXT NOT NULL,
+                PRIMARY KEY (user_id, day)
+            ) WITHOUT ROWID
+        """)
+        self._cache = {}  # user_id -> {день: DaySchedule}
+
+    @contextmanager
+    def transaction(self):
+        self.conn.execute("BEGIN")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    @staticmethod
+    def _decode(body: str) -> DaySchedule:
+        # Строки, записанные до перехода на JSON, разбираются старым парсером
+        if body.startswith("{"):
+            return DaySchedule.from_dict(json.loads(body))
+        return parse_day(body)
+
+    @staticmethod
+    def _encode(day_schedule: DaySchedule) -> str:
+        return json.dumps(day_schedule.to_dict(), ensure_ascii=False)
+
+    def has_user(self, user_id: str) -> bool:
+        if user_id in self._cache:
+            return True
+        row = self.conn.execute(
+            "SELECT 1 FROM schedule_days WHERE user_id = ? LIMIT 1", (user_id,)
+        ).fetchone()
+        return row is not None
+
+    def get_user(self, user_id: str) -> dict:
+        days = self._cache.get(user_id)
+        if days is None:
+            rows = self.conn.execute(
+                "SELECT day, body FROM schedule_days WHERE user_id = ?", (user_id,)
+            ).fetchall()
+            days = {day: self._decode(body) for day, body in rows}
+            if days:
+                self._cache[user_id] = days
+        return days
+
+    def get_day(self, user_id: str, day: str):
+        return self.get_user(user_id).get(day)
+
+    def put_day(self, user_id: str, day: str, day_schedule: DaySchedule) -> None:
+        self.conn.execute(
+            "INSERT INTO schedule_days (user_id, day, body) VALUES (?, ?, ?) "
+            "ON CONFLICT (user_id, day) DO UPDATE SET body = excluded.body",
+            (user_id, day, self._encode(day_schedule))
+        )
+        days = self.get_user(user_id)
+        days[day] = day_schedule
+        self._cache[user_id] = days
+
+    def put_user(self, user_id: str, schedule: dict) -> None:
+        # Все дни пользователя записываются одной транзакцией
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO schedule_days (user_id, day, body) VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id, day) DO UPDATE SET body = excluded.body",
+                [(user_id, day, self._encode(day_schedule)) for day, day_schedule in schedule.items()]
+            )
+        self._cache.pop(user_id, None)
+
+    def all_rows(self) -> list:
+        """Сырые строки всех расписаний (user_id, day, body) для пакетной обработки."""
+        return self.conn.execute("SELECT user_id, day, body FROM schedule_days").fetchall()
+
+    @staticmethod
+    def _decode_rows(rows, fields) -> dict:
+        """
+        Строки all_rows() -> {user_id: {день: [fields(событие), ...]}}, где событие —
+        список [начало, конец, название, источник]. JSON-строки разбираются одним вызовом json.loads.
+        """
+        rows = list(rows)
+        json_rows = [row for row in rows if row[2].startswith("{")]
+        decoded = json.loads("[" + ",".join(row[2] for row in json_rows) + "]")
+        users = {}
+        for (user_id, day, _), data in zip(json_rows, decoded):
+            users.setdefault(user_id, {})[day] = [fields(item) for item in data["events"]]
+        for user_id, day, body in rows:
+            if not body.startswith("{"):
+                users.setdefault(user_id, {})[day] = [fields([ev.start, ev.end, ev.title, ev.source])
+                                                      for ev in parse_day(body).events]
+        return users
+
+    @staticmethod
+    def decode_busy(rows) -> dict:
+        """
+        Строки all_rows() -> {user_id: {день: [(начало, конец), ...]}} без построения
+        DaySchedule. К базе не обращается.
+        """
+        return ScheduleStore._decode_rows(rows, itemgetter(0, 1))
+
+    @staticmethod
+    def decode_starts(rows) -> dict:
+        """Строки all_rows() -> {user_id: {день: [(начало, название), ...]}}, как decode_busy."""
+        return ScheduleStore._decode_rows(rows, itemgetter(0, 2))
+
+    def is_empty(self) -> bool:
+        return self.conn.execute("SELECT 1 FROM schedule_days LIMIT 1").fetchone() is None
+
+    def import_json(self, json_path: str) -> int:
+        """
+        Переносит расписания из старого формата schedules.json
+        ({user_id: {день: текст}}), конвертируя дни в DaySchedule. Уже существующие
+        записи не перезаписываются, поэтому повторный импорт безопасен.
+        Возвращает число импортированных пользователей.
+        """
+        if not os.path.exists(json_path):
+            return 0
+        with open(json_path, "r", encoding="utf-8") as f:
+            schedules = convert_schedules(json.load(f))
+        rows = [(user_id, day, self._encode(day_schedule))
+                for user_id, days in schedules.items()
+                for day, day_schedule in days.items()]
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO schedule_days (user_id, day, body) VALUES (?, ?, ?)", rows
+            )
+        return len(schedules)
+
+    def close(self) -> None:
+        self.conn.close()
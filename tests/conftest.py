@@ -0,0 +1,8 @@
+# tests/conftest.py
+#
+# Модули бота лежат в корне репозитория, без пакета: добавляем корень в sys.path.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,35 @@
+# tests/test_outbox.py
+#
+# Outbox с поддельным ботом: просроченные сообщения не отправляются.
+
+import asyncio
+
+from outbox import BULK, Outbox
+
+
+class RecordingBot:
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.sent.append((chat_id, text))
+        return text
+
+
+def test_expired_messages_are_dropped():
+    async def scenario():
+        bot = RecordingBot()
+        outbox = Outbox(bot, workers=2)
+        # Очередь дошла до сообщений уже после их срока (воркеры ещё не запущены)
+        late = outbox.post(1, "напоминание", priority=BULK, expires_in=0.0)
+        outbox.post(1, "ответ")
+        outbox.post(2, "напоминание", priority=BULK, expires_in=0.0)
+        outbox.post(3, "напоминание", priority=BULK, expires_in=60.0)
+        await outbox.start()
+        await outbox.stop()
+        assert sorted(bot.sent) == [(1, "ответ"), (3, "напоминание")]
+        assert late.cancelled()
+        assert outbox.stats()["expired"] == 2
+        assert outbox.stats()["queued"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,179 @@
+# tests/test_reminders.py
+#
+# ReminderScheduler на поддельных часах: цикл напоминаний работает как в боте,
+# время двигает тест, отправленные сообщения собирает поддельный outbox.
+
+import asyncio
+from datetime import datetime, timedelta
+
+from localization import get_msg
+from outbox import BULK
+from reminders import ReminderScheduler
+from schedule import DaySchedule, Event, to_minutes
+from schedule_store import ScheduleStore
+
+MONDAY = datetime(2026, 10, 12)  # понедельник
+USER = 7
+
+
+class FakeClock:
+    """Часы и sleep для планировщика: время идёт только в advance() и jump()."""
+
+    def __init__(self, now: datetime) -> None:
+        self.now = now
+        self.sleepers = []  # [срок, future]
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        sleeper = [self.now + timedelta(seconds=delay), asyncio.get_running_loop().create_future()]
+        self.sleepers.append(sleeper)
+        try:
+            await sleeper[1]
+        finally:
+            self.sleepers.remove(sleeper)
+
+    async def advance(self, moment: datetime) -> None:
+        """Идёт до moment, будя каждого спящего в его срок."""
+        while True:
+            await settle()
+            deadline = min((sleeper[0] for sleeper in self.sleepers), default=None)
+            if deadline is None or deadline > moment:
+                break
+            self.now = max(self.now, deadline)
+            self._wake()
+        self.now = moment
+        await settle()
+
+    async def jump(self, moment: datetime) -> None:
+        """Перевод часов без промежуточных пробуждений (бот стоял или цикл проспал)."""
+        self.now = moment
+        self._wake()
+        await settle()
+
+    def _wake(self) -> None:
+        for deadline, future in self.sleepers:
+            if deadline <= self.now and not future.done():
+                future.set_result(None)
+
+
+class RecordingOutbox:
+    def __init__(self) -> None:
+        self.posted = []
+        self.expires = []
+
+    def post(self, chat_id: int, text: str, priority: int, expires_in: float) -> None:
+        self.posted.append((chat_id, text, priority))
+        self.expires.append(expires_in)
+
+
+async def settle() -> None:
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+def day(*events) -> DaySchedule:
+    return DaySchedule("", [Event(to_minutes(start), to_minutes(start) + 90, title) for start, title in events])
+
+
+def reminder(start: str, title: str) -> tuple:
+    return USER, get_msg("ru", "reminder", minutes=15, start=start, title=title), BULK
+
+
+def run(tmp_path, schedule: dict, now: datetime, scenario) -> None:
+    store = ScheduleStore(str(tmp_path / "bot.db"))
+    store.put_user(str(USER), schedule)
+    clock = FakeClock(now)
+    outbox = RecordingOutbox()
+    scheduler = ReminderScheduler(store, {USER: {"language": "ru"}}.get, outbox, lead=15,
+                                  clock=clock, sleep=clock.sleep)
+
+    async def main():
+        await scheduler.start()
+        try:
+            await scenario(clock, outbox, scheduler, store)
+        finally:
+            await scheduler.stop()
+            store.close()
+
+    asyncio.run(main())
+
+
+def test_reminder_before_class_and_next_week(tmp_path):
+    async def scenario(clock, outbox, scheduler, store):
+        await clock.advance(MONDAY.replace(hour=9, minute=44))
+        assert outbox.posted == []
+        await clock.advance(MONDAY.replace(hour=9, minute=45))
+        assert outbox.posted == [reminder("10:00", "Матан")]
+        # Outbox не отправит напоминание позже начала пары
+        assert outbox.expires == [15 * 60]
+        await clock.advance(MONDAY.replace(hour=9, minute=45) + timedelta(days=7))
+        assert outbox.posted == [reminder("10:00", "Матан")] * 2
+
+    run(tmp_path, {"ПН": day(("10:00", "Матан"))}, MONDAY.replace(hour=8), scenario)
+
+
+def test_week_wrap(tmp_path):
+    # Пара в понедельник в 00:05: напоминание в воскресенье в 23:50 предыдущей недели
+    sunday = MONDAY + timedelta(days=6)
+
+    async def scenario(clock, outbox, scheduler, store):
+        await clock.advance(sunday.replace(hour=23, minute=49))
+        assert outbox.posted == []
+        await clock.advance(sunday.replace(hour=23, minute=50))
+        assert outbox.posted == [reminder("00:05", "Физика")]
+        await clock.advance(sunday.replace(hour=23, minute=50) + timedelta(days=7))
+        assert outbox.posted == [reminder("00:05", "Физика")] * 2
+
+    run(tmp_path, {"ПН": day(("00:05", "Физика"))}, sunday.replace(hour=20), scenario)
+
+
+def test_edit_moves_reminder_without_duplicates(tmp_path):
+    async def scenario(clock, outbox, scheduler, store):
+        await clock.advance(MONDAY.replace(hour=9, minute=45))
+        assert outbox.posted == [reminder("10:00", "Матан")]
+
+        # Правка после отправленного напоминания: о 10:00 повторно не напоминаем
+        store.put_day(str(USER), "ПН", day(("10:00", "Матан"), ("12:00", "Английский")))
+        scheduler.reschedule(str(USER))
+        await clock.advance(MONDAY.replace(hour=11, minute=30))
+        assert outbox.posted == [reminder("10:00", "Матан")]
+
+        # Перенос пары на 11:55: новое напоминание раньше того, до которого спит цикл
+        store.put_day(str(USER), "ПН", day(("10:00", "Матан"), ("11:55", "Английский")))
+        scheduler.reschedule(str(USER))
+        await clock.advance(MONDAY.replace(hour=11, minute=40))
+        assert outbox.posted == [reminder("10:00", "Матан"), reminder("11:55", "Английский")]
+        # Напоминание о 12:00 из старой версии расписания не приходит
+        await clock.advance(MONDAY.replace(hour=12, minute=30))
+        assert len(outbox.posted) == 2
+
+        await clock.advance(MONDAY.replace(hour=12, minute=30) + timedelta(days=7))
+        assert outbox.posted[2:] == [reminder("10:00", "Матан"), reminder("11:55", "Английский")]
+        assert scheduler.stats()["sent"] == 4
+
+    run(tmp_path, {"ПН": day(("10:00", "Матан"))}, MONDAY.replace(hour=8), scenario)
+
+
+def test_removed_class_is_not_reminded(tmp_path):
+    async def scenario(clock, outbox, scheduler, store):
+        store.put_day(str(USER), "СР", day())
+        scheduler.reschedule(str(USER))
+        await clock.advance(MONDAY.replace(hour=9, minute=45) + timedelta(days=14))
+        assert outbox.posted == [reminder("10:00", "Матан")] * 3
+
+    run(tmp_path, {"ПН": day(("10:00", "Матан")), "СР": day(("10:00", "Химия"))},
+        MONDAY.replace(hour=8), scenario)
+
+
+def test_missed_class_after_clock_jump(tmp_path):
+    async def scenario(clock, outbox, scheduler, store):
+        # Цикл проснулся, когда пара уже началась: напоминать поздно
+        await clock.jump(MONDAY.replace(hour=10, minute=5))
+        assert outbox.posted == []
+        assert scheduler.stats()["missed"] == 1
+        await clock.advance(MONDAY.replace(hour=9, minute=45) + timedelta(days=7))
+        assert outbox.posted == [reminder("10:00", "Матан")]
+
+    run(tmp_path, {"ПН": day(("10:00", "Матан"))}, MONDAY.replace(hour=8), scenario)
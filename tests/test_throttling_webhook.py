@@ -0,0 +1,97 @@
+# tests/test_throttling_webhook.py
+#
+# Вебхук с ThrottlingMiddleware: флуд одного чата не должен занимать слоты
+# пула и задерживать апдейты других пользователей.
+
+import asyncio
+import time
+
+from aiogram import Bot, Dispatcher, types
+from aiohttp.test_utils import TestClient, TestServer
+
+from middlewares import ThrottlingMiddleware
+from webhook import create_app
+
+PATH = "/webhook"
+HANDLER_SECONDS = 0.05
+
+
+def make_update(update_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": "hi",
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "a"}
+        }
+    }
+
+
+def make_dispatcher(handled: list, throttle: ThrottlingMiddleware) -> Dispatcher:
+    dp = Dispatcher()
+    dp.update.outer_middleware(throttle)
+
+    @dp.message()
+    async def handler(message: types.Message) -> None:
+        await asyncio.sleep(HANDLER_SECONDS)
+        handled.append((message.from_user.id, time.monotonic()))
+
+    return dp
+
+
+def make_throttle() -> ThrottlingMiddleware:
+    # 2 апдейта в секунду без всплесков, ждать не больше 2.5 с. Часы стоят: вёдра не
+    # пополняются, поэтому ожидания и число отброшенных не зависят от скорости машины
+    return ThrottlingMiddleware(user_rate=2, user_burst=1, chat_rate=2, chat_burst=1, max_delay=2.5,
+                                clock=lambda: 0.0)
+
+
+async def wait_for(condition, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "апдейты не обработаны вовремя"
+        await asyncio.sleep(0.01)
+
+
+def test_flood_does_not_block_other_users():
+    async def scenario():
+        handled = []
+        throttle = make_throttle()
+        bot = Bot("123:abc")
+        app = create_app(make_dispatcher(handled, throttle), bot, PATH, concurrency=2, throttle=throttle)
+        handler = app["webhook_handler"]
+        async with TestClient(TestServer(app)) as client:
+            for update_id in range(20):
+                response = await client.post(PATH, json=make_update(update_id, user_id=1))
+                assert response.status == 200
+            # Один апдейт прошёл сразу, пять отложены (0.5 ... 2.5 с), остальные отброшены
+            assert handler.stats()["dropped"] == 14
+
+            response = await client.post(PATH, json=make_update(100, user_id=2))
+            assert response.status == 200
+            await wait_for(lambda: len(handled) == 7)
+        # Отложенные апдейты ждали вне пула: апдейт другого пользователя обработан раньше них
+        assert [user_id for user_id, _ in handled] == [1, 2, 1, 1, 1, 1, 1]
+        assert handler.stats() == {"pending": 0, "deferred": 0, "processed": 7, "rejected": 0, "dropped": 14}
+        assert throttle.stats()["passed"] == 7
+        assert throttle.stats()["throttled"] == 5
+        assert throttle.stats()["delayed_seconds"] == 0.5 + 1.0 + 1.5 + 2.0 + 2.5
+
+    asyncio.run(scenario())
+
+
+def test_middleware_throttles_without_webhook():
+    async def scenario():
+        handled = []
+        throttle = make_throttle()
+        dp = make_dispatcher(handled, throttle)
+        bot = Bot("123:abc")
+        started = time.monotonic()
+        await asyncio.gather(*(dp.feed_raw_update(bot, make_update(i, user_id=1)) for i in range(3)))
+        # В polling ожидание по-прежнему внутри middleware: 0, 0.5 и 1 с
+        assert len(handled) == 3
+        assert handled[-1][1] - started >= 1.0
+        assert throttle.stats()["delayed_seconds"] == 1.5
+        await bot.session.close()
+
+    asyncio.run(scenario())
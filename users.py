@@ -0,0 +1,113 @@
+# users.py
+
+import sqlite3
+import time
+from collections import OrderedDict
+
+# Поля профиля, которые хранятся в таблице users
+USER_FIELDS = ("language", "city", "university", "activity", "sociability", "interests")
+
+
+class UserRepository:
+    """
+    Зарегистрированные пользователи и их профили в SQLite с LRU-кэшем
+    на чтение. Повторный /start и проверки профиля обслуживаются из памяти;
+    отсутствие пользователя тоже кэшируется, чтобы не ходить в базу на
+    каждое сообщение незарегистрированных.
+    """
+
+    def __init__(self, path: str, cache_size: int = 10000):
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()  # user_id -> dict профиля или None
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                language TEXT,
+                city TEXT,
+                university TEXT,
+                activity TEXT,
+                sociability TEXT,
+                interests TEXT,
+                registered_at REAL NOT NULL
+            )
+        """)
+
+    def _remember(self, user_id: int, user) -> None:
+        self._cache[user_id] = user
+        self._cache.move_to_end(user_id)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _load(self, user_id: int):
+        row = self.conn.execute(
+            f"SELECT {', '.join(USER_FIELDS)} FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return dict(zip(USER_FIELDS, row)) if row else None
+
+    def get(self, user_id: int):
+        """Профиль пользователя (dict) или None, если о нём ничего не сохранено."""
+        if user_id in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(user_id)
+            return self._cache[user_id]
+        self.misses += 1
+        user = self._load(user_id)
+        self._remember(user_id, user)
+        return user
+
+    def is_registered(self, user_id: int) -> bool:
+        """Пройдена ли регистрация целиком (до выбора вуза включительно)."""
+        user = self.get(user_id)
+        return bool(user and user.get("university"))
+
+    def save(self, user_id: int, **fields) -> dict:
+        """Создаёт пользователя или обновляет переданные поля профиля."""
+        unknown = set(fields) - set(USER_FIELDS)
+        if unknown:
+            raise ValueError(f"Неизвестные поля профиля: {', '.join(sorted(unknown))}")
+        columns = ", ".join(fields)
+        placeholders = ", ".join("?" for _ in fields)
+        updates = ", ".join(f"{name} = excluded.{name}" for name in fields) or "user_id = user_id"
+        self.conn.execute(
+            f"INSERT INTO users (user_id, registered_at{', ' if fields else ''}{columns}) "
+            f"VALUES (?, ?{', ' if fields else ''}{placeholders}) "
+            f"ON CONFLICT (user_id) DO UPDATE SET {updates}",
+            (user_id, time.time(), *fields.values())
+        )
+        # Мимо get(): запись не должна влиять на счётчики попаданий в кэш
+        cached = self._cache.get(user_id)
+        if cached is not None:
+            user = dict(cached)
+            user.update(fields)
+        else:
+            user = self._load(user_id)
+        self._remember(user_id, user)
+        return user
+
+    def iter_profiles(self):
+        """Все пользователи из базы (мимо кэша): пары (user_id, dict профиля)."""
+        cursor = self.conn.execute(f"SELECT user_id, {', '.join(USER_FIELDS)} FROM users")
+        for row in cursor:
+            yield row[0], dict(zip(USER_FIELDS, row[1:]))
+
+    def has_profile(self, user_id: int) -> bool:
+        """Заполнена ли дополнительная информация (AdditionalInfo)."""
+        user = self.get(user_id)
+        return bool(user and user.get("interests"))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "cached": len(self._cache)
+        }
+
+    def close(self) -> None:
+        self.conn.close()
@@ -0,0 +1,112 @@
+# webhook.py
+
+import asyncio
+import logging
+from typing import Any, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from middlewares import ThrottlingMiddleware
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик вебхука с ограниченным пулом: одновременно обрабатывается
+    не больше concurrency апдейтов, ещё max_pending ждут своей очереди.
+    Если очередь заполнена, Telegram получает 503 и повторит доставку позже —
+    так нагрузка не копится в памяти бота.
+
+    С throttle (ThrottlingMiddleware) лимит проверяется до пула: отброшенный
+    апдейт сразу подтверждается, а отложенный ждёт вне слота, так что флуд
+    одного чата не задерживает апдейты остальных пользователей.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, concurrency: int = 64, max_pending: int = 1000,
+                 throttle: Optional[ThrottlingMiddleware] = None, **kwargs: Any) -> None:
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **kwargs)
+        self.max_pending = max_pending
+        self.throttle = throttle
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.pending = 0
+        self.deferred = 0
+        self.processed = 0
+        self.rejected = 0
+        self.dropped = 0
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return web.Response(status=503, text="Busy")
+        update = Update.model_validate(await request.json(loads=bot.session.json_loads), context={"bot": bot})
+        wait = 0.0
+        if self.throttle is not None:
+            context = UserContextMiddleware.resolve_event_context(update)
+            wait = self.throttle.admit(context.user, context.chat)
+            if wait is None:
+                # 200, а не 503: повторная доставка флуда не нужна
+                self.dropped += 1
+                return web.json_response({}, dumps=bot.session.json_dumps)
+        self.pending += 1
+        task = asyncio.create_task(self._bounded_feed_update(bot, update, wait))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def _bounded_feed_update(self, bot: Bot, update: Update, wait: float) -> None:
+        try:
+            if wait > 0:
+                self.deferred += 1
+                try:
+                    await asyncio.sleep(wait)
+                finally:
+                    self.deferred -= 1
+            async with self._semaphore:
+                result = await self.dispatcher.feed_update(bot, update, **self.data,
+                                                           throttle_admitted=self.throttle is not None)
+                if isinstance(result, TelegramMethod):
+                    await self.dispatcher.silent_call_request(bot=bot, result=result)
+        except Exception:
+            logger.exception("Ошибка обработки апдейта из вебхука")
+        finally:
+            self.pending -= 1
+            self.processed += 1
+
+    def stats(self) -> dict:
+        return {"pending": self.pending, "deferred": self.deferred, "processed": self.processed,
+                "rejected": self.rejected, "dropped": self.dropped}
+
+
+def create_app(dispatcher: Dispatcher, bot: Bot, path: str, secret_token: str = None,
+               concurrency: int = 64, max_pending: int = 1000,
+               throttle: ThrottlingMiddleware = None) -> web.Application:
+    """aiohttp-приложение, принимающее апдейты Telegram на path."""
+    app = web.Application()
+    handler = BoundedRequestHandler(dispatcher, bot, concurrency=concurrency, max_pending=max_pending,
+                                    throttle=throttle, secret_token=secret_token)
+    handler.register(app, path=path)
+    app["webhook_handler"] = handler
+    setup_application(app, dispatcher, bot=bot)
+    return app
+
+
+def run_webhook(dispatcher: Dispatcher, bot: Bot, base_url: str, path: str = "/webhook",
+                host: str = "0.0.0.0", port: int = 8080, secret_token: str = None,
+                concurrency: int = 64, max_pending: int = 1000, throttle: ThrottlingMiddleware = None) -> None:
+    """Регистрирует вебхук в Telegram и запускает aiohttp-сервер вместо long polling."""
+
+    async def on_startup(bot: Bot) -> None:
+        await bot.set_webhook(f"{base_url.rstrip('/')}{path}", secret_token=secret_token,
+                              max_connections=min(concurrency, 100))
+        logger.info(f"Вебхук установлен: {base_url.rstrip('/')}{path}")
+
+    dispatcher.startup.register(on_startup)
+    app = create_app(dispatcher, bot, path, secret_token=secret_token,
+                     concurrency=concurrency, max_pending=max_pending, throttle=throttle)
+    web.run_app(app, host=host, port=port)